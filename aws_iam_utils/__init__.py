@@ -1,8 +1,40 @@
-import aws_iam_utils.checks
-import aws_iam_utils.generator
-import aws_iam_utils.combiner
-import aws_iam_utils.util
-import aws_iam_utils.simplifier
-import aws_iam_utils.action_data_overrides  # noqa: F401
-import aws_iam_utils.policy
-import aws_iam_utils.policy_permission_item  # noqa: F401
+import importlib
+
+# submodules are imported the first time they are accessed as attributes of the
+# package (e.g. `aws_iam_utils.checks`), so that `import aws_iam_utils` stays cheap
+# for callers that only need some of them
+_SUBMODULES = {
+    "account_details",
+    "action_data_overrides",
+    "cache",
+    "catalog",
+    "catalog_snapshot",
+    "checks",
+    "cloudtrail",
+    "clustering",
+    "combiner",
+    "conditions",
+    "constants",
+    "evaluator",
+    "expander",
+    "fingerprint",
+    "generator",
+    "permission_set",
+    "policy",
+    "policy_index",
+    "policy_permission_item",
+    "simplifier",
+    "util",
+    "wildcards",
+}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
@@ -0,0 +1,501 @@
+"""
+Streaming analysis of `aws iam get-account-authorization-details` exports.
+
+Exports for large accounts can run to hundreds of MB, so rather than loading the
+whole file, `analyze_account_authorization_details()` reads it incrementally and
+decodes one user, group, role or managed policy at a time. Policy documents are
+checked as they are read and then dropped; only the check results are kept.
+Seekable inputs are read twice (managed policies and groups first, then users
+and roles), so memory use depends on the largest single entry in the export and
+the number of managed policies and groups, but not on the number of users and
+roles. Inputs that cannot be seeked are read once, keeping a small summary of
+each principal until the policies it depends on have been read.
+"""
+
+import codecs
+import json
+import urllib.parse
+from typing import Callable
+from typing import Iterator
+from typing import NamedTuple
+from typing import Optional
+from typing import TextIO
+from typing import Union
+
+from aws_iam_utils.checks import is_list_only_policy
+from aws_iam_utils.checks import is_read_only_policy
+
+USER_DETAIL_LIST = "UserDetailList"
+GROUP_DETAIL_LIST = "GroupDetailList"
+ROLE_DETAIL_LIST = "RoleDetailList"
+POLICIES = "Policies"
+
+SECTIONS = [USER_DETAIL_LIST, GROUP_DETAIL_LIST, ROLE_DETAIL_LIST, POLICIES]
+
+DEFAULT_CHECKS = {
+    "read_only": is_read_only_policy,
+    "list_only": is_list_only_policy,
+}
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+
+class PolicyResult(NamedTuple):
+    """Check results for a single policy: a managed policy (kind "managed"), or
+    an inline policy of a user, group or role (kind "user", "group" or "role",
+    with the ARN of the principal it belongs to)."""
+
+    kind: str
+    name: str
+    arn: str
+    results: dict
+
+
+class PrincipalResult(NamedTuple):
+    """Check results for a user, group or role, covering all of its inline and
+    attached managed policies and, for users, those of its groups."""
+
+    kind: str
+    name: str
+    arn: str
+    results: dict
+
+
+class _JSONStream:
+    """Decodes JSON values one at a time from a file, reading it in chunks."""
+
+    def __init__(self, fp, chunk_size: int):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._bytes_decoder = None
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _read(self, size: int) -> bool:
+        """Reads at least size more characters into the buffer, if there are any.
+        Returns False at the end of the file."""
+        if self._eof:
+            return False
+
+        chunks = [self._buf[self._pos :]]
+        n = 0
+        while n < size:
+            chunk = self._fp.read(self._chunk_size)
+
+            if type(chunk) is bytes:
+                if self._bytes_decoder is None:
+                    self._bytes_decoder = codecs.getincrementaldecoder("utf-8")()
+                chunk = self._bytes_decoder.decode(chunk, final=not chunk)
+
+            if not chunk:
+                self._eof = True
+                break
+
+            chunks.append(chunk)
+            n += len(chunk)
+
+        self._buf = "".join(chunks)
+        self._pos = 0
+
+        return n > 0
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it, or ""
+        at the end of the file."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+
+            if not self._read(1):
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Consumes the next non-whitespace character, which must be one of
+        chars."""
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError(
+                f"invalid account authorization details: expected one of {chars!r}"
+                f", got {c!r}"
+            )
+
+        self._pos += 1
+        return c
+
+    def value(self):
+        """Decodes and consumes the next JSON value."""
+        self.peek()
+
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # the value may continue past the end of the buffer, so read
+                # more (at least doubling what is left of the buffer, to keep
+                # this linear in the size of the value, but not in the amount
+                # already consumed)
+                if not self._read(max(self._chunk_size, len(self._buf) - self._pos)):
+                    raise
+                continue
+
+            # a number at the very end of the buffer may be cut short
+            if end == len(self._buf) and self._read(1):
+                continue
+
+            self._pos = end
+            return value
+
+
+def iter_account_authorization_details(
+    fp: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[tuple[str, dict]]:
+    """
+    Yields (section, entry) for every entry in the UserDetailList,
+    GroupDetailList, RoleDetailList and Policies sections of a
+    get-account-authorization-details export, in the order they appear in the
+    file. fp may be opened in text or binary mode; it is read chunk_size at a
+    time, and only one entry is decoded and held in memory at once.
+    """
+    stream = _JSONStream(fp, chunk_size)
+
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+
+    while True:
+        key = stream.value()
+        stream.expect(":")
+
+        if key in SECTIONS and stream.peek() == "[":
+            stream.expect("[")
+
+            if stream.peek() == "]":
+                stream.expect("]")
+            else:
+                while True:
+                    yield key, stream.value()
+
+                    if stream.expect(",]") == "]":
+                        break
+        else:
+            stream.value()
+
+        if stream.expect(",}") == "}":
+            return
+
+
+def _policy_document(document) -> dict:
+    # the API returns URL-encoded policy documents, but the CLI decodes them
+    if type(document) is str:
+        return json.loads(urllib.parse.unquote(document))
+
+    return document
+
+
+def _run_checks(checks: list, document) -> tuple:
+    policy = _policy_document(document)
+
+    results = []
+    for check in checks:
+        try:
+            results.append(check(policy))
+        except ValueError:
+            # e.g. actions the catalog does not know about
+            results.append(None)
+
+    return tuple(results)
+
+
+def _combine_results(n_checks: int, all_results) -> tuple:
+    """Combines the results of several policies: a check passes only if it
+    passes for all of them, and is None (unknown) if it does not fail for any of
+    them but is unknown for some. Results that are None count as unknown."""
+    combined = [True] * n_checks
+
+    for results in all_results:
+        for i in range(n_checks):
+            result = results[i] if results is not None else None
+
+            if combined[i] is False:
+                continue
+            elif result is None:
+                combined[i] = None
+            elif not result:
+                combined[i] = False
+
+    return tuple(combined)
+
+
+def _managed_policy_result(
+    entry: dict, check_names: list, check_functions: list
+) -> Optional[PolicyResult]:
+    """Returns the PolicyResult for the default version of a managed policy, or
+    None if it has no default version."""
+    for version in entry.get("PolicyVersionList", []):
+        if version.get("IsDefaultVersion") or (
+            version.get("VersionId") == entry.get("DefaultVersionId")
+        ):
+            document = version.get("Document")
+            break
+    else:
+        return None
+
+    if document is None:
+        return None
+
+    results = _run_checks(check_functions, document)
+
+    return PolicyResult(
+        "managed", entry["PolicyName"], entry["Arn"], dict(zip(check_names, results))
+    )
+
+
+def _principal_entry(
+    kind: str, entry: dict, check_names: list, check_functions: list
+) -> tuple[list[PolicyResult], tuple, tuple]:
+    """Checks the inline policies of a user, group or role, and returns their
+    PolicyResults, their combined results, and the managed policies and groups
+    the principal also depends on (as sorted ("policy", ARN) and ("group", name)
+    tuples)."""
+    policy_results = []
+    inline_results = []
+    for inline_policy in entry.get(f"{kind.capitalize()}PolicyList", []):
+        results = _run_checks(check_functions, inline_policy["PolicyDocument"])
+        inline_results.append(results)
+
+        policy_results.append(
+            PolicyResult(
+                kind,
+                inline_policy["PolicyName"],
+                entry["Arn"],
+                dict(zip(check_names, results)),
+            )
+        )
+
+    dependencies = {
+        ("policy", x["PolicyArn"]) for x in entry.get("AttachedManagedPolicies", [])
+    }
+    dependencies.update(("group", x) for x in entry.get("GroupList", []))
+
+    return (
+        policy_results,
+        _combine_results(len(check_names), inline_results),
+        tuple(sorted(dependencies)),
+    )
+
+
+def _is_seekable(fp) -> bool:
+    try:
+        return fp.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+def analyze_account_authorization_details(
+    fp: TextIO,
+    checks: Optional[dict[str, Callable[[dict], bool]]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Union[PolicyResult, PrincipalResult]]:
+    """
+    Streams a get-account-authorization-details export from fp, running the
+    given checks against every policy in it, and yields a PolicyResult for each
+    inline policy and managed policy (its default version), and a
+    PrincipalResult for each user, group and role.
+
+    checks maps names to functions that take a policy document and return True
+    or False, e.g. `is_read_only_policy`, or `policy_has_only_these_arn_types`
+    with its other arguments bound; DEFAULT_CHECKS is used if not given. A check
+    that raises ValueError (e.g. because a policy uses an unknown action) has a
+    result of None.
+
+    Each managed policy is checked once, however many principals it is attached
+    to. PrincipalResults need the results of their attached policies and
+    groups, which usually appear later in the export. If fp is seekable, it is
+    therefore read twice: first for the managed policies and groups, and then
+    for the users and roles, whose results are yielded as they are read. Memory
+    use then depends on the number of managed policies and groups, not on the
+    number of users and roles.
+
+    Otherwise (e.g. for a pipe), the export is read once, and each user and role
+    is yielded as soon as the results it needs are known, which may be at the
+    end. Until then, its name and ARN are kept, along with what it is waiting
+    for (shared by principals with the same policies), so memory use grows with
+    the number of principals that appear before their policies.
+    """
+    if checks is None:
+        checks = DEFAULT_CHECKS
+
+    check_names = list(checks)
+    check_functions = list(checks.values())
+
+    if _is_seekable(fp):
+        yield from _analyze_in_two_passes(fp, check_names, check_functions, chunk_size)
+    else:
+        yield from _analyze_in_one_pass(fp, check_names, check_functions, chunk_size)
+
+
+def _analyze_in_two_passes(
+    fp, check_names: list, check_functions: list, chunk_size: int
+) -> Iterator[Union[PolicyResult, PrincipalResult]]:
+    start = fp.tell()
+
+    # ("policy", ARN) or ("group", name) -> check results
+    known_results = {}
+
+    # (name, ARN, combined inline results, dependencies) of each group
+    groups = []
+
+    for section, entry in iter_account_authorization_details(fp, chunk_size):
+        if section == POLICIES:
+            result = _managed_policy_result(entry, check_names, check_functions)
+            if result is not None:
+                known_results[("policy", entry["Arn"])] = tuple(result.results.values())
+                yield result
+
+        elif section == GROUP_DETAIL_LIST:
+            policy_results, inline_results, dependencies = _principal_entry(
+                "group", entry, check_names, check_functions
+            )
+            yield from policy_results
+
+            groups.append(
+                (entry["GroupName"], entry["Arn"], inline_results, dependencies)
+            )
+
+    # groups only depend on managed policies, which are all known by now
+    for name, arn, inline_results, dependencies in groups:
+        results = _combine_results(
+            len(check_names),
+            [inline_results] + [known_results.get(x) for x in dependencies],
+        )
+        known_results[("group", name)] = results
+
+        yield PrincipalResult("group", name, arn, dict(zip(check_names, results)))
+
+    del groups
+
+    fp.seek(start)
+    for section, entry in iter_account_authorization_details(fp, chunk_size):
+        if section not in (USER_DETAIL_LIST, ROLE_DETAIL_LIST):
+            continue
+
+        kind = section[: -len("DetailList")].lower()
+
+        policy_results, inline_results, dependencies = _principal_entry(
+            kind, entry, check_names, check_functions
+        )
+        yield from policy_results
+
+        results = _combine_results(
+            len(check_names),
+            [inline_results] + [known_results.get(x) for x in dependencies],
+        )
+        yield PrincipalResult(
+            kind,
+            entry[f"{kind.capitalize()}Name"],
+            entry["Arn"],
+            dict(zip(check_names, results)),
+        )
+
+
+def _analyze_in_one_pass(
+    fp, check_names: list, check_functions: list, chunk_size: int
+) -> Iterator[Union[PolicyResult, PrincipalResult]]:
+    # ("policy", ARN) or ("group", name) -> check results
+    known_results = {}
+
+    # principals waiting for the results of their managed policies and groups,
+    # keyed on (kind, combined results of their inline policies, managed
+    # policies and groups) -> [(name, ARN), ...]
+    pending = {}
+
+    # managed policy or group -> keys of the pending principals waiting for it,
+    # and key -> number of managed policies and groups it is still waiting for
+    waiting = {}
+    n_missing = {}
+
+    def unblock(dependency: tuple) -> list[tuple]:
+        """Returns the keys of the pending principals that were waiting only for
+        the given managed policy or group, whose results are now known."""
+        unblocked = []
+        for key in waiting.pop(dependency, []):
+            if key not in n_missing:
+                continue
+
+            n_missing[key] -= 1
+            if not n_missing[key]:
+                del n_missing[key]
+                unblocked.append(key)
+
+        return unblocked
+
+    def resolve(keys: list[tuple]) -> Iterator[PrincipalResult]:
+        """Yields results for the pending principals with the given keys, and for
+        any principals that were waiting only for groups among them."""
+        while keys:
+            key = keys.pop()
+            kind, inline_results, dependencies = key
+
+            results = _combine_results(
+                len(check_names),
+                [inline_results] + [known_results.get(x) for x in dependencies],
+            )
+
+            for name, arn in pending.pop(key):
+                yield PrincipalResult(kind, name, arn, dict(zip(check_names, results)))
+
+                if kind == "group":
+                    known_results[("group", name)] = results
+                    keys.extend(unblock(("group", name)))
+
+    for section, entry in iter_account_authorization_details(fp, chunk_size):
+        if section == POLICIES:
+            result = _managed_policy_result(entry, check_names, check_functions)
+            if result is None:
+                continue
+
+            known_results[("policy", entry["Arn"])] = tuple(result.results.values())
+
+            yield result
+            yield from resolve(unblock(("policy", entry["Arn"])))
+
+        else:
+            kind = section[: -len("DetailList")].lower()
+
+            policy_results, inline_results, dependencies = _principal_entry(
+                kind, entry, check_names, check_functions
+            )
+            yield from policy_results
+
+            key = (kind, inline_results, dependencies)
+
+            principal = (entry[f"{kind.capitalize()}Name"], entry["Arn"])
+            if key in pending:
+                # waiting for the same things as another principal
+                pending[key].append(principal)
+                continue
+
+            pending[key] = [principal]
+
+            missing = [x for x in key[2] if x not in known_results]
+            if not missing:
+                yield from resolve([key])
+                continue
+
+            for dependency in missing:
+                waiting.setdefault(dependency, []).append(key)
+            n_missing[key] = len(missing)
+
+    # whatever is left depends on policies or groups missing from the export,
+    # whose results are unknown; resolve groups first as users may need them
+    for key in sorted(n_missing, key=lambda x: x[0] != "group"):
+        if key in n_missing:
+            del n_missing[key]
+            yield from resolve([key])
@@ -0,0 +1,261 @@
+"""
+An optional persistent cache of policy expansions, fingerprints and check
+results, held in an SQLite database.
+
+This is useful where the same policies are checked over and over again in
+separate processes, e.g. in CI:
+
+    from aws_iam_utils.cache import PolicyCache
+    from aws_iam_utils.constants import READ, LIST
+
+    with PolicyCache() as cache:
+        for policy in policies:
+            print(cache.policy_has_only_these_access_levels(policy, [READ, LIST]))
+
+Entries are keyed on a hash of the policy's JSON (with sorted keys) and of the
+catalog version, so they are invalidated automatically when policy_sentry's
+data or ACTION_DATA_OVERRIDES change. Fingerprints and access level checks,
+which do not depend on how a policy is spelled, are keyed on the normalized
+policy (see normalize_policy()) instead, so equivalent policies share those
+entries. Once the cache grows past max_size bytes, the
+least recently used entries are evicted.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.checks import policy_has_only_these_access_levels
+from aws_iam_utils.expander import expand_policy
+from aws_iam_utils.fingerprint import policy_fingerprint
+
+CACHE_DIR_ENV_VAR = "AWS_IAM_UTILS_CACHE_DIR"
+CACHE_FILE_NAME = "policy-cache.sqlite3"
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# bump this whenever the format of cached values or keys changes
+_CACHE_FORMAT = 3
+
+
+def default_cache_dir() -> str:
+    """Returns the directory the cache is kept in by default: the value of the
+    AWS_IAM_UTILS_CACHE_DIR environment variable if set, or else
+    `aws-iam-utils` in the user's cache directory."""
+    cache_dir = os.environ.get(CACHE_DIR_ENV_VAR)
+    if cache_dir:
+        return cache_dir
+
+    base_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+
+    return os.path.join(base_dir, "aws-iam-utils")
+
+
+def _as_list(value) -> list:
+    return value if type(value) is list else [value]
+
+
+def normalize_policy(policy: dict) -> dict:
+    """
+    Returns a copy of the given policy in the form used for cache keys:
+    Statement is always a list, and in each statement Action and NotAction are
+    sorted lists of lowercase actions (as actions are case-insensitive in IAM)
+    and Resource and NotResource are sorted lists. None of these change the
+    permissions the policy grants.
+    """
+    statements = []
+    for st in _as_list(policy["Statement"]):
+        st = dict(st)
+        for k in ("Action", "NotAction"):
+            if k in st:
+                st[k] = sorted({x.lower() for x in _as_list(st[k])})
+
+        for k in ("Resource", "NotResource"):
+            if k in st:
+                st[k] = sorted(set(_as_list(st[k])))
+
+        statements.append(st)
+
+    return {**policy, "Statement": statements}
+
+
+class PolicyCache:
+    """
+    A persistent cache of the results of expand_policy(), policy_fingerprint()
+    and policy_has_only_these_access_levels(). Each method takes the same
+    arguments as the function it caches.
+
+    The cache is stored in `path`, or in CACHE_FILE_NAME under
+    default_cache_dir() if path is not given. It can be shared by several
+    processes.
+    """
+
+    def __init__(self, path: str = None, max_size: int = DEFAULT_MAX_SIZE):
+        if path is None:
+            cache_dir = default_cache_dir()
+            os.makedirs(cache_dir, exist_ok=True)
+            path = os.path.join(cache_dir, CACHE_FILE_NAME)
+
+        self.path = path
+        self.max_size = max_size
+
+        self._version = f"{_CACHE_FORMAT}:{get_catalog().version}"
+
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """)
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)"
+        )
+
+        # the total size of all entries, kept up to date by triggers so that it
+        # does not need to be summed over the whole table on every write
+        self._db.execute("BEGIN IMMEDIATE")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS totals (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                size INTEGER NOT NULL
+            )
+            """)
+        self._db.execute("""
+            INSERT OR IGNORE INTO totals
+            VALUES (0, (SELECT COALESCE(SUM(size), 0) FROM entries))
+            """)
+        self._db.execute("""
+            CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries
+            BEGIN
+                UPDATE totals SET size = size + new.size;
+            END
+            """)
+        self._db.execute("""
+            CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries
+            BEGIN
+                UPDATE totals SET size = size + new.size - old.size;
+            END
+            """)
+        self._db.execute("""
+            CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries
+            BEGIN
+                UPDATE totals SET size = size - old.size;
+            END
+            """)
+        self._db.execute("COMMIT")
+
+        # entries from other catalog versions can never be hit again
+        self._db.execute("DELETE FROM entries WHERE version != ?", (self._version,))
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def size(self) -> int:
+        """Returns the total size of all cached values, in bytes."""
+        return self._db.execute("SELECT size FROM totals").fetchone()[0]
+
+    def clear(self):
+        """Removes all entries from the cache."""
+        self._db.execute("DELETE FROM entries")
+
+    def _key(self, kind: str, policy: dict, args) -> str:
+        return hashlib.sha256(
+            json.dumps(
+                [kind, self._version, policy, args],
+                sort_keys=True,
+                default=list,
+            ).encode("utf-8")
+        ).hexdigest()
+
+    def _cached(self, kind: str, policy: dict, args, compute, normalize=False):
+        key = self._key(kind, normalize_policy(policy) if normalize else policy, args)
+
+        row = self._db.execute(
+            "SELECT value FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            self._db.execute(
+                "UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            return json.loads(row[0])
+
+        result = compute()
+
+        value = json.dumps(result)
+        self._db.execute(
+            """
+            INSERT INTO entries VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                value = excluded.value,
+                size = excluded.size,
+                last_used = excluded.last_used
+            """,
+            (key, self._version, value, len(value), time.time()),
+        )
+        self._evict()
+
+        return result
+
+    def _evict(self):
+        excess = self.size() - self.max_size
+        if excess <= 0:
+            return
+
+        keys = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM entries ORDER BY last_used"
+        ):
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+
+        self._db.executemany("DELETE FROM entries WHERE key = ?", keys)
+
+    def expand_policy(self, policy: dict, expand_deny: bool = False) -> dict:
+        # not normalized: the expansion keeps Deny statements, resources and
+        # other keys as they were given
+        return self._cached(
+            "expand_policy",
+            policy,
+            [expand_deny],
+            lambda: expand_policy(policy, expand_deny),
+        )
+
+    def policy_fingerprint(self, policy: dict) -> str:
+        return self._cached(
+            "policy_fingerprint",
+            policy,
+            [],
+            lambda: policy_fingerprint(policy),
+            normalize=True,
+        )
+
+    def policy_has_only_these_access_levels(
+        self, policy: dict, access_levels: list[str]
+    ) -> bool:
+        return self._cached(
+            "policy_has_only_these_access_levels",
+            policy,
+            sorted(access_levels),
+            lambda: policy_has_only_these_access_levels(policy, access_levels),
+            normalize=True,
+        )
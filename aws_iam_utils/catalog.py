@@ -0,0 +1,365 @@
+import bisect
+import functools
+import hashlib
+import json
+import os
+from typing import NamedTuple
+from typing import Optional
+
+from aws_iam_utils.action_data_overrides import ACTION_DATA_OVERRIDES
+from aws_iam_utils.constants import WILDCARD_ARN_TYPE
+from aws_iam_utils.wildcards import compile_wildcard
+
+CATALOG_SNAPSHOT_ENV_VAR = "AWS_IAM_UTILS_CATALOG_SNAPSHOT"
+
+
+class ActionData(NamedTuple):
+    """Catalog entry for a single IAM action."""
+
+    action: str
+    access_level: str
+    resource_arn_types: tuple[str, ...] = ()
+    condition_keys: tuple[str, ...] = ()
+
+    def as_dict(self) -> dict:
+        return {
+            "action": self.action,
+            "access_level": self.access_level,
+            "resource_arn_types": list(self.resource_arn_types),
+            "condition_keys": list(self.condition_keys),
+        }
+
+
+def mask_from_ids(ids) -> int:
+    """Returns a bitset (as an int) with the bits for the given action IDs set."""
+    ids = list(ids)
+    if not ids:
+        return 0
+
+    buf = bytearray(max(ids) // 8 + 1)
+    for action_id in ids:
+        buf[action_id >> 3] |= 1 << (action_id & 7)
+
+    return int.from_bytes(buf, "little")
+
+
+def ids_from_mask(mask: int) -> list[int]:
+    """Returns the action IDs whose bits are set in the given bitset, in
+    ascending order."""
+    result = []
+
+    for byte_index, byte in enumerate(
+        mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    ):
+        if byte:
+            for bit in range(8):
+                if byte & (1 << bit):
+                    result.append((byte_index << 3) | bit)
+
+    return result
+
+
+class ActionCatalog:
+    """
+    An in-memory index of every known IAM action, keyed by lowercased
+    `service:action`.
+
+    The catalog is built once from the policy_sentry IAM definition plus
+    `ACTION_DATA_OVERRIDES`, so that lookups are a single dict access rather than
+    a scan over the whole service. Use `get_catalog()` to get the shared
+    instance.
+
+    Every known action also has a stable integer ID (its position in the sorted
+    list of action names), so that sets of actions can be held as bitsets.
+    Unknown actions are given IDs on first use, after the known ones; those IDs
+    are only stable within a single process.
+    """
+
+    def __init__(self, actions: list[ActionData]):
+        self._actions = {}
+        self._services = {}
+
+        for action_data in actions:
+            l_action = action_data.action.lower()
+            service_name = l_action.split(":")[0]
+
+            if l_action not in self._actions:
+                self._services.setdefault(service_name, []).append(l_action)
+
+            self._actions[l_action] = action_data
+
+        # sorted index of all action names, so that wildcard patterns can be
+        # resolved with a range lookup on their literal prefix
+        self._sorted_actions = sorted(self._actions)
+
+        self._action_ids = {x: i for i, x in enumerate(self._sorted_actions)}
+        self._action_names = list(self._sorted_actions)
+
+        self._all_access_levels = frozenset(x.access_level for x in actions)
+
+        self._init_caches()
+
+    def _init_caches(self):
+        self._version = None
+        self._access_level_masks = None
+
+        self.match_actions = functools.lru_cache(maxsize=4096)(self._match_actions)
+        self.match_mask = functools.lru_cache(maxsize=4096)(self._match_mask)
+        self.match_access_levels = functools.lru_cache(maxsize=4096)(
+            self._match_access_levels
+        )
+
+    @property
+    def version(self) -> str:
+        """
+        A hex digest of all the action data in the catalog. This changes whenever
+        policy_sentry's data or ACTION_DATA_OVERRIDES change, so it can be used to
+        invalidate anything derived from the catalog.
+        """
+        if self._version is None:
+            actions = sorted(self, key=lambda x: x.action.lower())
+            self._version = hashlib.sha256(
+                json.dumps(actions).encode("utf-8")
+            ).hexdigest()
+
+        return self._version
+
+    def __len__(self):
+        return len(self._actions)
+
+    def __contains__(self, action_name: str) -> bool:
+        return action_name.lower() in self._actions
+
+    def __iter__(self):
+        return iter(self._actions.values())
+
+    def get(self, action_name: str) -> Optional[ActionData]:
+        """Returns the ActionData for the given `service:action`, or None if the
+        action is not known."""
+        return self._actions.get(action_name.lower())
+
+    def access_level(self, action_name: str) -> Optional[str]:
+        """Returns the access level of the given `service:action`, or None if the
+        action is not known."""
+        action_data = self._actions.get(action_name.lower())
+        if action_data is None:
+            return None
+
+        return action_data.access_level
+
+    def _match_actions(self, pattern: str) -> tuple[str, ...]:
+        """
+        Returns the lowercased names of all known actions matching the given
+        action pattern, which may contain `*` and `?` wildcards. Matching is case
+        insensitive. This is exposed (with caching) as `match_actions()`.
+        """
+        l_pattern = pattern.lower()
+
+        wildcard_pos = len(l_pattern)
+        for wildcard in "*?":
+            pos = l_pattern.find(wildcard)
+            if pos != -1 and pos < wildcard_pos:
+                wildcard_pos = pos
+
+        prefix = l_pattern[:wildcard_pos]
+
+        if wildcard_pos == len(l_pattern):
+            # no wildcards at all
+            return (l_pattern,) if l_pattern in self._actions else ()
+
+        lo = bisect.bisect_left(self._sorted_actions, prefix)
+        if prefix:
+            hi = bisect.bisect_left(
+                self._sorted_actions, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo
+            )
+        else:
+            hi = len(self._sorted_actions)
+
+        if l_pattern == prefix + "*":
+            return tuple(self._sorted_actions[lo:hi])
+
+        regex = compile_wildcard(l_pattern)
+
+        return tuple(x for x in self._sorted_actions[lo:hi] if regex.fullmatch(x))
+
+    def action_id(self, action_name: str) -> int:
+        """Returns the integer ID of the given action, assigning a new one if the
+        action is not known."""
+        l_action = action_name.lower()
+
+        action_id = self._action_ids.get(l_action)
+        if action_id is None:
+            action_id = len(self._action_names)
+            self._action_ids[l_action] = action_id
+            self._action_names.append(l_action)
+
+        return action_id
+
+    def action_name(self, action_id: int) -> str:
+        """Returns the lowercased action name for the given action ID."""
+        return self._action_names[action_id]
+
+    def all_actions_mask(self) -> int:
+        """Returns a bitset of every known action."""
+        return (1 << len(self._sorted_actions)) - 1
+
+    def _match_mask(self, pattern: str) -> int:
+        """
+        Returns a bitset of the actions matching the given action pattern. As with
+        the expander, a wildcard that matches no known actions is kept as a
+        literal action, with its own ID. This is exposed (with caching) as
+        `match_mask()`.
+        """
+        matches = self.match_actions(pattern)
+        if not matches:
+            return 1 << self.action_id(pattern)
+
+        return mask_from_ids(self.action_id(x) for x in matches)
+
+    def not_action_mask(self, not_actions) -> int:
+        """Returns a bitset of every known action that matches none of the given
+        action patterns (or single pattern), as covered by a NotAction."""
+        if type(not_actions) is str:
+            not_actions = [not_actions]
+
+        mask = 0
+        for action in not_actions:
+            mask |= self.match_mask(action)
+
+        return self.all_actions_mask() & ~mask
+
+    def mask_access_levels(self, mask: int) -> frozenset[str]:
+        """Returns the set of access levels of the known actions in the given
+        bitset."""
+        if self._access_level_masks is None:
+            ids_by_access_level = {}
+            for action_data in self:
+                ids_by_access_level.setdefault(action_data.access_level, []).append(
+                    self.action_id(action_data.action)
+                )
+
+            self._access_level_masks = {
+                k: mask_from_ids(ids) for k, ids in ids_by_access_level.items()
+            }
+
+        return frozenset(
+            access_level
+            for access_level, access_level_mask in self._access_level_masks.items()
+            if mask & access_level_mask
+        )
+
+    def _match_access_levels(self, pattern: str) -> frozenset[str]:
+        """
+        Returns the set of access levels of the actions matching the given action
+        pattern, or an empty set if it matches no known actions. This is exposed
+        (with caching) as `match_access_levels()`, so checks on wildcards like
+        `s3:*` can be decided without expanding them each time.
+        """
+        result = set()
+        for action in self.match_actions(pattern):
+            result.add(self._actions[action].access_level)
+
+            if len(result) == len(self._all_access_levels):
+                # every access level has been seen, the rest can't add anything
+                break
+
+        return frozenset(result)
+
+    def services(self) -> list[str]:
+        """Returns all known service prefixes."""
+        return list(self._services)
+
+    def has_service(self, service_name: str) -> bool:
+        return service_name.lower() in self._services
+
+    def actions_for_service(self, service_name: str) -> list[ActionData]:
+        """Returns the ActionData for every action in the given service."""
+        return [self._actions[x] for x in self._services.get(service_name.lower(), [])]
+
+    def actions_matching_arn_type(
+        self, service_name: str, arn_type: str
+    ) -> list[ActionData]:
+        """
+        Returns the ActionData for every action in the given service that relates
+        to the given ARN type. `WILDCARD_ARN_TYPE` matches actions that do not
+        relate to any ARN type, as per policy_sentry's
+        `get_actions_that_support_wildcard_arns_only`.
+        """
+        l_arn_type = arn_type.lower()
+        result = []
+
+        for action_data in self.actions_for_service(service_name):
+            if l_arn_type == WILDCARD_ARN_TYPE:
+                if action_data.resource_arn_types == (WILDCARD_ARN_TYPE,):
+                    result.append(action_data)
+
+            elif l_arn_type in action_data.resource_arn_types:
+                result.append(action_data)
+
+        return result
+
+
+def build_catalog_from_iam_definition(
+    iam_definition: dict, overrides: dict = ACTION_DATA_OVERRIDES
+) -> ActionCatalog:
+    """
+    Builds an ActionCatalog from an IAM definition in policy_sentry's format,
+    applying the given overrides on top.
+    """
+    actions = []
+
+    for service_data in iam_definition.values():
+        service_prefix = service_data["prefix"]
+
+        for action_name, action_data in service_data["privileges"].items():
+            arn_types = []
+            condition_keys = []
+
+            for resource_type_data in action_data["resource_types"].values():
+                arn_type = resource_type_data["resource_type"].strip("*").lower()
+                arn_types.append(arn_type if arn_type else WILDCARD_ARN_TYPE)
+
+                for condition_key in resource_type_data["condition_keys"]:
+                    if condition_key not in condition_keys:
+                        condition_keys.append(condition_key)
+
+            actions.append(
+                ActionData(
+                    action=f"{service_prefix}:{action_name}",
+                    access_level=action_data["access_level"],
+                    resource_arn_types=tuple(arn_types),
+                    condition_keys=tuple(condition_keys),
+                )
+            )
+
+    for override in overrides.values():
+        actions.append(
+            ActionData(
+                action=override["action"],
+                access_level=override["access_level"],
+                resource_arn_types=tuple(override.get("resource_arn_types", ())),
+                condition_keys=tuple(override.get("condition_keys", ())),
+            )
+        )
+
+    return ActionCatalog(actions)
+
+
+@functools.lru_cache(maxsize=1)
+def get_catalog() -> ActionCatalog:
+    """
+    Returns the shared ActionCatalog, building it on first use.
+
+    If the AWS_IAM_UTILS_CATALOG_SNAPSHOT environment variable is set, the catalog
+    is instead loaded from the snapshot file it names (see
+    `aws_iam_utils.catalog_snapshot`), which avoids loading policy_sentry at all.
+    """
+    snapshot_path = os.environ.get(CATALOG_SNAPSHOT_ENV_VAR)
+    if snapshot_path:
+        from aws_iam_utils.catalog_snapshot import load_catalog_snapshot
+
+        return load_catalog_snapshot(snapshot_path)
+
+    from policy_sentry.shared.iam_data import iam_definition
+
+    return build_catalog_from_iam_definition(iam_definition)
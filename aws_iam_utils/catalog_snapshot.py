@@ -0,0 +1,349 @@
+"""
+A compact binary snapshot of the action catalog, which can be loaded with mmap.
+
+Building the catalog means loading and walking the whole policy_sentry IAM
+definition, which is slow and costs every process its own copy of the data.
+A snapshot is built once (e.g. at deploy time) with:
+
+    python -m aws_iam_utils.catalog_snapshot path/to/catalog.snapshot
+
+and then loaded with `load_catalog_snapshot()`, or by pointing the
+AWS_IAM_UTILS_CATALOG_SNAPSHOT environment variable at it so that
+`get_catalog()` uses it. Loading is just opening and mapping the file, and as
+the data is read straight from the mapping, processes using the same snapshot
+share its pages.
+
+The file is laid out as follows (all integers are little-endian uint32):
+
+- a header: magic, the catalog version (as a string ID), then the count and
+  position of each section below
+- a string table: n+1 offsets into a UTF-8 blob of all strings
+- action records, sorted by lowercased action name (so a record's index is the
+  action's ID): lowercased name, name, access level, and (offset, count) of its
+  ARN types and condition keys in the list pool
+- service records, in catalog order: name, and (offset, count) of its actions'
+  IDs in the list pool
+- the list pool: string and action IDs referenced by the records above
+"""
+
+import bisect
+import collections.abc
+import mmap
+import os
+import struct
+import sys
+from typing import Optional
+
+from aws_iam_utils.catalog import ActionCatalog
+from aws_iam_utils.catalog import ActionData
+from aws_iam_utils.catalog import get_catalog
+
+SNAPSHOT_MAGIC = b"AIUCAT\x00\x02"
+
+_HEADER = struct.Struct("<8s11I")
+_UINT32 = struct.Struct("<I")
+_STRING_OFFSETS = struct.Struct("<2I")
+_ACTION_RECORD = struct.Struct("<7I")
+_SERVICE_RECORD = struct.Struct("<3I")
+
+
+def write_catalog_snapshot(catalog: ActionCatalog, path: str):
+    """Writes the given catalog to a snapshot file at path. The file is replaced
+    atomically, so processes that already have it mapped are not affected."""
+    strings = {}
+
+    def string_id(value: str) -> int:
+        return strings.setdefault(value, len(strings))
+
+    pool = []
+
+    def add_list(values: list[int]) -> tuple[int, int]:
+        offset = len(pool)
+        pool.extend(values)
+        return offset, len(values)
+
+    version = string_id(catalog.version)
+
+    actions = sorted(catalog, key=lambda x: x.action.lower())
+    action_ids = {x.action.lower(): i for i, x in enumerate(actions)}
+
+    action_records = []
+    for action_data in actions:
+        action_records.append(
+            _ACTION_RECORD.pack(
+                string_id(action_data.action.lower()),
+                string_id(action_data.action),
+                string_id(action_data.access_level),
+                *add_list([string_id(x) for x in action_data.resource_arn_types]),
+                *add_list([string_id(x) for x in action_data.condition_keys]),
+            )
+        )
+
+    service_records = []
+    for service_name in catalog.services():
+        service_records.append(
+            _SERVICE_RECORD.pack(
+                string_id(service_name),
+                *add_list(
+                    [
+                        action_ids[x.action.lower()]
+                        for x in catalog.actions_for_service(service_name)
+                    ]
+                ),
+            )
+        )
+
+    access_levels = add_list(
+        sorted({string_id(x.access_level) for x in actions}),
+    )
+
+    blob = bytearray()
+    string_offsets = [0]
+    for value in strings:
+        blob += value.encode("utf-8")
+        string_offsets.append(len(blob))
+
+    string_offsets_pos = _HEADER.size
+    blob_pos = string_offsets_pos + 4 * len(string_offsets)
+    actions_pos = blob_pos + len(blob)
+    services_pos = actions_pos + _ACTION_RECORD.size * len(action_records)
+    pool_pos = services_pos + _SERVICE_RECORD.size * len(service_records)
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(
+            _HEADER.pack(
+                SNAPSHOT_MAGIC,
+                version,
+                len(strings),
+                string_offsets_pos,
+                blob_pos,
+                len(action_records),
+                actions_pos,
+                len(service_records),
+                services_pos,
+                pool_pos,
+                *access_levels,
+            )
+        )
+        f.write(struct.pack(f"<{len(string_offsets)}I", *string_offsets))
+        f.write(blob)
+        f.write(b"".join(action_records))
+        f.write(b"".join(service_records))
+        f.write(struct.pack(f"<{len(pool)}I", *pool))
+
+    os.replace(tmp_path, path)
+
+
+class _Snapshot:
+    """Reads strings and records from a mapped snapshot file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.mmap[: len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"not an action catalog snapshot: {path}")
+
+        (
+            _,
+            self.version,
+            self.n_strings,
+            self.string_offsets_pos,
+            self.blob_pos,
+            self.n_actions,
+            self.actions_pos,
+            self.n_services,
+            self.services_pos,
+            self.pool_pos,
+            self.access_levels_offset,
+            self.n_access_levels,
+        ) = _HEADER.unpack_from(self.mmap)
+
+    def string(self, string_id: int) -> str:
+        start, end = _STRING_OFFSETS.unpack_from(
+            self.mmap, self.string_offsets_pos + 4 * string_id
+        )
+        return self.mmap[self.blob_pos + start : self.blob_pos + end].decode("utf-8")
+
+    def list(self, offset: int, count: int) -> tuple[int, ...]:
+        return struct.unpack_from(f"<{count}I", self.mmap, self.pool_pos + 4 * offset)
+
+    def action_record(self, index: int) -> tuple[int, ...]:
+        return _ACTION_RECORD.unpack_from(
+            self.mmap, self.actions_pos + _ACTION_RECORD.size * index
+        )
+
+    def action_name(self, index: int) -> str:
+        (name_id,) = _UINT32.unpack_from(
+            self.mmap, self.actions_pos + _ACTION_RECORD.size * index
+        )
+        return self.string(name_id)
+
+    def action_data(self, index: int) -> ActionData:
+        record = self.action_record(index)
+        _, name, access_level, arn_offset, arn_count, cond_offset, cond_count = record
+
+        return ActionData(
+            action=self.string(name),
+            access_level=self.string(access_level),
+            resource_arn_types=tuple(
+                self.string(x) for x in self.list(arn_offset, arn_count)
+            ),
+            condition_keys=tuple(
+                self.string(x) for x in self.list(cond_offset, cond_count)
+            ),
+        )
+
+    def service_record(self, index: int) -> tuple[int, ...]:
+        return _SERVICE_RECORD.unpack_from(
+            self.mmap, self.services_pos + _SERVICE_RECORD.size * index
+        )
+
+
+class _SnapshotActionNames(collections.abc.Sequence):
+    """The sorted, lowercased action names in a snapshot, read on demand."""
+
+    def __init__(self, snapshot: _Snapshot):
+        self._snapshot = snapshot
+
+    def __len__(self):
+        return self._snapshot.n_actions
+
+    def __getitem__(self, index):
+        if type(index) is slice:
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        return self._snapshot.action_name(index)
+
+    def index_of(self, l_action: str) -> Optional[int]:
+        """Returns the index of the given lowercased action name, or None."""
+        i = bisect.bisect_left(self, l_action)
+        if i < len(self) and self[i] == l_action:
+            return i
+
+        return None
+
+
+class _SnapshotActions(collections.abc.Mapping):
+    """Maps lowercased action names to their ActionData, read on demand."""
+
+    def __init__(self, snapshot: _Snapshot, names: _SnapshotActionNames):
+        self._snapshot = snapshot
+        self._names = names
+
+    def __len__(self):
+        return len(self._names)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __contains__(self, l_action):
+        return self._names.index_of(l_action) is not None
+
+    def __getitem__(self, l_action):
+        index = self._names.index_of(l_action)
+        if index is None:
+            raise KeyError(l_action)
+
+        return self._snapshot.action_data(index)
+
+
+class MappedActionCatalog(ActionCatalog):
+    """
+    An ActionCatalog read from a snapshot file written by
+    `write_catalog_snapshot()`. It has the same API as ActionCatalog, but action
+    data is read from the mapped file when needed rather than held in memory.
+    """
+
+    def __init__(self, path: str):
+        self._snapshot = _Snapshot(path)
+
+        self._sorted_actions = _SnapshotActionNames(self._snapshot)
+        self._actions = _SnapshotActions(self._snapshot, self._sorted_actions)
+
+        # service prefix -> (offset, count) of its action IDs in the list pool
+        self._services = {}
+        for i in range(self._snapshot.n_services):
+            name, offset, count = self._snapshot.service_record(i)
+            self._services[self._snapshot.string(name)] = (offset, count)
+
+        # IDs for actions not in the snapshot, assigned on first use
+        self._extra_action_ids = {}
+        self._extra_action_names = []
+
+        self._all_access_levels = frozenset(
+            self._snapshot.string(x)
+            for x in self._snapshot.list(
+                self._snapshot.access_levels_offset, self._snapshot.n_access_levels
+            )
+        )
+
+        self._init_caches()
+        self._version = self._snapshot.string(self._snapshot.version)
+
+    def __iter__(self):
+        for i in range(self._snapshot.n_actions):
+            yield self._snapshot.action_data(i)
+
+    def access_level(self, action_name: str) -> Optional[str]:
+        index = self._sorted_actions.index_of(action_name.lower())
+        if index is None:
+            return None
+
+        return self._snapshot.string(self._snapshot.action_record(index)[2])
+
+    def action_id(self, action_name: str) -> int:
+        l_action = action_name.lower()
+
+        action_id = self._sorted_actions.index_of(l_action)
+        if action_id is None:
+            action_id = self._extra_action_ids.get(l_action)
+
+        if action_id is None:
+            action_id = len(self._sorted_actions) + len(self._extra_action_names)
+            self._extra_action_ids[l_action] = action_id
+            self._extra_action_names.append(l_action)
+
+        return action_id
+
+    def action_name(self, action_id: int) -> str:
+        if action_id < len(self._sorted_actions):
+            return self._sorted_actions[action_id]
+
+        return self._extra_action_names[action_id - len(self._sorted_actions)]
+
+    def actions_for_service(self, service_name: str) -> list[ActionData]:
+        offset, count = self._services.get(service_name.lower(), (0, 0))
+
+        return [
+            self._snapshot.action_data(x) for x in self._snapshot.list(offset, count)
+        ]
+
+
+def load_catalog_snapshot(path: str) -> MappedActionCatalog:
+    """Loads the catalog snapshot at path."""
+    return MappedActionCatalog(path)
+
+
+def main(argv: list[str] = None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    if len(argv) != 1:
+        print(
+            "usage: python -m aws_iam_utils.catalog_snapshot <output path>",
+            file=sys.stderr,
+        )
+        return 2
+
+    write_catalog_snapshot(get_catalog(), argv[0])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
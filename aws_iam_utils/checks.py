@@ -1,16 +1,21 @@
-from policyuniverse.expander_minimizer import expand_policy
-from policy_sentry.querying.actions import get_actions_matching_arn_type
-from policy_sentry.querying.actions import get_actions_that_support_wildcard_arns_only
+import functools
+from typing import Iterable
+from typing import Iterator
 
-from aws_iam_utils.constants import READ, LIST, WRITE, WILDCARD_ARN_TYPE
-from aws_iam_utils.util import extract_policy_permission_items
-from aws_iam_utils.util import get_action_data_with_overrides
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.constants import READ, LIST, WRITE
+from aws_iam_utils.expander import iter_expanded_statements
+from aws_iam_utils.fingerprint import policy_fingerprint
+from aws_iam_utils.util import check_statement_supported
+from aws_iam_utils.util import iter_statement_permission_items
 
 
 def policies_are_equal(p1: dict, p2: dict) -> bool:
     """
     Checks whether two policies give the same permissions. This will expand
-    all wildcards and Resource constraints and then compare the result.
+    all wildcards and Resource constraints and then compare the result, by way
+    of each policy's canonical fingerprint (see `policy_fingerprint()`), so
+    repeated comparisons of the same policies are cheap.
 
     @param p1  The first policy. Should be a dict that contains a Statement
                key, which should be a list of dicts conforming to the AWS IAM
@@ -20,35 +25,99 @@ def policies_are_equal(p1: dict, p2: dict) -> bool:
     @returns True if p1 and p2 represent exactly the same permissions, or
              False otherwise.
     """
-    return extract_policy_permission_items(
-        expand_policy(p1)
-    ) == extract_policy_permission_items(expand_policy(p2))
+    return policy_fingerprint(p1) == policy_fingerprint(p2)
 
 
 def policy_has_only_these_access_levels(p: dict, access_levels: list[str]) -> bool:
     """
-    Returns True if all actions granted under the given policy are Read or
-    List actions.
+    Returns True if all actions granted under the given policy have one of the
+    given access levels. Only Allow statements grant actions, so Deny statements
+    (in any case) are not considered.
+
+    Wildcard actions are checked against the access levels they reach as a whole
+    (cached per pattern by the catalog), so they are not expanded.
     """
-    p_items = extract_policy_permission_items(expand_policy(p))
-    for item in p_items:
-        action_service, action_name = item["action"].split(":")
+    catalog = get_catalog()
+
+    statements = p["Statement"]
+    if type(statements) is dict:
+        statements = [statements]
+
+    for statement in statements:
+        check_statement_supported(statement)
+
+        # Effect is matched case-insensitively, so anything that is not a Deny
+        # is checked, rather than skipping statements that could grant access
+        if (statement.get("Effect") or "").lower() == "deny":
+            continue
+
+        # a statement with an empty Resource list grants nothing
+        if statement.get("Resource", [None]) == []:
+            continue
+
+        if "NotAction" in statement:
+            # NotAction covers every other known action, so check those as a
+            # bitset rather than expanding them
+            levels = catalog.mask_access_levels(
+                catalog.not_action_mask(statement["NotAction"])
+            )
+            if not levels.issubset(access_levels):
+                return False
+
+            continue
 
-        action_output = get_action_data_with_overrides(action_service, action_name)
+        actions = statement.get("Action", [])
+        if type(actions) is str:
+            actions = [actions]
 
-        if action_output is False:
-            raise ValueError(f'invalid action: {item["action"]}')
+        pattern_access_levels = [catalog.match_access_levels(x) for x in actions]
 
-        for action_output_action in action_output[action_service]:
-            if action_output_action["action"].lower() != item["action"].lower():
-                continue
+        for action, levels in zip(actions, pattern_access_levels):
+            if not levels:
+                raise ValueError(f"invalid action: {action.lower()}")
 
-            if action_output_action["access_level"] not in access_levels:
+        for levels in pattern_access_levels:
+            if not levels.issubset(access_levels):
                 return False
 
     return True
 
 
+def _init_check_policies_worker():
+    # load the action data once per worker, rather than once per policy
+    get_catalog()
+
+
+def check_policies(
+    policies: Iterable[dict],
+    access_levels: list[str],
+    workers: int = None,
+    chunksize: int = 16,
+) -> Iterator[bool]:
+    """
+    Runs policy_has_only_these_access_levels() over many policies. If workers is
+    None (the default) or 1, policies are checked in the current process;
+    otherwise the work is spread across a pool of that many processes, each of
+    which loads the action data only once.
+
+    Results are yielded as they become available, in the same order as the input
+    policies.
+    """
+    check = functools.partial(
+        policy_has_only_these_access_levels, access_levels=access_levels
+    )
+
+    if workers is None or workers == 1:
+        yield from map(check, policies)
+        return
+
+    # imported lazily, as most callers check policies in-process
+    import multiprocessing
+
+    with multiprocessing.Pool(workers, initializer=_init_check_policies_worker) as pool:
+        yield from pool.imap(check, policies, chunksize)
+
+
 def is_read_only_policy(p: dict) -> bool:
     """
     Returns True if all actions granted under the given policy are Read or
@@ -82,34 +151,21 @@ def policy_has_only_these_arn_types(
     refer to actions that do not relate to an ARN type (so-called "wildcard
     actions" in policy_sentry).
     """
-    arn_type_actions = {}
+    catalog = get_catalog()
+
+    arn_type_actions = set()
     for arn_type in arn_types:
-        if arn_type == WILDCARD_ARN_TYPE:
-            arn_type_actions[arn_type] = [
-                x.lower()
-                for x in get_actions_that_support_wildcard_arns_only(service_name)
-            ]
-        else:
-            arn_type_actions[arn_type] = [
-                x.lower() for x in get_actions_matching_arn_type(service_name, arn_type)
-            ]
-
-    p_items = extract_policy_permission_items(expand_policy(p))
-    for item in p_items:
-        action_service, action_name = item["action"].split(":")
-
-        action_output = get_action_data_with_overrides(action_service, action_name)
-
-        if action_output is False:
-            raise ValueError(f'invalid action: {item["action"]}')
-
-        action_found = False
-        for arn_type in arn_types:
-            if item["action"].lower() in arn_type_actions[arn_type]:
-                action_found = True
-                break
-
-        if action_found is False:
-            return False
+        arn_type_actions.update(
+            x.action.lower()
+            for x in catalog.actions_matching_arn_type(service_name, arn_type)
+        )
+
+    for statement in iter_expanded_statements(p):
+        for item in iter_statement_permission_items(statement):
+            if item.action not in catalog:
+                raise ValueError(f"invalid action: {item.action}")
+
+            if item.action not in arn_type_actions:
+                return False
 
     return True
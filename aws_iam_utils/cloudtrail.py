@@ -0,0 +1,331 @@
+"""
+Least-privilege policy generation from CloudTrail log files on disk.
+
+CloudTrail delivers its logs as many small gzipped JSON files, each with a
+`Records` list. `aggregate_cloudtrail_files()` reads them one file at a time,
+optionally across a pool of processes, and counts each (principal, eventSource,
+eventName, resource) it sees in a `CloudTrailAggregate`; only the counts are
+kept, not the records. Aggregates from different workers, or from different
+shards of an archive aggregated separately, can be merged with `update()`:
+
+    from aws_iam_utils.cloudtrail import aggregate_cloudtrail_files
+    from aws_iam_utils.cloudtrail import generate_least_privilege_policies
+
+    aggregate = aggregate_cloudtrail_files(["AWSLogs/123456789012/CloudTrail"])
+    policies = generate_least_privilege_policies(aggregate)
+
+Events are mapped to IAM actions with the action catalog; see event_action().
+"""
+
+import functools
+import gzip
+import json
+import os
+import re
+import sys
+from collections import Counter
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.combiner import collapse_policy_statements
+from aws_iam_utils.constants import WILDCARD_ARN_TYPE
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+"""
+Event sources whose service prefix in IAM is not the first part of their
+hostname.
+"""
+EVENT_SOURCE_PREFIXES = {
+    "monitoring.amazonaws.com": "cloudwatch",
+    "email.amazonaws.com": "ses",
+    "tagging.amazonaws.com": "tag",
+    "runtime.sagemaker.amazonaws.com": "sagemaker",
+    "runtime.lex.amazonaws.com": "lex",
+    "data.iot.amazonaws.com": "iot",
+}
+
+"""
+Events (as lowercased `service:eventName`) that are authorized by an IAM action
+with a different name.
+"""
+EVENT_ACTION_OVERRIDES = {
+    "s3:listbuckets": "s3:ListAllMyBuckets",
+    "s3:listobjects": "s3:ListBucket",
+    "s3:listobjectsv2": "s3:ListBucket",
+    "s3:listobjectversions": "s3:ListBucketVersions",
+    "s3:headbucket": "s3:ListBucket",
+    "s3:headobject": "s3:GetObject",
+    "s3:copyobject": "s3:PutObject",
+    "s3:createmultipartupload": "s3:PutObject",
+    "s3:uploadpart": "s3:PutObject",
+    "s3:uploadpartcopy": "s3:PutObject",
+    "s3:completemultipartupload": "s3:PutObject",
+    "s3:deleteobjects": "s3:DeleteObject",
+    "lambda:invoke": "lambda:InvokeFunction",
+}
+
+# Lambda events carry the API version, e.g. "UpdateFunctionConfiguration20150331v2"
+_API_VERSION_SUFFIX = re.compile(r"\d{8}(v\d+)?$")
+
+# files per task when aggregating across a process pool; CloudTrail files are
+# small, so each task should cover several to be worth sending to a worker
+_FILES_PER_TASK = 16
+
+
+@functools.lru_cache(maxsize=4096)
+def event_action(event_source: str, event_name: str) -> Optional[str]:
+    """Returns the IAM action that authorizes the given CloudTrail event (e.g.
+    `s3:ListBucket` for `s3.amazonaws.com` and `ListObjects`), or None if there
+    is no such action in the catalog."""
+    service_name = EVENT_SOURCE_PREFIXES.get(event_source, event_source.split(".")[0])
+    action = f"{service_name}:{_API_VERSION_SUFFIX.sub('', event_name)}"
+    action = EVENT_ACTION_OVERRIDES.get(action.lower(), action)
+
+    action_data = get_catalog().get(action)
+    if action_data is None:
+        return None
+
+    return action_data.action
+
+
+def _record_principal(record: dict) -> Optional[str]:
+    # sessions of an assumed role are attributed to the role itself
+    identity = record.get("userIdentity") or {}
+    issuer = (identity.get("sessionContext") or {}).get("sessionIssuer") or {}
+
+    return issuer.get("arn") or identity.get("arn")
+
+
+def _is_access_denied(record: dict) -> bool:
+    error_code = record.get("errorCode") or ""
+    return "AccessDenied" in error_code or "Unauthorized" in error_code
+
+
+def _record_resources(record: dict, action: Optional[str]) -> list[str]:
+    """Returns the ARNs of the resources an event acted on that a policy can
+    name for its action, or ["*"] if there are none."""
+    resources = [x for x in record.get("resources") or [] if x.get("ARN")]
+
+    action_data = get_catalog().get(action) if action is not None else None
+    if action_data is not None:
+        if action_data.resource_arn_types == (WILDCARD_ARN_TYPE,):
+            return ["*"]
+
+        # e.g. S3 object events list both the object and its bucket; keep only
+        # the resource types that the action applies to
+        matching = [
+            x
+            for x in resources
+            if (x.get("type") or "").split("::")[-1].lower()
+            in action_data.resource_arn_types
+        ]
+        resources = matching or resources
+
+    return [x["ARN"] for x in resources] or ["*"]
+
+
+class CloudTrailAggregate:
+    """
+    Counts of CloudTrail events by (principal ARN, eventSource, eventName,
+    resource ARN). Events without a resource ARN are counted against "*".
+
+    The strings in the keys are interned, so the many keys that share a
+    principal, event source or resource share a single copy of it.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.n_records = 0
+        self.n_skipped = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __eq__(self, other):
+        if not isinstance(other, CloudTrailAggregate):
+            return NotImplemented
+
+        return (self.counts, self.n_records, self.n_skipped) == (
+            other.counts,
+            other.n_records,
+            other.n_skipped,
+        )
+
+    def add_record(self, record: dict, include_denied: bool = False):
+        """Counts a single CloudTrail record. Records without a principal ARN
+        (e.g. calls made by AWS services) and, unless include_denied is True,
+        calls that were denied are skipped."""
+        self.n_records += 1
+
+        principal = _record_principal(record)
+        event_source = record.get("eventSource")
+        event_name = record.get("eventName")
+
+        if (
+            not principal
+            or not event_source
+            or not event_name
+            or (not include_denied and _is_access_denied(record))
+        ):
+            self.n_skipped += 1
+            return
+
+        principal = sys.intern(principal)
+        event_source = sys.intern(event_source)
+        event_name = sys.intern(event_name)
+
+        action = event_action(event_source, event_name)
+        for resource in _record_resources(record, action):
+            self.counts[principal, event_source, event_name, sys.intern(resource)] += 1
+
+    def update(self, other: "CloudTrailAggregate"):
+        """Adds the counts from another aggregate to this one."""
+        self.counts.update(other.counts)
+        self.n_records += other.n_records
+        self.n_skipped += other.n_skipped
+
+    def as_dict(self) -> dict:
+        """Returns the aggregate as a JSON-serializable dict, e.g. to store
+        aggregates of separate shards of an archive for merging later."""
+        return {
+            "counts": [[*k, n] for k, n in self.counts.items()],
+            "n_records": self.n_records,
+            "n_skipped": self.n_skipped,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "CloudTrailAggregate":
+        """Returns an aggregate from the output of as_dict()."""
+        aggregate = cls()
+        aggregate.n_records = d["n_records"]
+        aggregate.n_skipped = d["n_skipped"]
+
+        for *k, n in d["counts"]:
+            aggregate.counts[tuple(map(sys.intern, k))] += n
+
+        return aggregate
+
+    def unmapped_events(self) -> Counter:
+        """Returns the number of events for each (eventSource, eventName) that
+        could not be mapped to an IAM action."""
+        result = Counter()
+        for (_, event_source, event_name, _), n in self.counts.items():
+            if event_action(event_source, event_name) is None:
+                result[event_source, event_name] += n
+
+        return result
+
+
+def iter_cloudtrail_files(*paths: str) -> Iterator[str]:
+    """Yields the path of every CloudTrail log file (`.json` or `.json.gz`) in the
+    given files and directories, recursively and in sorted order. Digest files
+    are skipped."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+
+        for dir_path, dir_names, file_names in os.walk(path):
+            dir_names[:] = sorted(x for x in dir_names if x != "CloudTrail-Digest")
+
+            for file_name in sorted(file_names):
+                if file_name.endswith((".json", ".json.gz")):
+                    yield os.path.join(dir_path, file_name)
+
+
+def iter_cloudtrail_records(path: str) -> Iterator[dict]:
+    """Yields the records in a single CloudTrail log file, gzipped or not."""
+    opener = gzip.open if path.endswith(".gz") else open
+
+    with opener(path, "rb") as f:
+        records = json.load(f).get("Records") or []
+
+    yield from records
+
+
+def _aggregate_files(job: tuple) -> CloudTrailAggregate:
+    paths, include_denied = job
+
+    aggregate = CloudTrailAggregate()
+    for path in paths:
+        for record in iter_cloudtrail_records(path):
+            aggregate.add_record(record, include_denied=include_denied)
+
+    return aggregate
+
+
+def aggregate_cloudtrail_files(
+    paths: Iterable[str], workers: int = None, include_denied: bool = False
+) -> CloudTrailAggregate:
+    """
+    Aggregates every CloudTrail log file in the given files and directories (see
+    iter_cloudtrail_files()). Only one file's records are held in memory at a
+    time (per worker).
+
+    If workers is given, the files are spread across that many processes, each
+    of which returns an aggregate of its files to be merged.
+    """
+    files = list(iter_cloudtrail_files(*paths))
+
+    if workers is None or workers == 1:
+        return _aggregate_files((files, include_denied))
+
+    jobs = [
+        (files[i : i + _FILES_PER_TASK], include_denied)
+        for i in range(0, len(files), _FILES_PER_TASK)
+    ]
+
+    # only archives aggregated with several workers need a pool, so keep the
+    # import out of the serial path
+    import multiprocessing
+
+    aggregate = CloudTrailAggregate()
+    with multiprocessing.Pool(workers) as pool:
+        for partial_aggregate in pool.imap_unordered(_aggregate_files, jobs):
+            aggregate.update(partial_aggregate)
+
+    return aggregate
+
+
+def generate_least_privilege_policies(
+    aggregate: CloudTrailAggregate, min_count: int = 1
+) -> dict[str, dict]:
+    """
+    Generates a policy for each principal in the aggregate, returning a dict of
+    principal ARN to policy, which allows the actions for the events the
+    principal made at least min_count times on the resources they were made on.
+
+    Events that cannot be mapped to an IAM action (see unmapped_events()) are
+    left out, so check those before using the policies.
+    """
+    # principal -> resource -> actions (as an ordered set)
+    actions_by_principal = {}
+
+    for (principal, event_source, event_name, resource), n in sorted(
+        aggregate.counts.items()
+    ):
+        if n < min_count:
+            continue
+
+        action = event_action(event_source, event_name)
+        if action is None:
+            continue
+
+        actions_by_resource = actions_by_principal.setdefault(principal, {})
+        actions_by_resource.setdefault(resource, {})[action] = None
+
+    return {
+        principal: collapse_policy_statements(
+            create_policy(
+                *[
+                    statement(actions=list(actions), resource=resource)
+                    for resource, actions in sorted(actions_by_resource.items())
+                ]
+            ),
+            merge_resources=True,
+        )
+        for principal, actions_by_resource in sorted(actions_by_principal.items())
+    }
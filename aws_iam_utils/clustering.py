@@ -0,0 +1,226 @@
+"""
+Finds groups of equivalent or similar policies in a large collection.
+
+`group_equivalent_policies()` groups policies that grant exactly the same
+permissions, by fingerprint, in a single pass: each policy is expanded once,
+rather than once for each pair as with `policies_are_equal()`.
+
+`group_similar_policies()` also groups policies that grant mostly the same
+permissions. Each distinct policy is reduced to a MinHash signature of the
+(effect, action, resource, condition, principal) items it grants, and
+signatures are bucketed with locality-sensitive hashing (LSH), so only
+policies that share a bucket are compared.
+
+Both take an iterable of (key, policy) pairs, such as policy names or ARNs and
+their documents, and only keep the keys and a fingerprint (and signature) per
+distinct policy, so the policies themselves can be streamed from anywhere.
+"""
+
+import array
+import functools
+import hashlib
+import json
+from typing import Hashable
+from typing import Iterable
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.catalog import ids_from_mask
+from aws_iam_utils.fingerprint import normalized_permission_set
+from aws_iam_utils.fingerprint import permission_set_fingerprint
+from aws_iam_utils.fingerprint import policy_fingerprint
+from aws_iam_utils.permission_set import PermissionSet
+from aws_iam_utils.util import resource_element
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_THRESHOLD = 0.8
+
+_MASK64 = (1 << 64) - 1
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _action_hash(l_action: str) -> int:
+    return _hash64(l_action)
+
+
+def _mix64(x: int) -> int:
+    # the splitmix64 finalizer, to spread (action hash ^ group hash) evenly
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def policy_minhash(policy: dict, num_perm: int = DEFAULT_NUM_PERM) -> tuple:
+    """
+    Returns a MinHash signature (a tuple of num_perm 64-bit ints) of the permission
+    items granted by the given policy, after normalizing it as for
+    policy_fingerprint(). The fraction of equal values in two policies'
+    signatures estimates the Jaccard similarity of their permission items: see
+    estimate_similarity().
+
+    Uses one-permutation hashing: each item is hashed once and falls into one
+    of num_perm bins, keeping the minimum hash in each, so the cost is linear
+    in the number of items rather than num_perm times that. Empty bins are
+    filled from other bins ("densification").
+    """
+    return _permission_set_minhash(normalized_permission_set(policy), num_perm)
+
+
+def _permission_set_minhash(permission_set: PermissionSet, num_perm: int) -> tuple:
+    catalog = get_catalog()
+
+    bins = [None] * num_perm
+
+    for (effect, resource, condition, principal), mask in permission_set.groups.items():
+        group_hash = _hash64(
+            json.dumps(
+                [effect, dict([resource_element(resource)]), condition, principal],
+                sort_keys=True,
+            )
+        )
+
+        for action_id in ids_from_mask(mask):
+            h = _mix64(_action_hash(catalog.action_name(action_id)) ^ group_hash)
+            i = h % num_perm
+            value = h // num_perm
+
+            if bins[i] is None or value < bins[i]:
+                bins[i] = value
+
+    if all(x is None for x in bins):
+        return (_MASK64,) * num_perm
+
+    # an empty bin takes the value of a non-empty bin chosen by hashing its
+    # index, so that sparse signatures stay independent ("optimal
+    # densification", Shrivastava 2017)
+    signature = list(bins)
+    for i in range(num_perm):
+        attempt = 0
+        while signature[i] is None:
+            attempt += 1
+            signature[i] = bins[_mix64((i << 32) | attempt) % num_perm]
+
+    return tuple(signature)
+
+
+def estimate_similarity(signature1: tuple, signature2: tuple) -> float:
+    """Returns the estimated Jaccard similarity of the permission items of two
+    policies, given their policy_minhash() signatures."""
+    if len(signature1) != len(signature2):
+        raise ValueError("signatures must have the same number of values")
+
+    return sum(1 for a, b in zip(signature1, signature2) if a == b) / len(signature1)
+
+
+def _lsh_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """Returns the number of bands and rows per band (dividing num_perm) whose
+    LSH threshold, roughly (1 / bands) ** (1 / rows), is the highest that is not
+    above the given similarity threshold, so that pairs above it are rarely
+    missed."""
+    options = [
+        (bands, num_perm // bands)
+        for bands in range(1, num_perm + 1)
+        if num_perm % bands == 0
+    ]
+
+    return max(
+        options,
+        key=lambda x: (
+            (1 / x[0]) ** (1 / x[1]) <= threshold,
+            -abs((1 / x[0]) ** (1 / x[1]) - threshold),
+        ),
+    )
+
+
+def group_equivalent_policies(
+    policies: Iterable[tuple[Hashable, dict]], min_size: int = 2
+) -> list[list]:
+    """
+    Groups the keys of the given (key, policy) pairs by policy_fingerprint(),
+    i.e. so that the policies in each group grant exactly the same permissions,
+    and returns the groups with at least min_size keys, in order of first
+    appearance. With min_size=1, every key is in exactly one group.
+    """
+    groups = {}
+    for key, policy in policies:
+        groups.setdefault(policy_fingerprint(policy), []).append(key)
+
+    return [keys for keys in groups.values() if len(keys) >= min_size]
+
+
+def group_similar_policies(
+    policies: Iterable[tuple[Hashable, dict]],
+    threshold: float = DEFAULT_THRESHOLD,
+    num_perm: int = DEFAULT_NUM_PERM,
+    min_size: int = 2,
+) -> list[list]:
+    """
+    Groups the keys of the given (key, policy) pairs so that each policy is in
+    the same group as any policy whose estimated similarity to it (see
+    estimate_similarity()) is at least threshold, and returns the groups with
+    at least min_size keys, in order of first appearance. Similarity is
+    transitive here: A and C are grouped if both are similar to B.
+
+    Equivalent policies (with the same policy_fingerprint()) are always in the
+    same group. Each policy is expanded once, and its fingerprint and (for each
+    distinct policy) its signature are both taken from that one expansion.
+    Policies are compared only if their signatures share an LSH bucket, so a
+    pair just above the threshold may occasionally be missed.
+    """
+    bands, rows = _lsh_bands(num_perm, threshold)
+
+    # fingerprint -> keys, and -> its index in signatures (held as arrays, as
+    # they add up) and parents (a union-find forest of the groups)
+    keys = {}
+    indexes = {}
+    signatures = []
+    parents = []
+
+    # (band, band values) -> indexes of fingerprints with those values
+    buckets = {}
+
+    def find(i: int) -> int:
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    for key, policy in policies:
+        permission_set = normalized_permission_set(policy)
+        fingerprint = permission_set_fingerprint(permission_set)
+
+        if fingerprint in keys:
+            keys[fingerprint].append(key)
+            continue
+
+        keys[fingerprint] = [key]
+
+        i = len(signatures)
+        signature = array.array("Q", _permission_set_minhash(permission_set, num_perm))
+        signatures.append(signature)
+        signature_bytes = signature.tobytes()
+        parents.append(i)
+        indexes[fingerprint] = i
+
+        candidates = set()
+        for band in range(bands):
+            bucket = buckets.setdefault(
+                (band, signature_bytes[band * rows * 8 : (band + 1) * rows * 8]), []
+            )
+            candidates.update(bucket)
+            bucket.append(i)
+
+        for j in candidates:
+            if estimate_similarity(signature, signatures[j]) >= threshold:
+                parents[find(i)] = find(j)
+
+    groups = {}
+    for fingerprint, fingerprint_keys in keys.items():
+        groups.setdefault(find(indexes[fingerprint]), []).extend(fingerprint_keys)
+
+    return [x for x in groups.values() if len(x) >= min_size]
@@ -1,8 +1,11 @@
-import json
 from itertools import chain
 
-from aws_iam_utils.util import extract_policy_permission_items
+from aws_iam_utils.util import iter_policy_permission_items
 from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import freeze
+from aws_iam_utils.util import FrozenList
+from aws_iam_utils.util import resource_element
+from aws_iam_utils.util import thaw
 
 
 def combine_policy_statements(*policies: dict) -> dict:
@@ -19,17 +22,34 @@ def combine_policy_statements(*policies: dict) -> dict:
     )
 
 
-def collapse_policy_statements(*policies: dict) -> dict:
+def collapse_policy_statements(*policies: dict, merge_resources: bool = False) -> dict:
     """
     Attempts to merge policy statements together as far as possible, in order to
     simplify and shorten your policy. All statements with equal Effect, Condition,
     Principal and Resource keys will have their Actions merged together.
+
+    If merge_resources is True, statements that then have equal Effect, Condition,
+    Principal and Actions are also merged, with a Resource list covering all of
+    their resources. Groups are matched by hashing their action sets, so this
+    stays linear in the size of the policy.
+
+    Statements with NotAction cover nearly every action, so rather than being
+    expanded they are kept as they are (with duplicates removed), after the
+    collapsed statements.
     """
 
     # create a single policy with all Statements combined together
     combined_policy = combine_policy_statements(*policies)
 
-    items = extract_policy_permission_items(combined_policy)
+    statements = []
+    not_action_statements = {}
+    for st in combined_policy["Statement"]:
+        if "NotAction" in st:
+            not_action_statements[freeze(st)] = None
+        else:
+            statements.append(st)
+
+    items = iter_policy_permission_items({"Statement": statements})
 
     # to combine, we group all actions by their effect/resource/condition/principal,
     # and then generate a new policy with statements for each unique combination
@@ -37,36 +57,68 @@ def collapse_policy_statements(*policies: dict) -> dict:
     actions_by_qualifiers = {}
 
     for item in items:
-        # turn into json so we can use nested dicts/lists/etc as dict keys
-        k = json.dumps(
-            [item["effect"], item["condition"], item["resource"], item["principal"]]
+        # freeze nested dicts/lists so the qualifiers can be used as a dict key
+        k = (
+            item.effect,
+            freeze(item.condition),
+            freeze(item.resource),
+            freeze(item.principal),
         )
 
-        if k not in actions_by_qualifiers:
-            actions_by_qualifiers[k] = []
+        actions = actions_by_qualifiers.get(k)
+        if actions is None:
+            actions = actions_by_qualifiers[k] = {}
+
+        # a dict is used as an ordered set, so that duplicate actions are removed
+        # while retaining their original order
+        actions[item.action] = None
+
+    if merge_resources:
+        # regroup by effect/condition/principal/actions, collecting the resources
+        # for each unique combination (statements without a Resource, or with
+        # NotResource, are never merged with those that have a Resource)
+        resources_by_qualifiers = {}
+
+        for k, actions in actions_by_qualifiers.items():
+            effect, condition, resource, principal = k
+
+            if type(resource) is str:
+                resource_kind = "Resource"
+            else:
+                resource_kind = resource
 
-        actions_by_qualifiers[k].append(item["action"])
+            k = (effect, condition, principal, resource_kind, frozenset(actions))
+
+            group = resources_by_qualifiers.get(k)
+            if group is None:
+                group = resources_by_qualifiers[k] = (actions, [])
+
+            group[1].append(resource)
+
+        actions_by_qualifiers = {}
+        for k, (actions, resources) in resources_by_qualifiers.items():
+            effect, condition, principal = k[:3]
+
+            resource = resources[0] if len(resources) == 1 else FrozenList(resources)
+            actions_by_qualifiers[(effect, condition, resource, principal)] = actions
 
     new_policy_statements = []
     for qualifiers, actions in actions_by_qualifiers.items():
         new_statement = {}
-        qualifiers_loaded = json.loads(qualifiers)
 
         for k, v in {
-            "Effect": qualifiers_loaded[0],
-            "Condition": qualifiers_loaded[1],
-            "Resource": qualifiers_loaded[2],
-            "Principal": qualifiers_loaded[3],
+            "Effect": qualifiers[0],
+            "Condition": qualifiers[1],
+            **dict([resource_element(qualifiers[2])]),
+            "Principal": qualifiers[3],
         }.items():
             if v is not None:
-                new_statement[k] = v
-
-        # finally, remove duplicate actions while retaining original order
-        # https://stackoverflow.com/a/25560184
-        deduped_actions = sorted(set(actions), key=lambda x: actions.index(x))
+                new_statement[k] = thaw(v)
 
-        new_statement["Action"] = deduped_actions
+        new_statement["Action"] = list(actions)
 
         new_policy_statements.append(new_statement)
 
+    new_policy_statements.extend(thaw(x) for x in not_action_statements)
+
     return {"Version": combined_policy["Version"], "Statement": new_policy_statements}
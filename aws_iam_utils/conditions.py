@@ -0,0 +1,327 @@
+"""
+Compiles IAM policy Condition blocks into predicates over a request context.
+
+A request context is a dict of condition keys (e.g. `aws:SourceIp`) to their
+values in the request; multivalued keys (e.g. `aws:TagKeys`) are given as lists.
+Keys are matched case-insensitively, as in IAM.
+
+Everything that can be worked out from the Condition block alone (regexes for
+`*Like` operators, parsed CIDRs, numbers and dates) is done once, when the
+condition is compiled, so the resulting predicates can be evaluated against
+many requests cheaply.
+"""
+
+import datetime
+import functools
+import ipaddress
+from typing import Callable
+
+from aws_iam_utils.wildcards import compile_wildcard
+from aws_iam_utils.wildcards import has_wildcards
+
+_SET_OPERATOR_PREFIXES = ("ForAnyValue:", "ForAllValues:")
+
+_MISSING = object()
+
+
+def _as_list(value) -> list:
+    # nb: isinstance, so that frozen lists (see util.freeze) count too
+    if isinstance(value, (list, tuple)):
+        return list(value)
+
+    return [value]
+
+
+def _as_string(value) -> str:
+    if type(value) is bool:
+        return "true" if value else "false"
+
+    return str(value)
+
+
+def _parse_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_date(value):
+    """Parses an ISO 8601 date or a number of seconds since the epoch into a
+    timestamp, or returns None."""
+    if type(value) in (int, float):
+        return float(value)
+
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+
+    value = _as_string(value)
+
+    timestamp = _parse_number(value)
+    if timestamp is not None:
+        return timestamp
+
+    try:
+        date = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+
+    return date.timestamp()
+
+
+def _string_equals(values):
+    values = frozenset(_as_string(x) for x in values)
+    return lambda value: _as_string(value) in values
+
+
+def _string_equals_ignore_case(values):
+    values = frozenset(_as_string(x).lower() for x in values)
+    return lambda value: _as_string(value).lower() in values
+
+
+def _string_like(values):
+    values = [_as_string(x) for x in values]
+
+    if not any(has_wildcards(x) for x in values):
+        return _string_equals(values)
+
+    regexes = [compile_wildcard(x) for x in values]
+    return lambda value: any(r.fullmatch(_as_string(value)) for r in regexes)
+
+
+def _parse_all(parse, values) -> list:
+    """Parses each of a condition's values, raising ValueError for any that
+    cannot be parsed (rather than letting the condition silently never match)."""
+    result = [parse(x) for x in values]
+    if None in result:
+        raise ValueError(f"invalid condition values: {values}")
+
+    return result
+
+
+def _compare(parse, compare):
+    def make_matcher(values):
+        parsed_values = _parse_all(parse, values)
+
+        def matches(value):
+            value = parse(value)
+            if value is None:
+                return False
+
+            return any(compare(value, x) for x in parsed_values)
+
+        return matches
+
+    return make_matcher
+
+
+def _parse_bool(value):
+    value = _as_string(value).lower()
+    return value if value in ("true", "false") else None
+
+
+def _bool(values):
+    values = frozenset(_parse_all(_parse_bool, values))
+    return lambda value: _as_string(value).lower() in values
+
+
+def _ip_address(values):
+    networks = [ipaddress.ip_network(_as_string(x), strict=False) for x in values]
+
+    def matches(value):
+        try:
+            address = ipaddress.ip_address(_as_string(value))
+        except ValueError:
+            return False
+
+        return any(address in network for network in networks)
+
+    return matches
+
+
+def _split_arn(arn: str):
+    parts = arn.split(":", 5)
+    if len(parts) != 6:
+        return None
+
+    return parts
+
+
+def _arn_like(values):
+    # each of the six parts of the ARN is matched separately; a bare "*"
+    # matches every ARN
+    patterns = [
+        [compile_wildcard(x) for x in parts]
+        for parts in _parse_all(
+            lambda x: ["*"] * 6 if x == "*" else _split_arn(_as_string(x)), values
+        )
+    ]
+
+    def matches(value):
+        parts = _split_arn(_as_string(value))
+        if parts is None:
+            return False
+
+        return any(
+            all(r.fullmatch(part) for r, part in zip(pattern, parts))
+            for pattern in patterns
+        )
+
+    return matches
+
+
+# operator -> (function that builds a matcher for a single context value from
+# the condition's values, whether the operator is negated)
+_OPERATORS = {
+    "StringEquals": (_string_equals, False),
+    "StringNotEquals": (_string_equals, True),
+    "StringEqualsIgnoreCase": (_string_equals_ignore_case, False),
+    "StringNotEqualsIgnoreCase": (_string_equals_ignore_case, True),
+    "StringLike": (_string_like, False),
+    "StringNotLike": (_string_like, True),
+    "NumericEquals": (_compare(_parse_number, lambda a, b: a == b), False),
+    "NumericNotEquals": (_compare(_parse_number, lambda a, b: a == b), True),
+    "NumericLessThan": (_compare(_parse_number, lambda a, b: a < b), False),
+    "NumericLessThanEquals": (_compare(_parse_number, lambda a, b: a <= b), False),
+    "NumericGreaterThan": (_compare(_parse_number, lambda a, b: a > b), False),
+    "NumericGreaterThanEquals": (
+        _compare(_parse_number, lambda a, b: a >= b),
+        False,
+    ),
+    "DateEquals": (_compare(_parse_date, lambda a, b: a == b), False),
+    "DateNotEquals": (_compare(_parse_date, lambda a, b: a == b), True),
+    "DateLessThan": (_compare(_parse_date, lambda a, b: a < b), False),
+    "DateLessThanEquals": (_compare(_parse_date, lambda a, b: a <= b), False),
+    "DateGreaterThan": (_compare(_parse_date, lambda a, b: a > b), False),
+    "DateGreaterThanEquals": (_compare(_parse_date, lambda a, b: a >= b), False),
+    "Bool": (_bool, False),
+    "BinaryEquals": (_string_equals, False),
+    "IpAddress": (_ip_address, False),
+    "NotIpAddress": (_ip_address, True),
+    "ArnEquals": (_arn_like, False),
+    "ArnNotEquals": (_arn_like, True),
+    "ArnLike": (_arn_like, False),
+    "ArnNotLike": (_arn_like, True),
+}
+
+
+def _context_value(context: dict, key: str):
+    value = context.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    l_key = key.lower()
+    for k, v in context.items():
+        if k.lower() == l_key:
+            return v
+
+    return _MISSING
+
+
+def _compile_null(key: str, values) -> Callable[[dict], bool]:
+    # Null: true means the key must be absent, false means it must be present
+    expect_missing = _parse_all(_parse_bool, _as_list(values)[:1]) == ["true"]
+
+    def test(context):
+        value = _context_value(context, key)
+        is_missing = value is _MISSING or value is None or value == []
+
+        return is_missing == expect_missing
+
+    return test
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_operator(operator: str) -> tuple[str, str, bool]:
+    """Splits an operator into its set operator prefix (or ""), base operator, and
+    whether it has the IfExists suffix."""
+    set_operator = ""
+    for prefix in _SET_OPERATOR_PREFIXES:
+        if operator.startswith(prefix):
+            set_operator = prefix[:-1]
+            operator = operator[len(prefix) :]
+
+    if_exists = operator.endswith("IfExists")
+    if if_exists:
+        operator = operator[: -len("IfExists")]
+
+    return set_operator, operator, if_exists
+
+
+def compile_condition_key(operator: str, key: str, values) -> Callable[[dict], bool]:
+    """
+    Returns a predicate that takes a request context and returns True if the
+    given condition key satisfies the given operator and values, e.g.
+    `compile_condition_key("StringLike", "s3:prefix", ["home/*"])`.
+
+    Raises ValueError if the operator is not supported, if any of the values
+    cannot be parsed for the operator, or if they use policy variables.
+    """
+    if any("${" in _as_string(x) for x in _as_list(values)):
+        raise ValueError(f"policy variables are not supported: {key}: {values}")
+
+    set_operator, base_operator, if_exists = _parse_operator(operator)
+
+    if base_operator == "Null":
+        return _compile_null(key, values)
+
+    if base_operator not in _OPERATORS:
+        raise ValueError(f"unsupported condition operator: {operator}")
+
+    make_matcher, negated = _OPERATORS[base_operator]
+    matches = make_matcher(_as_list(values))
+
+    def test(context):
+        value = _context_value(context, key)
+
+        if value is _MISSING:
+            if if_exists or set_operator == "ForAllValues":
+                return True
+
+            if set_operator == "ForAnyValue":
+                return False
+
+            return negated
+
+        context_values = _as_list(value)
+
+        if set_operator == "ForAllValues":
+            return all(matches(x) != negated for x in context_values)
+
+        if set_operator == "ForAnyValue":
+            return any(matches(x) != negated for x in context_values)
+
+        return any(matches(x) for x in context_values) != negated
+
+    return test
+
+
+def compile_condition(condition: dict) -> Callable[[dict], bool]:
+    """
+    Compiles an IAM Condition block into a predicate that takes a request context
+    (a dict of condition keys to values) and returns True if the condition is
+    met. As in IAM, all operators and all keys must be satisfied, and a key is
+    satisfied if any of its values match.
+
+    Supports the String, Numeric, Date, Bool, BinaryEquals, IpAddress, Arn and
+    Null operators, their IfExists variants, and the ForAnyValue and
+    ForAllValues set operators. Raises ValueError if the condition uses an
+    unsupported operator, values that cannot be parsed for their operator, or
+    policy variables, so that a condition is never silently treated as unmet.
+    """
+    tests = [
+        compile_condition_key(operator, key, values)
+        for operator, keys in (condition or {}).items()
+        for key, values in keys.items()
+    ]
+
+    if not tests:
+        return lambda context: True
+
+    if len(tests) == 1:
+        return tests[0]
+
+    return lambda context: all(test(context) for test in tests)
@@ -0,0 +1,226 @@
+import functools
+import re
+from typing import Iterable
+from typing import Iterator
+from typing import NamedTuple
+from typing import Union
+
+from aws_iam_utils.conditions import compile_condition
+from aws_iam_utils.util import NotResource
+from aws_iam_utils.util import freeze
+from aws_iam_utils.util import iter_statement_permission_items
+from aws_iam_utils.wildcards import compile_wildcard
+from aws_iam_utils.wildcards import has_wildcards
+
+# evaluation decisions, named as in the IAM policy simulator
+ALLOWED = "allowed"
+EXPLICIT_DENY = "explicitDeny"
+IMPLICIT_DENY = "implicitDeny"
+
+
+def _match_any(resource: str) -> bool:
+    return True
+
+
+def _match_none(resource: str) -> bool:
+    return False
+
+
+def compile_resource_matcher(patterns: Iterable[Union[str, NotResource, None]]):
+    """
+    Returns a function that takes a resource ARN and returns True if it matches
+    any of the given resource patterns. All patterns are combined into a single
+    regex. A pattern of None (a statement with no Resource) or `*` matches
+    everything, and a NotResource matches everything it does not exclude.
+    """
+    patterns = set(patterns)
+
+    not_resources = [x for x in patterns if type(x) is NotResource]
+    if not_resources:
+        matches = compile_resource_matcher(patterns.difference(not_resources))
+
+        return lambda resource: matches(resource) or any(
+            x.matches(resource) for x in not_resources
+        )
+
+    if None in patterns or "*" in patterns:
+        return _match_any
+
+    if not patterns:
+        return _match_none
+
+    if not any(has_wildcards(x) for x in patterns):
+        return frozenset(patterns).__contains__
+
+    regex = re.compile(
+        "|".join(compile_wildcard(x).pattern for x in sorted(patterns)), re.DOTALL
+    )
+
+    return lambda resource: regex.fullmatch(resource) is not None
+
+
+class _ActionRules(NamedTuple):
+    """The compiled rules from a policy that apply to a single action."""
+
+    deny: object
+    conditional_deny: tuple
+    allow: object
+    conditional_allow: tuple
+
+
+class PolicyEvaluator:
+    """
+    Evaluates requests (an action on a resource) against one or more identity
+    policies, following IAM's evaluation logic: a matching Deny always wins,
+    otherwise a matching Allow allows the request, and otherwise it is implicitly
+    denied.
+
+    The policies are compiled once, into a map from each action (or action
+    pattern) to the statements that mention it, and for each action the resource
+    patterns of its Allow and Deny statements are compiled into a single
+    matcher each. These are cached per action, so evaluating a request usually
+    costs a dict lookup and one or two regex matches.
+
+    Policies are read with the same semantics as extract_policy_permission_items,
+    except that NotAction is kept as an exclusion rather than resolved against
+    the catalog, so it also covers actions the catalog does not know about.
+    NotPrincipal is not supported, and principals are ignored. Conditions are
+    evaluated against the request context with
+    `aws_iam_utils.conditions.compile_condition()`; a Condition it cannot
+    evaluate raises ValueError here rather than being treated as unmet.
+    """
+
+    def __init__(self, *policies: dict, cache_size: int = 65536):
+        # (effect, condition) -> resources, for each action and action pattern,
+        # and for each set of NotAction patterns
+        self._exact_actions = {}
+        self._wildcard_actions = {}
+        self._not_actions = {}
+
+        # frozen Condition block -> compiled predicate, compiled up front so that
+        # unsupported operators are reported straight away
+        self._conditions = {}
+
+        for policy in policies:
+            statements = policy["Statement"]
+            if type(statements) is dict:
+                statements = [statements]
+
+            for statement in statements:
+                not_actions = None
+                if "NotAction" in statement:
+                    not_actions = statement["NotAction"]
+                    if type(not_actions) is str:
+                        not_actions = [not_actions]
+
+                    not_actions = frozenset(x.lower() for x in not_actions)
+
+                    # read the rest of the statement as if it applied to "*"
+                    statement = {
+                        **{k: v for k, v in statement.items() if k != "NotAction"},
+                        "Action": "*",
+                    }
+
+                for item in iter_statement_permission_items(statement):
+                    if not_actions is not None:
+                        target = self._not_actions.setdefault(not_actions, {})
+                    elif has_wildcards(item.action):
+                        target = self._wildcard_actions.setdefault(item.action, {})
+                    else:
+                        target = self._exact_actions.setdefault(item.action, {})
+
+                    k = (item.effect.lower() == "deny", freeze(item.condition))
+                    if k[1] is not None and k[1] not in self._conditions:
+                        self._conditions[k[1]] = compile_condition(k[1])
+
+                    target.setdefault(k, []).append(item.resource)
+
+        self._wildcard_action_regexes = [
+            (compile_wildcard(x), x) for x in self._wildcard_actions
+        ]
+        self._not_action_regexes = [
+            ([compile_wildcard(x) for x in not_actions], not_actions)
+            for not_actions in self._not_actions
+        ]
+
+        self._rules_for_action = functools.lru_cache(maxsize=cache_size)(
+            self.__rules_for_action
+        )
+
+    def __rules_for_action(self, action: str) -> _ActionRules:
+        l_action = action.lower()
+
+        groups = [self._exact_actions.get(l_action, {})]
+        for regex, pattern in self._wildcard_action_regexes:
+            if regex.fullmatch(l_action):
+                groups.append(self._wildcard_actions[pattern])
+
+        for regexes, not_actions in self._not_action_regexes:
+            if not any(regex.fullmatch(l_action) for regex in regexes):
+                groups.append(self._not_actions[not_actions])
+
+        resources = {}
+        for group in groups:
+            for k, group_resources in group.items():
+                resources.setdefault(k, []).extend(group_resources)
+
+        rules = {True: ([], []), False: ([], [])}
+        for (is_deny, condition), k_resources in resources.items():
+            unconditional, conditional = rules[is_deny]
+
+            if condition is None:
+                unconditional.extend(k_resources)
+            else:
+                conditional.append(
+                    (
+                        self._conditions[condition],
+                        compile_resource_matcher(k_resources),
+                    )
+                )
+
+        return _ActionRules(
+            deny=compile_resource_matcher(rules[True][0]),
+            conditional_deny=tuple(rules[True][1]),
+            allow=compile_resource_matcher(rules[False][0]),
+            conditional_allow=tuple(rules[False][1]),
+        )
+
+    def evaluate(self, action: str, resource: str = "*", context: dict = None) -> str:
+        """
+        Evaluates a request for the given action on the given resource, with the
+        given request context (condition keys and their values), and returns
+        ALLOWED, EXPLICIT_DENY or IMPLICIT_DENY.
+        """
+        rules = self._rules_for_action(action)
+
+        if rules.deny(resource):
+            return EXPLICIT_DENY
+
+        for condition, matches in rules.conditional_deny:
+            if matches(resource) and condition(context or {}):
+                return EXPLICIT_DENY
+
+        if rules.allow(resource):
+            return ALLOWED
+
+        for condition, matches in rules.conditional_allow:
+            if matches(resource) and condition(context or {}):
+                return ALLOWED
+
+        return IMPLICIT_DENY
+
+    def is_allowed(
+        self, action: str, resource: str = "*", context: dict = None
+    ) -> bool:
+        """Returns True if evaluate() allows the given request."""
+        return self.evaluate(action, resource, context) == ALLOWED
+
+    def evaluate_many(self, requests: Iterable[tuple]) -> Iterator[str]:
+        """
+        Evaluates many requests, each given as an (action, resource) or (action,
+        resource, context) tuple, yielding the decision for each in turn.
+        """
+        evaluate = self.evaluate
+
+        for request in requests:
+            yield evaluate(*request)
@@ -0,0 +1,86 @@
+from aws_iam_utils.catalog import get_catalog
+
+
+def expand_action(action: str) -> list[str]:
+    """
+    Expands the given action, which may contain `*` and `?` wildcards, into the
+    list of all known actions it matches, in lowercase. Wildcards that match no
+    known action (e.g. for a service we have never heard of) are returned as-is.
+    """
+    l_action = action.lower()
+
+    if "*" not in l_action and "?" not in l_action:
+        return [l_action]
+
+    expanded = get_catalog().match_actions(l_action)
+    if not expanded:
+        return [l_action]
+
+    return list(expanded)
+
+
+def expand_actions(actions) -> set[str]:
+    """Expands a list of actions (or a single action string) via expand_action(),
+    returning the set of all matching actions."""
+    if type(actions) is str:
+        actions = [actions]
+
+    result = set()
+    for action in actions:
+        result.update(expand_action(action))
+
+    return result
+
+
+def expand_statement(statement: dict) -> dict:
+    """
+    Returns a copy of the given statement with all wildcards in Action expanded,
+    and any NotAction converted into the equivalent Action list. The statement
+    itself is not modified.
+    """
+    result = dict(statement)
+
+    actions = expand_actions(statement.get("Action", []))
+
+    if "NotAction" in statement:
+        not_actions = expand_actions(statement["NotAction"])
+        if not_actions:
+            actions.update(
+                x for x in get_catalog().match_actions("*") if x not in not_actions
+            )
+
+        del result["NotAction"]
+
+    result["Action"] = sorted(actions)
+
+    return result
+
+
+def iter_expanded_statements(policy: dict, expand_deny: bool = False):
+    """Lazily yields the statements of the given policy as expanded by
+    expand_policy(), one at a time."""
+    statements = policy["Statement"]
+    if type(statements) is dict:
+        statements = [statements]
+
+    for st in statements:
+        if expand_deny or st["Effect"].lower() != "deny":
+            yield expand_statement(st)
+        else:
+            yield dict(st)
+
+
+def expand_policy(policy: dict, expand_deny: bool = False) -> dict:
+    """
+    Expands all wildcard actions in the given policy into full action lists, using
+    the action catalog. This is a drop-in replacement for policyuniverse's
+    `expand_policy`, so the result can be passed straight to
+    `extract_policy_permission_items`: Allow statements have their Action expanded
+    and sorted, and Deny statements are left alone unless expand_deny is True.
+
+    The input policy is not modified; only the statements are copied.
+    """
+    result = dict(policy)
+    result["Statement"] = list(iter_expanded_statements(policy, expand_deny))
+
+    return result
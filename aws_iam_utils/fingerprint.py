@@ -0,0 +1,133 @@
+import hashlib
+import json
+from collections import OrderedDict
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.catalog import ids_from_mask
+from aws_iam_utils.permission_set import PermissionSet
+from aws_iam_utils.permission_set import permission_set_from_policy
+from aws_iam_utils.util import resource_element
+
+FINGERPRINT_CACHE_SIZE = 4096
+
+_fingerprint_cache = OrderedDict()
+
+
+def _as_sorted_list(value) -> list:
+    if type(value) is not list:
+        value = [value]
+
+    return sorted(value, key=lambda x: json.dumps(x, sort_keys=True))
+
+
+def normalize_statement(statement: dict) -> dict:
+    """
+    Returns a copy of the given statement with the parts that do not affect the
+    permissions it grants normalized: Effect is capitalized, Condition keys are
+    lowercased (as they are case-insensitive in IAM), and all Condition values and
+    Principal values are turned into sorted lists.
+    """
+    result = dict(statement)
+
+    if "Effect" in result:
+        result["Effect"] = result["Effect"].capitalize()
+
+    if result.get("Condition") is not None:
+        result["Condition"] = {
+            operator: {k.lower(): _as_sorted_list(v) for k, v in keys.items()}
+            for operator, keys in result["Condition"].items()
+        }
+
+    if result.get("Principal") is not None:
+        principal = result["Principal"]
+        if principal == "*":
+            principal = {"AWS": "*"}
+
+        result["Principal"] = {k: _as_sorted_list(v) for k, v in principal.items()}
+
+    return result
+
+
+def normalized_permission_set(policy: dict) -> PermissionSet:
+    """Returns the PermissionSet of the given policy with each of its statements
+    normalized by normalize_statement(), as used for fingerprints."""
+    statements = policy["Statement"]
+    if type(statements) is dict:
+        statements = [statements]
+
+    return permission_set_from_policy(
+        {"Statement": [normalize_statement(st) for st in statements]}
+    )
+
+
+def permission_set_fingerprint(permission_set: PermissionSet) -> str:
+    """Returns the fingerprint of a policy (see policy_fingerprint()) from its
+    normalized_permission_set(), for callers that need the permission set for
+    something else too."""
+    catalog = get_catalog()
+    known_mask = catalog.all_actions_mask()
+
+    groups = []
+    for (effect, resource, condition, principal), mask in permission_set.groups.items():
+        # IDs for actions unknown to the catalog are only stable within a process,
+        # so those are hashed by name instead
+        unknown_actions = sorted(
+            catalog.action_name(x) for x in ids_from_mask(mask & ~known_mask)
+        )
+
+        groups.append(
+            json.dumps(
+                [
+                    effect,
+                    dict([resource_element(resource)]),
+                    condition,
+                    principal,
+                    format(mask & known_mask, "x"),
+                    unknown_actions,
+                ],
+                sort_keys=True,
+            )
+        )
+
+    h = hashlib.sha256()
+    for group in sorted(groups):
+        h.update(group.encode("utf-8"))
+        h.update(b"\n")
+
+    return h.hexdigest()
+
+
+def policy_fingerprint(policy: dict) -> str:
+    """
+    Returns a canonical fingerprint (a hex SHA-256 digest) of the permissions
+    granted by the given policy. Two policies that grant exactly the same
+    permissions have the same fingerprint, regardless of statement order, action
+    case, wildcards, or whether values are given as strings or lists.
+
+    Fingerprints depend on the action catalog, so they should only be compared
+    with fingerprints computed against the same policy_sentry data.
+
+    Results are held in a bounded LRU cache keyed on a hash of the raw policy, so
+    fingerprinting the same policy again costs a single hash and lookup.
+    """
+    k = hashlib.sha256(
+        json.dumps(policy, sort_keys=True, default=list).encode("utf-8")
+    ).digest()
+
+    fingerprint = _fingerprint_cache.get(k)
+    if fingerprint is not None:
+        _fingerprint_cache.move_to_end(k)
+        return fingerprint
+
+    fingerprint = permission_set_fingerprint(normalized_permission_set(policy))
+
+    _fingerprint_cache[k] = fingerprint
+    if len(_fingerprint_cache) > FINGERPRINT_CACHE_SIZE:
+        _fingerprint_cache.popitem(last=False)
+
+    return fingerprint
+
+
+def clear_fingerprint_cache():
+    """Empties the cache used by policy_fingerprint()."""
+    _fingerprint_cache.clear()
@@ -1,14 +1,9 @@
-import re
+import bisect
 
-from policy_sentry.querying.actions import get_actions_for_service
-from policy_sentry.querying.actions import get_actions_matching_arn_type
-from policy_sentry.querying.actions import get_actions_that_support_wildcard_arns_only
-
-from aws_iam_utils import checks
+from aws_iam_utils.catalog import get_catalog
 from aws_iam_utils.util import create_policy
-from aws_iam_utils.util import get_action_data_with_overrides
 from aws_iam_utils.util import statement
-from aws_iam_utils.constants import READ, LIST, WRITE
+from aws_iam_utils.constants import READ, LIST, WRITE, WILDCARD_ARN_TYPE
 
 
 def generate_read_only_policy_for_service(
@@ -91,30 +86,26 @@ def generate_policy_for_service_arn_type(
     Use `policy_sentry query arn-table --service <service>` to query ARN types
     available for a service.
 
-    If use_wildcard_verbs is True (the default), the generator will try to use
-    use verb wildcards (e.g. "s3:Get*") rather than full action names to keep
-    the policy short and readable.
-
-    The generator always verifies that the generated policy only grants permissions
-    in the given access level. If this check fails when use_wildcard_verbs is
-    True, the full action list is returned. If the check still fails with the
-    full action list, an AssertionError is raised, and this indicates an underlying
-    bug in the policy data driving aws-iam-utils.
-
     If include_service_wide_actions is True, any actions in the service not linked
     to any resource type are also included in the result. This may be needed for
     some wildcard actions (e.g. ssm:DescribeParameters, ec2:DescribeFlowLogs) which
     are not linked to a specific ARN type in the IAM database.
     """
-    service_actions = get_actions_matching_arn_type(service_name, arn_type)
+    catalog = get_catalog()
+
+    service_actions = [
+        x.action for x in catalog.actions_matching_arn_type(service_name, arn_type)
+    ]
 
     if include_service_wide_actions:
-        wildcard_arn_actions = get_actions_that_support_wildcard_arns_only(service_name)
-        service_actions.extend(wildcard_arn_actions)
+        wildcard_arn_actions = catalog.actions_matching_arn_type(
+            service_name, WILDCARD_ARN_TYPE
+        )
+        service_actions.extend(x.action for x in wildcard_arn_actions)
 
     # use_wildcard_verbs is False here as it'll always fail (verb-based
     # wildcards will always match more than one ARN type)
-    return __generate_and_validate_policy_from_actions(
+    return __generate_policy_from_actions(
         service_actions,
         service_name,
         reqd_access_levels,
@@ -129,89 +120,221 @@ def generate_policy_for_service(
     Generates an IAM policy that grants the given level of access to all of the given
     AWS service.
 
-    If use_wildcard_verbs is True (the default), the generator will try to use use verb
-    wildcards (e.g. "s3:Get*") rather than full action names to keep the policy short
-    and readable.
-
-    The generator always verifies that the generated policy only grants permissions in
-    the given access level. If this check fails when use_wildcard_verbs is True, the
-    full action list is returned. If the check still fails with the full action list, an
-    AssertionError is raised, and this indicates an underlying bug in the policy data
-    driving aws-iam-utils.
+    If use_wildcard_verbs is True (the default), the generator will use verb
+    wildcards (e.g. "s3:Get*") rather than full action names wherever it can, to keep
+    the policy short and readable. Wildcards are only used where every action they
+    match in the service has one of the given access levels, so the policy never
+    grants more than was asked for.
     """
-    service_actions = get_actions_for_service(service_name)
+    service_actions = [
+        x.action for x in get_catalog().actions_for_service(service_name)
+    ]
 
-    return __generate_and_validate_policy_from_actions(
+    return __generate_policy_from_actions(
         service_actions, service_name, reqd_access_levels, use_wildcard_verbs
     )
 
 
-def __generate_and_validate_policy_from_actions(
+def generate_policies_for_all_services(
+    reqd_access_levels: list[str],
+    use_wildcard_verbs: bool = True,
+    service_names: list[str] = None,
+    workers: int = None,
+) -> dict:
+    """
+    Generates an IAM policy that grants the given level of access for every AWS
+    service (or just those in service_names), returning a dict of service prefix to
+    policy. This is equivalent to calling generate_policy_for_service() for each
+    service, but walks the action catalog only once. Services with no actions at
+    the given access levels are left out.
+
+    The result is deterministic (services are sorted, and actions within each
+    policy are in a fixed order), so it can safely be cached. If workers is None
+    (the default) or 1, everything runs in the current process; otherwise the
+    wildcard minimization is spread across a pool of that many processes.
+    """
+    if service_names is not None:
+        service_names = {x.lower() for x in service_names}
+
+    allowed_actions = {}
+    denied_actions = {}
+
+    for action_data in get_catalog():
+        service_name = action_data.action.split(":")[0].lower()
+
+        if service_names is not None and service_name not in service_names:
+            continue
+
+        if action_data.access_level in reqd_access_levels:
+            allowed_actions.setdefault(service_name, []).append(action_data.action)
+        else:
+            denied_actions.setdefault(service_name, []).append(action_data.action)
+
+    jobs = [
+        (
+            service_name,
+            allowed_actions[service_name],
+            denied_actions.get(service_name, []),
+            use_wildcard_verbs,
+        )
+        for service_name in sorted(allowed_actions)
+    ]
+
+    if workers is None or workers == 1:
+        policies = map(__generate_policy_from_action_lists, jobs)
+        return dict(zip([x[0] for x in jobs], policies))
+
+    # imported here rather than at the top of the module, so that generating a
+    # single service's policy does not pay for it
+    import multiprocessing
+
+    with multiprocessing.Pool(workers) as pool:
+        policies = pool.map(__generate_policy_from_action_lists, jobs)
+
+    return dict(zip([x[0] for x in jobs], policies))
+
+
+def __generate_policy_from_action_lists(job: tuple) -> dict:
+    service_name, allowed_actions, denied_actions, use_wildcard_verbs = job
+
+    if use_wildcard_verbs:
+        allowed_actions = __minimize_actions(
+            service_name, allowed_actions, denied_actions
+        )
+
+    return create_policy(statement(actions=allowed_actions, resource="*"))
+
+
+def __minimize_actions(
+    service_name: str, allowed_actions: list[str], denied_actions: list[str]
+) -> list[str]:
+    """
+    Returns the shortest list of verb wildcards (e.g. "s3:Get*") and action names
+    that matches every one of allowed_actions and none of denied_actions.
+
+    The allowed actions are arranged in a trie of their camel-case words, so that
+    wildcards only ever break at word boundaries. Walking the trie from the root,
+    each prefix is emitted as a wildcard as soon as every action it matches is
+    allowed; otherwise we descend into its children. Whether a prefix is safe is
+    decided against the sorted list of all the service's actions (including the
+    denied ones) with a range lookup, using the same case-insensitive matching as
+    IAM, so the result is correct by construction.
+    """
+    names = sorted(
+        [(x.lower(), True) for x in allowed_actions]
+        + [(x.lower(), False) for x in denied_actions]
+    )
+    sorted_names = [x[0] for x in names]
+
+    # allowed_counts[i] is the number of allowed actions in sorted_names[:i]
+    allowed_counts = [0]
+    for _, allowed in names:
+        allowed_counts.append(allowed_counts[-1] + allowed)
+
+    def prefix_range(prefix: str) -> tuple[int, int]:
+        lo = bisect.bisect_left(sorted_names, prefix)
+        hi = bisect.bisect_left(
+            sorted_names, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo
+        )
+        return lo, hi
+
+    # each trie node is [child nodes keyed by word, action ending at this node]
+    root = [{}, None]
+    for action in allowed_actions:
+        action_name = action.split(":", 1)[1]
+        cuts = [i for i, c in enumerate(action_name) if c.isupper() and i > 0]
+
+        node = root
+        start = 0
+        for end in cuts + [len(action_name)]:
+            node = node[0].setdefault(action_name[start:end], [{}, None])
+            start = end
+
+        node[1] = action
+
+    result = []
+
+    def visit(node, prefix):
+        lo, hi = prefix_range(f"{service_name}:{prefix}".lower())
+        n_allowed = allowed_counts[hi] - allowed_counts[lo]
+
+        if n_allowed == hi - lo:
+            # every action under this prefix is allowed
+            if hi - lo == 1:
+                result.append(allowed_actions_by_name[sorted_names[lo]])
+            else:
+                result.append(f"{service_name}:{prefix}*")
+            return
+
+        if node[1] is not None:
+            result.append(node[1])
+
+        for word in sorted(node[0], key=str.lower):
+            visit(node[0][word], prefix + word)
+
+    allowed_actions_by_name = {x.lower(): x for x in allowed_actions}
+
+    if allowed_actions:
+        visit(root, "")
+
+    # a word can be a prefix of a sibling's word (e.g. "Instance" and
+    # "Instances"), so a wildcard for one can cover entries emitted for the
+    # other, before or after it; drop those entries
+    wildcard_prefixes = {x[:-1].lower() for x in result if x.endswith("*")}
+
+    def is_covered(entry: str) -> bool:
+        l_entry = entry.lower()
+        if l_entry.endswith("*"):
+            l_entry = l_entry[:-1]
+            end = len(l_entry)
+        else:
+            end = len(l_entry) + 1
+
+        return any(l_entry[:i] in wildcard_prefixes for i in range(end))
+
+    return [x for x in result if not is_covered(x)]
+
+
+def __generate_policy_from_actions(
     service_actions: list[str],
     service_name: str,
     reqd_access_levels: list[str],
     use_wildcard_verbs: bool,
 ) -> dict:
+    catalog = get_catalog()
     matching_actions = []
-    policy = None
 
     for action in service_actions:
-        action_service, action_name = action.split(":")
-
         # iterate through each action and pull out read-only actions
-        action_output = get_action_data_with_overrides(action_service, action_name)
+        action_data = catalog.get(action)
 
-        if action_output is False:
-            raise ValueError(f"invalid action: {action_name}")
+        if action_data is None:
+            raise ValueError(f"invalid action: {action}")
 
-        for action_output_action in action_output[service_name]:
-            if (
-                action_output_action["access_level"] in reqd_access_levels
-                and action_output_action["action"] not in matching_actions
-            ):
-                matching_actions.append(action_output_action["action"])
+        if (
+            action_data.access_level in reqd_access_levels
+            and action_data.action not in matching_actions
+        ):
+            matching_actions.append(action_data.action)
 
     if use_wildcard_verbs:
-        # In this mode, we deduce the 'verb' (first word, assuming camel case) of each
-        # action in the list and try to shorten the list to those verbs, wildcarded.
-        # This approach makes for way shorter and easier-to-read policies.
-        wildcarded_matching_actions = []
-
-        for action in matching_actions:
-            action_service, action_name = action.split(":")
-
-            parts = list(
-                filter(lambda x: len(x) > 0, re.split("([A-Z])", action_name, 2))
-            )
-
-            if len(parts) >= 4:
-                # 'DescribeJobAspectsPolicy' -> ['D', 'escribe', 'J', 'obAspectsPolicy']
-                verb = parts[0] + parts[1]
-                wildcarded_verb = f"{service_name}:{verb}*"
-
-                if (
-                    "Policy" not in action_name
-                    and "Tagging" not in action_name
-                    and wildcarded_verb not in wildcarded_matching_actions
-                ):
-                    wildcarded_matching_actions.append(wildcarded_verb)
-
-            else:
-                wildcarded_matching_actions.append(action)
+        # In this mode, we shorten the action list to verb wildcards wherever we
+        # can do so without matching any other action in the service. This approach
+        # makes for way shorter and easier-to-read policies.
+        l_matching_actions = {x.lower() for x in matching_actions}
+
+        wildcarded_matching_actions = __minimize_actions(
+            service_name,
+            matching_actions,
+            [
+                x.action
+                for x in catalog.actions_for_service(service_name)
+                if x.action.lower() not in l_matching_actions
+            ],
+        )
 
-        policy = create_policy(
+        return create_policy(
             statement(actions=wildcarded_matching_actions, resource="*")
         )
 
-    else:
-        policy = create_policy(statement(actions=matching_actions, resource="*"))
-
-    if use_wildcard_verbs:
-        # in this mode, check the policy is not too permissive and if so,
-        # fall back to the full action list
-        if not checks.policy_has_only_these_access_levels(policy, reqd_access_levels):
-            policy = create_policy(statement(actions=matching_actions, resource="*"))
-
-    assert checks.policy_has_only_these_access_levels(policy, reqd_access_levels)
-
-    return policy
+    return create_policy(statement(actions=matching_actions, resource="*"))
@@ -0,0 +1,493 @@
+import bisect
+import functools
+
+from aws_iam_utils.catalog import ActionCatalog
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.catalog import ids_from_mask
+from aws_iam_utils.util import NotResource
+from aws_iam_utils.util import check_statement_supported
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import freeze
+from aws_iam_utils.util import resource_element
+from aws_iam_utils.util import thaw
+from aws_iam_utils.wildcards import compile_wildcard
+from aws_iam_utils.wildcards import has_wildcards
+
+# returned when two resources, conditions or principals cannot be combined into
+# one that a single statement can express
+_NO_MERGE = object()
+
+
+@functools.lru_cache(maxsize=65536)
+def _resource_covers(pattern, resource) -> bool:
+    """
+    Returns True if every resource matched by `resource` is also matched by
+    `pattern`, where both are resources of permission items (a pattern, a
+    NotResource, or None for a statement without a Resource).
+
+    This is exact when `resource` is a literal ARN, and errs towards False
+    otherwise: e.g. a NotResource is only known to cover literal ARNs.
+    """
+    if pattern == resource or pattern == "*":
+        return True
+
+    if pattern is None or resource is None or type(resource) is NotResource:
+        return False
+
+    if type(pattern) is NotResource:
+        return not has_wildcards(resource) and pattern.matches(resource)
+
+    # a `*` in the pattern matches anything a wildcard in the resource can, but
+    # a `?` only matches a single character
+    if "?" in pattern and has_wildcards(resource):
+        return False
+
+    return compile_wildcard(pattern).fullmatch(resource) is not None
+
+
+def _resources_overlap(r1, r2) -> bool:
+    """Returns False if no resource is matched by both of the given ones. This
+    is exact if either is a literal ARN, and errs towards True otherwise."""
+    for literal, other in [(r1, r2), (r2, r1)]:
+        if type(literal) is str and not has_wildcards(literal):
+            return _resource_covers(other, literal)
+
+    return True
+
+
+def _intersect_resources(r1, r2):
+    if _resource_covers(r1, r2):
+        return r2
+
+    if _resource_covers(r2, r1):
+        return r1
+
+    # e.g. `arn:aws:s3:::a*` and `arn:aws:s3:::*z`, which overlap, but not in
+    # a way that one resource pattern can express
+    return _NO_MERGE
+
+
+def _merge_conditions(c1, c2):
+    """Returns a frozen condition that holds when both of the given frozen
+    conditions hold."""
+    if c1 is None or c1 == c2:
+        return c2
+
+    if c2 is None:
+        return c1
+
+    result = thaw(c1)
+    for operator, values in c2.items():
+        operator_values = result.setdefault(operator, {})
+
+        for key, value in values.items():
+            # values for the same key are ORed, so they cannot be merged
+            if key in operator_values and operator_values[key] != value:
+                return _NO_MERGE
+
+            operator_values[key] = thaw(value)
+
+    return freeze(result)
+
+
+def _condition_implies(c1, c2) -> bool:
+    """Returns True if the first frozen condition holding means that the second
+    one does too, i.e. if the second has a subset of the first's tests."""
+    if c2 is None or c1 == c2:
+        return True
+
+    if c1 is None:
+        return False
+
+    for operator, values in c2.items():
+        for key, value in values.items():
+            if c1.get(operator, {}).get(key, _NO_MERGE) != value:
+                return False
+
+    return True
+
+
+def _merge_principals(p1, p2):
+    if p1 is None or p1 == p2:
+        return p2
+
+    if p2 is None:
+        return p1
+
+    return _NO_MERGE
+
+
+def _is_deny(k: tuple) -> bool:
+    return k[0].lower() == "deny"
+
+
+class PermissionSet:
+    """
+    A compact representation of the individual permissions granted by a policy.
+
+    Permissions are grouped by (effect, resource, condition, principal), and the
+    actions in each group are held as a bitset (a Python int) over the action
+    catalog's integer action IDs. Equality, subset and difference checks are then
+    word-level operations on those bitsets, rather than comparisons of long lists
+    of permission item dicts.
+
+    union(), intersection(), difference() and issubset() treat a set as the
+    permissions it allows, after applying its Denies (see apply_denies()), and
+    take account of resource wildcards, e.g. an Allow on `*` covers one on a
+    specific ARN. Where the result cannot be expressed exactly, they err towards
+    allowing less.
+
+    Use `permission_set_from_policy()` to build one from a policy dict, and
+    `policy_from_permission_set()` to turn one back into a policy.
+    """
+
+    def __init__(self, groups: dict = None):
+        # (effect, resource, condition, principal) -> action bitset
+        self.groups = {}
+
+        if groups is not None:
+            for k, mask in groups.items():
+                if mask:
+                    self.groups[k] = mask
+
+    def add(
+        self,
+        effect: str,
+        action_mask: int,
+        resource: str = None,
+        condition: dict = None,
+        principal: dict = None,
+    ):
+        """Adds the actions in action_mask to the group for the given effect,
+        resource, condition and principal."""
+        self.add_group(
+            (effect, resource, freeze(condition), freeze(principal)), action_mask
+        )
+
+    def add_group(self, k: tuple, action_mask: int):
+        """Adds the actions in action_mask to the group with the given (effect,
+        resource, frozen condition, frozen principal) key."""
+        if action_mask:
+            self.groups[k] = self.groups.get(k, 0) | action_mask
+
+    def __len__(self):
+        """Returns the number of individual permission items in this set."""
+        return sum(bin(mask).count("1") for mask in self.groups.values())
+
+    def __iter__(self):
+        """Yields every permission item in this set as a dict, in the same format as
+        extract_policy_permission_items()."""
+        catalog = get_catalog()
+
+        for (effect, resource, condition, principal), mask in self.groups.items():
+            for action_id in ids_from_mask(mask):
+                yield {
+                    "effect": effect,
+                    "action": catalog.action_name(action_id),
+                    "resource": resource,
+                    "condition": condition,
+                    "principal": principal,
+                }
+
+    def __eq__(self, other):
+        if type(other) is not PermissionSet:
+            return NotImplemented
+
+        return self.groups == other.groups
+
+    def __repr__(self):
+        return f"PermissionSet({len(self.groups)} groups, {len(self)} items)"
+
+    def apply_denies(self) -> "PermissionSet":
+        """
+        Returns the Allow permissions in this set, less the actions that a Deny
+        in the set removes from them, so the result allows exactly what this set
+        does.
+
+        A Deny with no condition is subtracted from each Allow whose resources it
+        covers. Other Denies (those with conditions, or on resources that only
+        partly overlap an Allow's) cannot be subtracted exactly, so they are kept
+        for the actions that they still overlap with an Allow.
+        """
+        allows = {k: mask for k, mask in self.groups.items() if not _is_deny(k)}
+        denies = {k: mask for k, mask in self.groups.items() if _is_deny(k)}
+
+        for (_, resource, condition, principal), deny_mask in denies.items():
+            if condition is not None:
+                continue
+
+            for k, mask in allows.items():
+                if (
+                    mask & deny_mask
+                    and (principal is None or principal == k[3])
+                    and _resource_covers(resource, k[1])
+                ):
+                    allows[k] = mask & ~deny_mask
+
+        result = PermissionSet(allows)
+        allow_groups = list(result.groups.items())
+
+        for k, deny_mask in denies.items():
+            for allow_k, mask in allow_groups:
+                if mask & deny_mask and _resources_overlap(k[1], allow_k[1]):
+                    result.add_group(k, mask & deny_mask)
+
+        return result
+
+    def _split(self) -> tuple[list, list]:
+        """Returns the (key, action bitset) of the Allow groups and Deny groups in
+        this set, after applying its Denies."""
+        allows = []
+        denies = []
+        for k, mask in self.apply_denies().groups.items():
+            (denies if _is_deny(k) else allows).append((k, mask))
+
+        return allows, denies
+
+    def union(self, other: "PermissionSet") -> "PermissionSet":
+        """
+        Returns the permissions allowed by either this set or other.
+
+        Denies are applied to each set first. Any that cannot be applied exactly
+        (see apply_denies()) are kept, and so then also apply to the other set's
+        Allows: the result never allows more than the two sets together do.
+        """
+        result = self.apply_denies()
+
+        for k, mask in other.apply_denies().groups.items():
+            result.add_group(k, mask)
+
+        return result
+
+    def intersection(self, other: "PermissionSet") -> "PermissionSet":
+        """
+        Returns the permissions allowed by both this set and other, e.g. to find
+        what an identity policy allows within a permissions boundary and an SCP.
+
+        Each pair of Allows is combined into an Allow of their common actions, on
+        the narrower of their resources, with both of their conditions. Pairs on
+        resources that only partly overlap (e.g. `arn:aws:s3:::a*` and
+        `arn:aws:s3:::*z`), or with conditions that test the same key with
+        different values, cannot be combined into one Allow, so are left out.
+        """
+        allows, denies = self._split()
+        other_allows, other_denies = other._split()
+
+        result = PermissionSet()
+
+        for (effect, r1, c1, p1), m1 in allows:
+            for (_, r2, c2, p2), m2 in other_allows:
+                common = m1 & m2
+                if not common:
+                    continue
+
+                k = (
+                    effect,
+                    _intersect_resources(r1, r2),
+                    _merge_conditions(c1, c2),
+                    _merge_principals(p1, p2),
+                )
+                if _NO_MERGE not in k:
+                    result.add_group(k, common)
+
+        for k, mask in denies + other_denies:
+            result.add_group(k, mask)
+
+        return result.apply_denies()
+
+    def difference(self, other: "PermissionSet") -> "PermissionSet":
+        """
+        Returns the permissions allowed by this set but not by other, e.g. what
+        one role can do that another cannot.
+
+        An Allow in this set loses the actions of each Allow in other that covers
+        its resource, has a subset of its conditions and has the same principal.
+        Denies in other are not taken into account, so the result never allows
+        more than this set does.
+        """
+        allows, denies = self._split()
+        other_allows, _ = other._split()
+
+        result = PermissionSet()
+
+        for k, mask in allows:
+            for (_, resource, condition, principal), other_mask in other_allows:
+                if (
+                    mask & other_mask
+                    and principal == k[3]
+                    and _resource_covers(resource, k[1])
+                    and _condition_implies(k[2], condition)
+                ):
+                    mask &= ~other_mask
+
+            result.add_group(k, mask)
+
+        for k, mask in denies:
+            result.add_group(k, mask)
+
+        return result.apply_denies()
+
+    def issubset(self, other: "PermissionSet") -> bool:
+        """
+        Returns True if everything this set allows is also allowed by other,
+        using the same rules as difference(). This errs towards False: e.g. it is
+        False if a conditional Deny in other could deny something this set
+        allows.
+        """
+        allows, _ = self.difference(other)._split()
+        if allows:
+            return False
+
+        allows, _ = self._split()
+        _, other_denies = other._split()
+
+        for (_, resource, _, _), mask in allows:
+            for (_, deny_resource, _, _), deny_mask in other_denies:
+                if mask & deny_mask and _resources_overlap(resource, deny_resource):
+                    return False
+
+        return True
+
+
+def permission_set_from_policy(
+    policy: dict, allow_unsupported: bool = False
+) -> PermissionSet:
+    """
+    Builds a PermissionSet from the given policy. Wildcards in Action are resolved
+    against the action catalog (as with expand_policy(), except that Deny
+    statements are expanded too), and NotAction is resolved as the complement of
+    its actions over the catalog. NotResource is kept as a single NotResource
+    resource, rather than expanded.
+
+    As with extract_policy_permission_items(), NotPrincipal is not supported and
+    results in an exception, unless allow_unsupported is True.
+    """
+    catalog = get_catalog()
+    result = PermissionSet()
+
+    statements = policy["Statement"]
+    if type(statements) is dict:
+        statements = [statements]
+
+    for statement in statements:
+        if not allow_unsupported:
+            check_statement_supported(statement)
+
+        actions = statement.get("Action", [])
+        if type(actions) is str:
+            actions = [actions]
+
+        action_mask = 0
+        for action in actions:
+            action_mask |= catalog.match_mask(action)
+
+        if "NotAction" in statement:
+            action_mask |= catalog.not_action_mask(statement["NotAction"])
+
+        if "NotResource" in statement:
+            resources = [NotResource(statement["NotResource"])]
+        else:
+            resources = statement.get("Resource", [None])
+            if type(resources) is str:
+                resources = [resources]
+
+        for resource in resources:
+            result.add(
+                statement.get("Effect"),
+                action_mask,
+                resource,
+                statement.get("Condition"),
+                statement.get("Principal"),
+            )
+
+    return result
+
+
+@functools.lru_cache(maxsize=4)
+def _service_ranges(catalog: ActionCatalog) -> tuple[list, list, list]:
+    """Returns the service names in the given catalog, with the first and last +
+    1 action ID of each, in order of action ID. Action IDs follow the sorted
+    action names, so each service's actions have contiguous IDs (though not in
+    the order of the service names: `s3-object-lambda:` sorts before `s3:`)."""
+    ranges = []
+    for service_name in catalog.services():
+        mask = catalog.match_mask(f"{service_name}:*")
+        ranges.append(
+            ((mask & -mask).bit_length() - 1, mask.bit_length(), service_name)
+        )
+
+    ranges.sort()
+
+    return [x[2] for x in ranges], [x[0] for x in ranges], [x[1] for x in ranges]
+
+
+def _mask_actions(mask: int) -> list[str]:
+    """Returns the actions in the given bitset, with `*` for every known action,
+    or `service:*` for every known action in a service."""
+    catalog = get_catalog()
+    actions = []
+
+    all_actions_mask = catalog.all_actions_mask()
+    if mask & all_actions_mask == all_actions_mask:
+        actions.append("*")
+        mask &= ~all_actions_mask
+
+    names, starts, ends = _service_ranges(catalog)
+
+    # find each service with any actions in the mask, from its lowest action ID
+    remaining = mask & all_actions_mask
+    while remaining:
+        i = bisect.bisect_right(starts, (remaining & -remaining).bit_length() - 1) - 1
+        service_mask = ((1 << ends[i]) - 1) & ~((1 << starts[i]) - 1)
+
+        if mask & service_mask == service_mask:
+            actions.append(f"{names[i]}:*")
+            mask &= ~service_mask
+
+        remaining &= ~service_mask
+
+    actions.extend(catalog.action_name(x) for x in ids_from_mask(mask))
+
+    return sorted(actions)
+
+
+def policy_from_permission_set(permission_set: PermissionSet) -> dict:
+    """
+    Returns a policy that grants exactly the permissions in the given set, with
+    its statements collapsed as with collapse_policy_statements(merge_resources=
+    True): one statement for each effect, condition, principal and set of
+    actions, covering all of their resources. Every known action is written as
+    `*`, and every known action of a service as `service:*`.
+    """
+    # the groups already have one action bitset per effect, resource, condition
+    # and principal, so only the resources of groups with equal bitsets are left
+    # to merge; as in collapse_policy_statements(), statements without a
+    # Resource, or with NotResource, are never merged with those with a Resource
+    resources_by_qualifiers = {}
+
+    for (effect, resource, condition, principal), mask in permission_set.groups.items():
+        resource_kind = "Resource" if type(resource) is str else resource
+        k = (effect, condition, principal, resource_kind, mask)
+        resources_by_qualifiers.setdefault(k, []).append(resource)
+
+    statements = []
+    for k, resources in resources_by_qualifiers.items():
+        effect, condition, principal, _, mask = k
+        st = {"Effect": effect}
+
+        if condition is not None:
+            st["Condition"] = thaw(condition)
+
+        if resources[0] is not None:
+            resource_key, resource_value = resource_element(
+                resources[0] if len(resources) == 1 else resources
+            )
+            st[resource_key] = resource_value
+
+        if principal is not None:
+            st["Principal"] = thaw(principal)
+
+        st["Action"] = _mask_actions(mask)
+        statements.append(st)
+
+    return create_policy(*statements)
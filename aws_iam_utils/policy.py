@@ -1,38 +1,309 @@
-from aws_iam_utils.util import extract_policy_permission_items
-from aws_iam_utils.combiner import collapse_policy_statements
+import json
+
 from aws_iam_utils.policy_permission_item import PolicyPermissionItem
+from aws_iam_utils.util import NotAction
+from aws_iam_utils.util import NotResource
+from aws_iam_utils.util import freeze
+from aws_iam_utils.util import iter_policy_permission_items
+from aws_iam_utils.util import resource_element
+from aws_iam_utils.util import thaw
+from aws_iam_utils.wildcards import compile_wildcard
+from aws_iam_utils.wildcards import has_wildcards
 
 
 def policy_from_dict(policy):
-    ppis = [PolicyPermissionItem(**x) for x in extract_policy_permission_items(policy)]
+    # items from the same statement share their condition and principal, so freeze
+    # each of those only once and share the frozen copy between PPIs too
+    frozen = {}
+
+    def freeze_shared(value):
+        if value is None:
+            return None
+
+        if id(value) not in frozen:
+            frozen[id(value)] = (value, freeze(value))
+
+        return frozen[id(value)][1]
+
+    ppis = [
+        PolicyPermissionItem(
+            x.effect,
+            x.action,
+            x.resource,
+            freeze_shared(x.condition),
+            freeze_shared(x.principal),
+        )
+        for x in iter_policy_permission_items(policy)
+    ]
 
     return Policy(version=policy["Version"], ppis=ppis)
 
 
 class Policy:
+    """
+    A policy held as a list of PolicyPermissionItems (PPIs), with indexes by
+    action, service prefix, resource and effect for fast lookups.
+
+    A statement with NotAction is held as one PPI per resource, whose action is a
+    NotAction (see aws_iam_utils.util), rather than one PPI for every other
+    action. as_dict() writes it back out whole, with the same NotAction and all
+    of its resources, as collapse_policy_statements() does.
+
+    The indexes are kept up to date as PPIs are added with add_policy_statements()
+    or appended to `ppis` directly. If you modify or remove existing PPIs in
+    `ppis`, call reindex() afterwards.
+    """
+
     def __init__(self, version: str, ppis: list[PolicyPermissionItem]):
         self.version = version
         self.ppis = ppis
 
+        self.reindex()
+
+    def reindex(self):
+        """Rebuilds all indexes from scratch on the next lookup."""
+        self._indexed_ppis = None
+        self._indexed_count = 0
+
+        self._ppis_by_action = {}
+        self._ppis_by_service = {}
+        self._ppis_by_resource = {}
+        self._ppis_by_effect = {}
+
+        # PPIs whose action is a wildcard or a NotAction, which cannot be found
+        # by exact lookup
+        self._wildcard_action_ppis = []
+        self._not_action_ppis = []
+
+        # the collapsed form used by as_dict(): actions grouped by their
+        # effect/condition/resource/principal, and a cached statement for each group
+        # that is rebuilt only when the group changes. NotAction PPIs are kept
+        # whole, as in collapse_policy_statements(): they are grouped by
+        # effect/condition/kind of resource/principal/NotAction, collecting
+        # resources rather than actions
+        self._actions_by_qualifiers = {}
+        self._statements_by_qualifiers = {}
+        self._statement_json_by_qualifiers = {}
+        self._statements_json_size = 0
+        self._dirty_qualifiers = set()
+
+    def _update_indexes(self):
+        if self._indexed_ppis is not self.ppis or len(self.ppis) < self._indexed_count:
+            self.reindex()
+            self._indexed_ppis = self.ppis
+
+        for ppi in self.ppis[self._indexed_count :]:
+            self._ppis_by_resource.setdefault(ppi.resource, []).append(ppi)
+            self._ppis_by_effect.setdefault(ppi.effect.lower(), []).append(ppi)
+
+            if type(ppi.action) is NotAction:
+                self._not_action_ppis.append(ppi)
+
+                resource_kind = (
+                    "Resource" if type(ppi.resource) is str else ppi.resource
+                )
+                k = (
+                    ppi.effect,
+                    ppi.condition,
+                    resource_kind,
+                    ppi.principal,
+                    ppi.action,
+                )
+                member = ppi.resource
+            else:
+                l_action = ppi.action.lower()
+                k = (ppi.effect, ppi.condition, ppi.resource, ppi.principal, None)
+                member = l_action
+
+                self._ppis_by_action.setdefault(l_action, []).append(ppi)
+                self._ppis_by_service.setdefault(l_action.split(":")[0], []).append(ppi)
+
+                if has_wildcards(l_action):
+                    self._wildcard_action_ppis.append(ppi)
+
+            members = self._actions_by_qualifiers.get(k)
+            if members is None:
+                members = self._actions_by_qualifiers[k] = {}
+
+                # reserve the statement's place, so statements stay in the order
+                # their groups first appeared
+                self._statements_by_qualifiers[k] = None
+                self._statement_json_by_qualifiers[k] = None
+
+            if member not in members:
+                members[member] = None
+                self._dirty_qualifiers.add(k)
+
+        self._indexed_count = len(self.ppis)
+
+    def _update_statements(self):
+        self._update_indexes()
+
+        for k in self._dirty_qualifiers:
+            effect, condition, resource, principal, not_action = k
+
+            if not_action is not None and resource == "Resource":
+                resources = list(self._actions_by_qualifiers[k])
+                resource = resources[0] if len(resources) == 1 else resources
+
+            new_statement = {}
+            for key, v in {
+                "Effect": effect,
+                "Condition": condition,
+                **dict([resource_element(resource)]),
+                "Principal": principal,
+            }.items():
+                if v is not None:
+                    new_statement[key] = v
+
+            if not_action is not None:
+                new_statement["NotAction"] = not_action.value
+            else:
+                new_statement["Action"] = list(self._actions_by_qualifiers[k])
+
+            old_json = self._statement_json_by_qualifiers.get(k)
+            if old_json is not None:
+                self._statements_json_size -= len(old_json)
+
+            new_json = json.dumps(new_statement, separators=(",", ":"))
+            self._statements_json_size += len(new_json)
+
+            self._statements_by_qualifiers[k] = new_statement
+            self._statement_json_by_qualifiers[k] = new_json
+
+        self._dirty_qualifiers.clear()
+
     def as_dict(self):
-        statements = [p.as_statement() for p in self.ppis]
+        """
+        Returns this policy as a policy dict, with statements collapsed as per
+        collapse_policy_statements(). The collapsed statements are cached, and only
+        those affected by PPIs added since the last call are rebuilt.
+        """
+        self._update_statements()
+
+        # copy the cached statements, so callers can modify the result freely
+        statements = []
+        for cached_statement in self._statements_by_qualifiers.values():
+            new_statement = dict(cached_statement)
+
+            for key in [
+                "Action",
+                "NotAction",
+                "Resource",
+                "NotResource",
+                "Condition",
+                "Principal",
+            ]:
+                if key in new_statement:
+                    new_statement[key] = thaw(new_statement[key])
+
+            statements.append(new_statement)
+
+        return {"Version": self.version, "Statement": statements}
+
+    def as_json(self) -> str:
+        """Returns as_dict() serialized as compact JSON (without whitespace), built
+        from cached per-statement JSON."""
+        self._update_statements()
+
+        return (
+            '{"Version":'
+            + json.dumps(self.version)
+            + ',"Statement":['
+            + ",".join(self._statement_json_by_qualifiers.values())
+            + "]}"
+        )
 
-        return collapse_policy_statements(
-            {
-                "Version": self.version,
-                "Statement": statements,
-            }
+    def json_size(self) -> int:
+        """
+        Returns the length of as_json(), e.g. to check a policy against the IAM
+        policy size quotas, which do not count whitespace. The size is kept up to
+        date incrementally, so this only does work for statements that changed.
+        """
+        self._update_statements()
+
+        n_statements = len(self._statement_json_by_qualifiers)
+
+        return (
+            len('{"Version":,"Statement":[]}')
+            + len(json.dumps(self.version))
+            + self._statements_json_size
+            + max(n_statements - 1, 0)
         )
 
     def find_action_ppis(self, action_name):
+        """Returns all PPIs for the given action (case-insensitive). Wildcards are
+        not expanded, so "s3:Get*" only finds PPIs for exactly "s3:Get*", and PPIs
+        with a NotAction are not included."""
+        self._update_indexes()
+        return list(self._ppis_by_action.get(action_name.lower(), []))
+
+    def find_service_ppis(self, service_name):
+        """Returns all PPIs for actions in the given service (case-insensitive),
+        not including PPIs with a NotAction."""
+        self._update_indexes()
+        return list(self._ppis_by_service.get(service_name.lower(), []))
+
+    def find_resource_ppis(self, resource):
+        """Returns all PPIs for exactly the given resource. Use None to find PPIs
+        from statements without a Resource."""
+        self._update_indexes()
+        return list(self._ppis_by_resource.get(resource, []))
+
+    def find_effect_ppis(self, effect):
+        """Returns all PPIs with the given effect (case-insensitive)."""
+        self._update_indexes()
+        return list(self._ppis_by_effect.get(effect.lower(), []))
+
+    def grants(self, action_name, resource=None) -> bool:
+        """
+        Returns True if this policy allows the given action on the given resource
+        (or on any resource, if resource is None), taking account of action and
+        resource wildcards and explicit Deny. Conditions and principals are not
+        evaluated: any matching Allow counts, and so does any matching Deny.
+        """
+        self._update_indexes()
+
         l_action_name = action_name.lower()
-        result = []
-        for ppi in self.ppis:
-            if ppi.action.lower() == l_action_name:
-                result.append(ppi)
 
-        return result
+        candidates = self._ppis_by_action.get(l_action_name, [])
+        if self._wildcard_action_ppis:
+            candidates = candidates + [
+                x
+                for x in self._wildcard_action_ppis
+                if compile_wildcard(x.action, ignore_case=True).fullmatch(l_action_name)
+            ]
+        if self._not_action_ppis:
+            candidates = candidates + [
+                x for x in self._not_action_ppis if x.action.matches(l_action_name)
+            ]
+
+        allowed = False
+        for ppi in candidates:
+            is_deny = ppi.effect.lower() == "deny"
+
+            if ppi.resource is None or ppi.resource == "*":
+                matches = True
+            elif resource is None:
+                # an Allow on some resource answers "any resource?", but a Deny
+                # on some resource does not rule out all of them
+                matches = not is_deny
+            elif type(ppi.resource) is NotResource:
+                matches = ppi.resource.matches(resource)
+            else:
+                matches = compile_wildcard(ppi.resource).fullmatch(resource)
+
+            if not matches:
+                continue
+
+            if is_deny:
+                return False
+
+            allowed = True
+
+        return allowed
 
     def add_policy_statements(self, policy):
         """Adds statements from the given policy into this policy."""
         self.ppis.extend(policy_from_dict(policy).ppis)
+        self._update_indexes()
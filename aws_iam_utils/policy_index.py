@@ -0,0 +1,292 @@
+"""
+An inverted index of many policies, for "which policies can do X" queries.
+
+Building a `PolicyIndex` expands each policy once, with the same semantics as
+extract_policy_permission_items(), into entries of (effect, resource,
+condition, principal) and the set of actions they cover. Each action ID in the
+catalog then has a posting list of the entries that cover it, so a query only
+looks at the entries for the actions it asks about, rather than expanding and
+scanning every policy again:
+
+    from aws_iam_utils.policy_index import PolicyIndex
+
+    index = PolicyIndex(policies_by_name.items())
+    index.policies_granting("iam:PassRole", "arn:aws:iam::123456789012:role/x")
+
+Action patterns in queries (e.g. `kms:*` or `iam:Pass*`) are resolved with the
+catalog's sorted action names, which serve as a trie: a prefix is a contiguous
+range of them.
+"""
+
+from typing import Hashable
+from typing import Iterable
+from typing import Iterator
+from typing import NamedTuple
+from typing import Union
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.catalog import ids_from_mask
+from aws_iam_utils.permission_set import permission_set_from_policy
+from aws_iam_utils.util import NotResource
+from aws_iam_utils.util import PermissionItem
+from aws_iam_utils.util import thaw
+from aws_iam_utils.wildcards import compile_wildcard
+
+
+class _IndexEntry(NamedTuple):
+    key: Hashable
+    effect: str
+    resource: Union[str, NotResource, None]
+    condition: object
+    principal: object
+    mask: int
+    is_deny: bool
+
+
+def _resource_matches(pattern: Union[str, NotResource, None], resource: str) -> bool:
+    """Returns True if the given resource pattern from a policy matches the given
+    resource ARN."""
+    if pattern is None or pattern == "*":
+        return True
+
+    if type(pattern) is NotResource:
+        return pattern.matches(resource)
+
+    return compile_wildcard(pattern).fullmatch(resource) is not None
+
+
+class PolicyIndex:
+    """
+    An index from actions to the policies (identified by any hashable key, such
+    as a name or ARN) that mention them, which can be updated incrementally
+    with add() and remove().
+
+    Entries that cover more than DENSE_ENTRY_SIZE actions (e.g. from `Action:
+    *` or NotAction) are not added to every action's posting list, but kept
+    aside and checked against their action bitset on every query, as there are
+    usually few of them.
+    """
+
+    DENSE_ENTRY_SIZE = 1024
+
+    def __init__(self, policies: Iterable[tuple[Hashable, dict]] = ()):
+        # entry ID -> _IndexEntry, and policy key -> its entry IDs
+        self._entries = {}
+        self._entry_ids = {}
+        self._next_entry_id = 0
+
+        # action ID -> resource pattern -> IDs of the (sparse) entries covering
+        # it, so that each resource pattern is only matched once per query
+        self._postings = {}
+        self._dense_entry_ids = set()
+
+        # keys of the policies with any Deny entries; the Allows of all other
+        # policies can be taken at face value
+        self._deny_keys = set()
+
+        for key, policy in policies:
+            self.add(key, policy)
+
+    def __len__(self):
+        return len(self._entry_ids)
+
+    def __contains__(self, key):
+        return key in self._entry_ids
+
+    def __iter__(self):
+        return iter(self._entry_ids)
+
+    def add(self, key: Hashable, policy: dict):
+        """Adds the given policy to the index under the given key, replacing any
+        policy already indexed under it."""
+        # build the new entries first, so a policy that cannot be read does not
+        # remove the existing one
+        permission_set = permission_set_from_policy(policy)
+
+        if key in self._entry_ids:
+            self.remove(key)
+
+        entry_ids = []
+        for k, mask in permission_set.groups.items():
+            entry_id = self._next_entry_id
+            self._next_entry_id += 1
+
+            # k is (effect, resource, condition, principal)
+            self._entries[entry_id] = _IndexEntry(
+                key, *k, mask, is_deny=k[0].lower() == "deny"
+            )
+            entry_ids.append(entry_id)
+
+            if self._entries[entry_id].is_deny:
+                self._deny_keys.add(key)
+
+            action_ids = ids_from_mask(mask)
+            if len(action_ids) > self.DENSE_ENTRY_SIZE:
+                self._dense_entry_ids.add(entry_id)
+            else:
+                for action_id in action_ids:
+                    self._postings.setdefault(action_id, {}).setdefault(
+                        k[1], set()
+                    ).add(entry_id)
+
+        self._entry_ids[key] = entry_ids
+
+    def remove(self, key: Hashable):
+        """Removes the policy indexed under the given key. Raises KeyError if there
+        is no such policy."""
+        self._deny_keys.discard(key)
+
+        for entry_id in self._entry_ids.pop(key):
+            entry = self._entries.pop(entry_id)
+
+            if entry_id in self._dense_entry_ids:
+                self._dense_entry_ids.remove(entry_id)
+                continue
+
+            for action_id in ids_from_mask(entry.mask):
+                postings = self._postings[action_id]
+                postings[entry.resource].discard(entry_id)
+
+                if not postings[entry.resource]:
+                    del postings[entry.resource]
+                    if not postings:
+                        del self._postings[action_id]
+
+    def _sparse_postings(self, action_mask: int) -> Iterator[tuple[int, object, set]]:
+        """Yields (action ID, resource pattern, entry IDs) for each action in the
+        given bitset, covering all of the sparse entries for those actions."""
+        for action_id in ids_from_mask(action_mask):
+            for pattern, entry_ids in self._postings.get(action_id, {}).items():
+                yield action_id, pattern, entry_ids
+
+    def _dense_entries(
+        self, action_mask: int, entry_ids: Iterable[int]
+    ) -> Iterator[tuple[int, _IndexEntry]]:
+        """Yields (bitset of the actions it covers, entry) for each of the given
+        entries that covers any of the actions in the given bitset."""
+        for entry_id in entry_ids:
+            entry = self._entries[entry_id]
+
+            common = entry.mask & action_mask
+            if common:
+                yield common, entry
+
+    def _candidates(self, action_mask: int) -> tuple[Iterator, Iterator]:
+        """Returns the sparse postings and the dense entries to check for a query
+        for the actions in the given bitset. A query for more than
+        DENSE_ENTRY_SIZE actions (e.g. `*`) is dense too: it checks every entry's
+        bitset rather than going through that many posting lists."""
+        if bin(action_mask).count("1") > self.DENSE_ENTRY_SIZE:
+            return iter(()), self._dense_entries(action_mask, self._entries)
+
+        return (
+            self._sparse_postings(action_mask),
+            self._dense_entries(action_mask, self._dense_entry_ids),
+        )
+
+    def search(
+        self, action: str, resource: str = None, effect: str = None
+    ) -> Iterator[tuple[Hashable, PermissionItem]]:
+        """
+        Yields (policy key, permission item) for every permission item in the index
+        for an action matching the given action pattern, and for the given
+        resource (or any resource, if resource is None) and effect (or either
+        effect, if effect is None). Conditions and principals are not evaluated.
+        """
+        catalog = get_catalog()
+        sparse_postings, dense_entries = self._candidates(catalog.match_mask(action))
+
+        def matching_entries():
+            for action_id, pattern, entry_ids in sparse_postings:
+                if resource is None or _resource_matches(pattern, resource):
+                    for entry_id in entry_ids:
+                        yield [action_id], self._entries[entry_id]
+
+            for common, entry in dense_entries:
+                if resource is None or _resource_matches(entry.resource, resource):
+                    yield ids_from_mask(common), entry
+
+        for action_ids, entry in matching_entries():
+            if effect is not None and entry.effect.lower() != effect.lower():
+                continue
+
+            for action_id in action_ids:
+                yield entry.key, PermissionItem(
+                    effect=entry.effect,
+                    action=catalog.action_name(action_id),
+                    resource=entry.resource,
+                    condition=thaw(entry.condition),
+                    principal=thaw(entry.principal),
+                )
+
+    def policies_granting(self, action: str, resource: str = None) -> set:
+        """
+        Returns the keys of the policies that allow any action matching the given
+        action pattern on the given resource (or on any resource, if resource is
+        None), with the same semantics as Policy.grants(): a matching Deny in the
+        same policy overrides its Allows for that action, and conditions and
+        principals are not evaluated.
+        """
+        sparse_postings, dense_entries = self._candidates(
+            get_catalog().match_mask(action)
+        )
+
+        def matches(pattern) -> tuple[bool, bool]:
+            """Returns whether an Allow and a Deny on the given resource pattern
+            match the resource."""
+            if resource is not None:
+                return (_resource_matches(pattern, resource),) * 2
+
+            # an Allow on some resource answers "any resource?", but a Deny on
+            # some resource does not rule out all of them
+            return True, pattern is None or pattern == "*"
+
+        result = set()
+
+        # matching Allows from policies with Denies, as (key, action ID) for
+        # sparse entries and (key, action bitset) for dense ones, and the bitset
+        # of matching Denies for each key
+        sparse_allows = []
+        dense_allows = []
+        denied = {}
+
+        for action_id, pattern, entry_ids in sparse_postings:
+            allow_matches, deny_matches = matches(pattern)
+            if not allow_matches and not deny_matches:
+                continue
+
+            for entry in map(self._entries.__getitem__, entry_ids):
+                if not entry.is_deny:
+                    if not allow_matches:
+                        continue
+
+                    if entry.key in self._deny_keys:
+                        sparse_allows.append((entry.key, action_id))
+                    else:
+                        result.add(entry.key)
+                elif deny_matches:
+                    denied[entry.key] = denied.get(entry.key, 0) | (1 << action_id)
+
+        for common, entry in dense_entries:
+            allow_matches, deny_matches = matches(entry.resource)
+
+            if not entry.is_deny:
+                if not allow_matches:
+                    continue
+
+                if entry.key in self._deny_keys:
+                    dense_allows.append((entry.key, common))
+                else:
+                    result.add(entry.key)
+            elif deny_matches:
+                denied[entry.key] = denied.get(entry.key, 0) | common
+
+        for key, action_id in sparse_allows:
+            if key not in denied or not (denied[key] >> action_id) & 1:
+                result.add(key)
+
+        for key, common in dense_allows:
+            if key not in denied or common & ~denied[key]:
+                result.add(key)
+
+        return result
@@ -1,26 +1,67 @@
+import sys
+
+from aws_iam_utils.util import action_element
+from aws_iam_utils.util import freeze
+from aws_iam_utils.util import resource_element
+from aws_iam_utils.util import thaw
+
+
+def _intern(value):
+    if type(value) is str:
+        return sys.intern(value)
+
+    return freeze(value)
+
+
 class PolicyPermissionItem:
+    """
+    A single permission (one action on one resource) granted or denied by a policy.
+
+    PolicyPermissionItems are immutable and hashable, so they can be put in sets
+    and used as dict keys. Action, effect and resource strings are interned, and
+    conditions and principals are frozen (see `aws_iam_utils.util.freeze`), since
+    large policies hold a great many items with the same values.
+    """
+
+    __slots__ = ("effect", "action", "resource", "condition", "principal", "_hash")
+
     def __init__(self, effect, action, resource=None, condition=None, principal=None):
-        self.effect = effect
-        self.action = action
-        self.resource = resource
-        self.condition = condition
-        self.principal = principal
+        init = object.__setattr__
+        init(self, "effect", _intern(effect))
+        init(self, "action", _intern(action))
+        init(self, "resource", _intern(resource))
+        init(self, "condition", freeze(condition))
+        init(self, "principal", freeze(principal))
+        init(self, "_hash", hash(self.__as_tuple()))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PolicyPermissionItem is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("PolicyPermissionItem is immutable")
+
+    def __reduce__(self):
+        return (PolicyPermissionItem, self.__as_tuple())
 
     def as_statement(self):
-        result = {
-            "Effect": self.effect,
-            "Action": self.action,
-        }
+        result = {"Effect": self.effect}
+
+        k, v = action_element(self.action)
+        result[k] = v
 
         if self.resource is not None:
-            result["Resource"] = self.resource
+            k, v = resource_element(self.resource)
+            result[k] = thaw(v)
         if self.condition is not None:
-            result["Condition"] = self.condition
+            result["Condition"] = thaw(self.condition)
         if self.principal is not None:
-            result["Principal"] = self.principal
+            result["Principal"] = thaw(self.principal)
 
         return result
 
+    def __as_tuple(self):
+        return (self.effect, self.action, self.resource, self.condition, self.principal)
+
     def __as_dict(self):
         return {
             "effect": self.effect,
@@ -33,8 +74,16 @@ class PolicyPermissionItem:
     def __repr__(self):
         return f"PolicyPermissionItem({self.__as_dict()})"
 
+    def __hash__(self):
+        return self._hash
+
     def __eq__(self, other):
         if type(other) is PolicyPermissionItem:
-            return self.__as_dict() == other.__as_dict()
-        else:
+            return self._hash == other._hash and (
+                self.__as_tuple() == other.__as_tuple()
+            )
+
+        elif isinstance(other, dict):
             return self.__as_dict() == other
+
+        return NotImplemented
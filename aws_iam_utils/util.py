@@ -1,5 +1,12 @@
-from policy_sentry.querying.actions import get_action_data
+from typing import Iterator
+from typing import NamedTuple
+from typing import Optional
+from typing import Union
+
 from aws_iam_utils.action_data_overrides import ACTION_DATA_OVERRIDES
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.catalog import ids_from_mask
+from aws_iam_utils.wildcards import compile_wildcard
 
 
 def create_policy(*statements: dict, version: str = "2012-10-17") -> dict:
@@ -30,60 +37,306 @@ def statement(
     return st
 
 
+class NotResource(tuple):
+    """
+    The resources covered by a NotResource element: every resource except those
+    matching any of its patterns. Permission items from statements with
+    NotResource hold one of these as their resource, as an exclusion rather than
+    a list of every other resource.
+
+    NotResources are hashable, and only compare equal to other NotResources with
+    the same patterns (which are deduplicated and sorted).
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, patterns=()):
+        if type(patterns) is str:
+            patterns = [patterns]
+
+        return super().__new__(cls, sorted(set(patterns)))
+
+    def matches(self, resource: str) -> bool:
+        """Returns True if the given resource is covered, i.e. matches none of the
+        patterns."""
+        return not any(compile_wildcard(x).fullmatch(resource) for x in self)
+
+    def __eq__(self, other):
+        return type(other) is NotResource and tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((NotResource, tuple(self)))
+
+    def __reduce__(self):
+        return (NotResource, (tuple(self),))
+
+    def __repr__(self):
+        return f"NotResource({list(self)!r})"
+
+
+class NotAction:
+    """
+    The actions covered by a NotAction element: every action except those
+    matching any of its patterns (case-insensitively). Policy holds one of these
+    as the action of the permission items from a statement with NotAction,
+    instead of one item for every other action in the catalog.
+
+    The element's value is kept (frozen) as given, so that it can be written back
+    out unchanged. NotActions are hashable, and only compare equal to other
+    NotActions with the same value.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        object.__setattr__(self, "value", freeze(value))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("NotAction is immutable")
+
+    @property
+    def patterns(self) -> list[str]:
+        return [self.value] if type(self.value) is str else list(self.value)
+
+    def matches(self, action: str) -> bool:
+        """Returns True if the given action is covered, i.e. matches none of the
+        patterns."""
+        return not any(
+            compile_wildcard(x, ignore_case=True).fullmatch(action)
+            for x in self.patterns
+        )
+
+    def __eq__(self, other):
+        return type(other) is NotAction and self.value == other.value
+
+    def __hash__(self):
+        return hash((NotAction, self.value))
+
+    def __reduce__(self):
+        return (NotAction, (thaw(self.value),))
+
+    def __repr__(self):
+        return f"NotAction({thaw(self.value)!r})"
+
+
+def action_element(action) -> tuple[str, object]:
+    """Returns the statement key and value for a permission item's action:
+    `("NotAction", value)` for a NotAction, or else `("Action", action)`."""
+    if type(action) is NotAction:
+        return "NotAction", thaw(action.value)
+
+    return "Action", action
+
+
+def resource_element(resource) -> tuple[str, object]:
+    """Returns the statement key and value for a permission item's resource:
+    `("NotResource", [patterns])` for a NotResource, or else
+    `("Resource", resource)`."""
+    if type(resource) is NotResource:
+        return "NotResource", list(resource)
+
+    return "Resource", resource
+
+
+class PermissionItem(NamedTuple):
+    """A single permission item, as yielded by iter_policy_permission_items()."""
+
+    effect: str
+    action: Union[str, NotAction]
+    resource: Union[str, NotResource, None]
+    condition: Optional[dict]
+    principal: Optional[dict]
+
+
+def check_statement_supported(statement: dict):
+    """Raises ValueError if the given statement uses a key that
+    extract_policy_permission_items() does not support."""
+    for k in ["NotPrincipal"]:
+        if k in statement:
+            raise ValueError(
+                f"""Policy key {k} is not supported by
+            extract_policy_permission_items() and will be ignored. To
+            ignore this error, call extract_policy_permission_items
+            with allow_unsupported=True."""
+            )
+
+
+def iter_statement_permission_items(
+    statement: dict, allow_unsupported: bool = False, expand_not_action: bool = False
+) -> Iterator[PermissionItem]:
+    """Yields the permission items for a single statement. See
+    iter_policy_permission_items()."""
+    if not allow_unsupported:
+        check_statement_supported(statement)
+
+    if "NotAction" in statement and not expand_not_action:
+        l_actions = [NotAction(statement["NotAction"])]
+    elif "NotAction" in statement:
+        catalog = get_catalog()
+        l_actions = [
+            catalog.action_name(x)
+            for x in ids_from_mask(catalog.not_action_mask(statement["NotAction"]))
+        ]
+    else:
+        actions = statement.get("Action", [])
+        if type(actions) is str:
+            actions = [actions]
+
+        l_actions = [action.lower() for action in actions]
+
+    if "NotResource" in statement:
+        resources = [NotResource(statement["NotResource"])]
+    else:
+        resources = statement.get("Resource", [None])
+        if type(resources) is str:
+            resources = [resources]
+
+    effect = statement.get("Effect")
+    condition = statement.get("Condition")
+    principal = statement.get("Principal")
+
+    for resource in resources:
+        for action in l_actions:
+            yield PermissionItem(effect, action, resource, condition, principal)
+
+
+def iter_policy_permission_items(
+    policy: dict, allow_unsupported: bool = False, expand_not_action: bool = False
+) -> Iterator[PermissionItem]:
+    """
+    Lazily yields a PermissionItem (effect, action, resource, condition,
+    principal) for every individual permission in the given policy, i.e. for
+    every action on every resource in each statement. Actions are lowercased.
+
+    Items are generated as they are consumed, so callers can stop early without
+    building the whole resource x action product, and the policy itself is not
+    copied or modified (conditions and principals are shared with it, so should
+    not be modified either).
+
+    Wildcards in Action are not expanded: pass the policy through
+    expand_policy() first if needed. Nor is NotAction: its items have a NotAction
+    as their action (one per resource), unless expand_not_action is True, in
+    which case it is resolved to every known action it does not match, using
+    the action catalog. NotResource is not expanded: its items have a
+    NotResource as their resource. NotPrincipal is
+    not supported and will result in an exception, unless allow_unsupported is
+    True.
+    """
+    statements = policy["Statement"]
+    if type(statements) is dict:
+        statements = [statements]
+
+    for statement in statements:
+        yield from iter_statement_permission_items(
+            statement, allow_unsupported, expand_not_action
+        )
+
+
 def extract_policy_permission_items(
-    policy: dict, allow_unsupported: bool = False
-) -> dict:
+    policy: dict, allow_unsupported: bool = False, expand_not_action: bool = False
+) -> list[dict]:
     """
     For every individual permission granted, we build a list of
     { permission, resource, condition, principal } ("permission items").
 
-    The policy is always expanded via expand_policy() first.
+    This is useful for comparisons. Wildcards are not expanded, so you may want
+    to call expand_policy() first. NotAction and NotResource are handled as
+    described in iter_policy_permission_items(). Currently it does NOT support
+    the NotPrincipal key. Its presence will result in an exception, unless
+    allow_unsupported is True.
 
-    This is useful for comparisons. Currently it does NOT support
-    NotAction, NotPrincipal, NotResource keys. The presences of
-    those keys will result in an exception, unless allow_unsupported is True.
+    This builds the whole list up front; see iter_policy_permission_items() for a
+    lazy version.
     """
+    return [
+        item._asdict()
+        for item in iter_policy_permission_items(
+            policy, allow_unsupported, expand_not_action
+        )
+    ]
 
-    items = []
 
-    policy_expanded = policy
+class FrozenDict(dict):
+    """An immutable, hashable dict, as returned by freeze(). It compares equal to
+    a plain dict with the same contents."""
 
-    for statement in policy_expanded["Statement"]:
-        if not allow_unsupported:
-            for k in ["NotAction", "NotPrincipal", "NotResource"]:
-                if k in statement:
-                    raise ValueError(
-                        f"""Policy key {k} is not supported by
-                    extract_policy_permission_items() and will be ignored. To
-                    ignore this error, call extract_policy_permission_items
-                    with allow_unsupported=True."""
-                    )
+    def __hash__(self):
+        return hash(frozenset(self.items()))
 
-        for k in ["Action", "Resource"]:
-            if type(statement.get(k)) is str:  # turn into list
-                statement[k] = [statement[k]]
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __immutable(self, *args, **kwargs):
+        raise TypeError("FrozenDict is immutable")
+
+    __setitem__ = __delitem__ = __ior__ = __immutable
+    clear = pop = popitem = setdefault = update = __immutable
 
-        effect = statement.get("Effect")
-        condition = statement.get("Condition")
-        principal = statement.get("Principal")
 
-        for resource in statement.get("Resource", [None]):
-            for action in statement["Action"]:
-                items.append(
-                    {
-                        "effect": effect,
-                        "action": action.lower(),
-                        "resource": resource,
-                        "condition": condition,
-                        "principal": principal,
-                    }
-                )
+class FrozenList(list):
+    """An immutable, hashable list, as returned by freeze(). It compares equal to
+    a plain list with the same contents."""
 
-    return items
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __immutable(self, *args, **kwargs):
+        raise TypeError("FrozenList is immutable")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = __immutable
+    append = clear = extend = insert = pop = remove = reverse = sort = __immutable
+
+
+def freeze(value):
+    """
+    Returns a hashable copy of the given Condition, Principal or other JSON-like
+    value, so that it can be used in sets and as a dict key. Dicts and lists are
+    converted (recursively) into FrozenDicts and FrozenLists, which still compare
+    equal to the originals and serialize to the same JSON.
+    """
+    if type(value) in (FrozenDict, FrozenList, NotResource, NotAction):
+        return value
+
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+
+    if isinstance(value, (list, tuple)):
+        return FrozenList(freeze(v) for v in value)
+
+    return value
+
+
+def thaw(value):
+    """Returns a plain, mutable copy of a value returned by freeze()."""
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+
+    if isinstance(value, list):
+        return [thaw(v) for v in value]
+
+    return value
 
 
 def dedupe_list(lst: list) -> list:
-    return sorted(set(lst), key=lambda x: lst.index(x))
+    return list(dict.fromkeys(lst))
 
 
 def dedupe_policy(policy: dict) -> dict:
@@ -103,11 +356,19 @@ def dedupe_policy(policy: dict) -> dict:
 
 
 def get_action_data_with_overrides(service_name: str, action_name: str) -> dict:
+    """Returns action data for the given action in the same shape as
+    policy_sentry's get_action_data(), i.e. `{service_name: [action_data]}`, or
+    False if the action is not known. Lookups go via the shared action catalog
+    rather than policy_sentry."""
     full_action_name = f"{service_name}:{action_name.lower()}"
     if full_action_name in ACTION_DATA_OVERRIDES:
         return {service_name: [ACTION_DATA_OVERRIDES[full_action_name]]}
 
-    return get_action_data(service_name, action_name)
+    action_data = get_catalog().get(full_action_name)
+    if action_data is None:
+        return False
+
+    return {service_name: [action_data.as_dict()]}
 
 
 def lowercase_policy(p):
@@ -0,0 +1,23 @@
+import functools
+import re
+
+
+def has_wildcards(pattern: str) -> bool:
+    """Returns True if the given action or resource pattern contains any IAM
+    wildcards (`*` or `?`)."""
+    return "*" in pattern or "?" in pattern
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_wildcard(pattern: str, ignore_case: bool = False) -> re.Pattern:
+    """
+    Compiles an IAM action or resource pattern into a regex. As in IAM, `*` matches
+    any sequence of characters (including `:` and `/`) and `?` matches any single
+    character; everything else is literal. Use `fullmatch()` on the result.
+    """
+    return re.compile(
+        "".join(
+            ".*" if c == "*" else "." if c == "?" else re.escape(c) for c in pattern
+        ),
+        re.DOTALL | (re.IGNORECASE if ignore_case else 0),
+    )
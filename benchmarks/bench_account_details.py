@@ -0,0 +1,148 @@
+"""
+Times analyze_account_authorization_details over synthetic exports of
+increasing size, and reports the peak memory allocated while streaming them.
+The exports are read from files, which are seekable and so are read in two
+passes, so the peak should stay roughly flat as the exports grow.
+
+Run from the repository root with `python -m benchmarks.bench_account_details`.
+"""
+
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from aws_iam_utils.account_details import analyze_account_authorization_details
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+N_MANAGED_POLICIES = 200
+
+
+def policy_arn(i: int) -> str:
+    return f"arn:aws:iam::123456789012:policy/policy-{i}"
+
+
+def make_policy(i: int) -> dict:
+    """Returns one of a few policies of varying access levels."""
+    actions = [
+        ["s3:GetObject", "s3:ListBucket"],
+        ["s3:List*"],
+        ["ec2:Describe*", "ec2:StartInstances"],
+        ["dynamodb:GetItem", "dynamodb:Query", "dynamodb:Scan"],
+    ][i % 4]
+
+    return create_policy(
+        statement(actions=actions, resource=f"arn:aws:s3:::bucket-{i}/*")
+    )
+
+
+def write_export(fp, n_principals: int):
+    """Writes an export with n_principals each of users and roles, in the order
+    the CLI uses (managed policies last)."""
+    fp.write('{"UserDetailList": [')
+    for i in range(n_principals):
+        if i:
+            fp.write(",")
+        json.dump(
+            {
+                "UserName": f"user-{i}",
+                "Arn": f"arn:aws:iam::123456789012:user/user-{i}",
+                "GroupList": [f"group-{i % 10}"],
+                "AttachedManagedPolicies": [
+                    {"PolicyArn": policy_arn(i % N_MANAGED_POLICIES)}
+                ],
+                "UserPolicyList": [
+                    {"PolicyName": "inline", "PolicyDocument": make_policy(i)}
+                ],
+            },
+            fp,
+        )
+
+    fp.write('], "GroupDetailList": [')
+    for i in range(10):
+        if i:
+            fp.write(",")
+        json.dump(
+            {
+                "GroupName": f"group-{i}",
+                "Arn": f"arn:aws:iam::123456789012:group/group-{i}",
+                "AttachedManagedPolicies": [{"PolicyArn": policy_arn(i)}],
+            },
+            fp,
+        )
+
+    fp.write('], "RoleDetailList": [')
+    for i in range(n_principals):
+        if i:
+            fp.write(",")
+        json.dump(
+            {
+                "RoleName": f"role-{i}",
+                "Arn": f"arn:aws:iam::123456789012:role/role-{i}",
+                "AttachedManagedPolicies": [
+                    {"PolicyArn": policy_arn((i * 7) % N_MANAGED_POLICIES)}
+                ],
+                "RolePolicyList": [],
+            },
+            fp,
+        )
+
+    fp.write('], "Policies": [')
+    for i in range(N_MANAGED_POLICIES):
+        if i:
+            fp.write(",")
+        json.dump(
+            {
+                "PolicyName": f"policy-{i}",
+                "Arn": policy_arn(i),
+                "DefaultVersionId": "v1",
+                "PolicyVersionList": [
+                    {
+                        "Document": make_policy(i),
+                        "VersionId": "v1",
+                        "IsDefaultVersion": True,
+                    }
+                ],
+            },
+            fp,
+        )
+
+    fp.write("]}")
+
+
+def main():
+    # load the catalog first so that it is not counted below
+    get_catalog()
+
+    for n in [1_000, 10_000, 100_000]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "account-details.json")
+            with open(path, "w") as fp:
+                write_export(fp, n)
+
+            size = os.path.getsize(path)
+
+            start = time.perf_counter()
+            with open(path, "rb") as fp:
+                n_results = sum(1 for _ in analyze_account_authorization_details(fp))
+            t = time.perf_counter() - start
+
+            # measured separately, as tracing slows everything down
+            tracemalloc.start()
+            with open(path, "rb") as fp:
+                for _ in analyze_account_authorization_details(fp):
+                    pass
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        print(
+            f"{n:>6} users and roles {size / 1e6:>7.1f}MB {t:>6.2f}s"
+            f" {n_results / t:>9,.0f} results/s  peak {peak / 1e6:>6.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
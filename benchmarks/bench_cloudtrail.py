@@ -0,0 +1,96 @@
+"""
+Times aggregate_cloudtrail_files over synthetic archives of gzipped CloudTrail
+log files of increasing size, with and without a process pool, and then
+generate_least_privilege_policies over the result.
+
+Run from the repository root with `python -m benchmarks.bench_cloudtrail`.
+"""
+
+import gzip
+import json
+import os
+import tempfile
+import time
+
+from aws_iam_utils.cloudtrail import aggregate_cloudtrail_files
+from aws_iam_utils.cloudtrail import generate_least_privilege_policies
+
+RECORDS_PER_FILE = 1000
+WORKERS = 4
+
+EVENTS = [
+    ("s3.amazonaws.com", "GetObject", "AWS::S3::Object", "arn:aws:s3:::bucket-{}/k"),
+    ("s3.amazonaws.com", "ListObjects", "AWS::S3::Bucket", "arn:aws:s3:::bucket-{}"),
+    ("kms.amazonaws.com", "Decrypt", "AWS::KMS::Key", "arn:aws:kms:::key/{}"),
+    ("dynamodb.amazonaws.com", "Query", None, None),
+    ("sts.amazonaws.com", "GetCallerIdentity", None, None),
+    ("lambda.amazonaws.com", "Invoke", None, None),
+]
+
+
+def make_record(i: int) -> dict:
+    """Returns one of a few events, by one of 50 roles on one of 20 resources."""
+    event_source, event_name, resource_type, arn = EVENTS[i % len(EVENTS)]
+    role_arn = f"arn:aws:iam::123456789012:role/role-{i % 50}"
+
+    return {
+        "eventVersion": "1.08",
+        "userIdentity": {
+            "type": "AssumedRole",
+            "arn": f"arn:aws:sts::123456789012:assumed-role/role-{i % 50}/s",
+            "sessionContext": {"sessionIssuer": {"type": "Role", "arn": role_arn}},
+        },
+        "eventTime": "2024-01-01T00:00:00Z",
+        "eventSource": event_source,
+        "eventName": event_name,
+        "awsRegion": "us-east-1",
+        "sourceIPAddress": "10.0.0.1",
+        "requestParameters": {"key": f"value-{i}"},
+        "resources": (
+            [{"type": resource_type, "ARN": arn.format(i % 20)}] if arn else []
+        ),
+    }
+
+
+def write_archive(path: str, n_files: int):
+    for i in range(n_files):
+        records = [
+            make_record(i * RECORDS_PER_FILE + j) for j in range(RECORDS_PER_FILE)
+        ]
+
+        with gzip.open(os.path.join(path, f"log-{i:05d}.json.gz"), "wt") as f:
+            json.dump({"Records": records}, f)
+
+
+def main():
+    print(
+        f"{'records':>8} {'serial':>8} {f'{WORKERS} workers':>10}"
+        f" {'records/s':>10} {'counters':>9} {'generate':>9}"
+    )
+
+    for n_files in [10, 100, 500]:
+        with tempfile.TemporaryDirectory() as path:
+            write_archive(path, n_files)
+
+            start = time.perf_counter()
+            aggregate = aggregate_cloudtrail_files([path])
+            t_serial = time.perf_counter() - start
+
+            start = time.perf_counter()
+            aggregate_cloudtrail_files([path], workers=WORKERS)
+            t_parallel = time.perf_counter() - start
+
+        start = time.perf_counter()
+        generate_least_privilege_policies(aggregate)
+        t_generate = time.perf_counter() - start
+
+        n_records = n_files * RECORDS_PER_FILE
+        print(
+            f"{n_records:>8} {t_serial:>7.2f}s {t_parallel:>9.2f}s"
+            f" {n_records / t_serial:>10.0f} {len(aggregate):>9}"
+            f" {t_generate * 1000:>7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Times group_equivalent_policies and group_similar_policies over corpora of
+increasing size, against comparing every pair with policies_are_equal, to
+check that both scale linearly with the number of policies.
+
+Run from the repository root with `python -m benchmarks.bench_clustering`.
+"""
+
+import time
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.checks import policies_are_equal
+from aws_iam_utils.clustering import group_equivalent_policies
+from aws_iam_utils.clustering import group_similar_policies
+from aws_iam_utils.fingerprint import clear_fingerprint_cache
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+
+def make_policies(n_policies: int) -> list[tuple[str, dict]]:
+    """Returns n_policies (name, policy) pairs, each granting 20-50 actions on one
+    of 10 buckets. About a third are rewritten copies of an earlier policy
+    (reordered, with a duplicate statement) and another third differ from an
+    earlier policy by a couple of actions."""
+    actions = [x.action for x in get_catalog()]
+
+    policies = []
+    for i in range(n_policies):
+        resource = f"arn:aws:s3:::bucket-{i % 10}/*"
+
+        if i % 3 == 1:
+            _, original = policies[(i * 7) % len(policies)]
+            policy = create_policy(
+                *reversed(original["Statement"]), original["Statement"][0]
+            )
+        elif i % 3 == 2:
+            _, original = policies[(i * 7) % len(policies)]
+            st = original["Statement"][0]
+            policy = create_policy(
+                statement(actions=st["Action"][2:], resource=st["Resource"])
+            )
+        else:
+            start = (i * 37) % (len(actions) - 50)
+            policy = create_policy(
+                statement(
+                    actions=actions[start : start + 20 + i % 30], resource=resource
+                )
+            )
+
+        policies.append((f"policy-{i}", policy))
+
+    return policies
+
+
+def main():
+    print(
+        f"{'policies':>8} {'equivalent':>11} {'similar':>9} {'pairwise':>9}"
+        f" {'grouped':>8} {'groups':>7} {'similar groups':>15}"
+    )
+
+    for n_policies in [100, 1000, 10000]:
+        policies = make_policies(n_policies)
+
+        clear_fingerprint_cache()
+        start = time.perf_counter()
+        groups = group_equivalent_policies(policies)
+        t_equivalent = time.perf_counter() - start
+
+        clear_fingerprint_cache()
+        start = time.perf_counter()
+        similar_groups = group_similar_policies(policies)
+        t_similar = time.perf_counter() - start
+
+        pairwise = "-"
+        if n_policies <= 100:
+            start = time.perf_counter()
+            for i, (_, p1) in enumerate(policies):
+                for _, p2 in policies[i + 1 :]:
+                    policies_are_equal(p1, p2)
+            pairwise = f"{time.perf_counter() - start:.2f}s"
+
+        print(
+            f"{n_policies:>8} {t_equivalent:>10.2f}s {t_similar:>8.2f}s"
+            f" {pairwise:>9} {sum(map(len, groups)):>8} {len(groups):>7}"
+            f" {len(similar_groups):>15}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Times collapse_policy_statements over large combined policies, to check that it
+scales linearly with the number of permission items.
+
+Run from the repository root with `python -m benchmarks.bench_combiner`.
+"""
+
+import timeit
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.combiner import collapse_policy_statements
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+
+def make_policies(n_policies: int) -> list[dict]:
+    """Returns n_policies policies, each granting 100 actions on one of 10 buckets,
+    half of them with a condition, and with some duplicates between policies."""
+    actions = [x.action for x in get_catalog()]
+
+    policies = []
+    for i in range(n_policies):
+        start = (i * 37) % (len(actions) - 100)
+        policies.append(
+            create_policy(
+                statement(
+                    actions=actions[start : start + 100],
+                    resource=f"arn:aws:s3:::bucket-{i % 10}/*",
+                    condition=(
+                        {"StringEquals": {"aws:PrincipalTag/team": f"team-{i % 3}"}}
+                        if i % 2
+                        else None
+                    ),
+                )
+            )
+        )
+
+    return policies
+
+
+def main(number: int = 5):
+    print(f"{'items':>8} {'time':>10} {'per item':>10}")
+
+    for n_policies in [10, 100, 1000]:
+        policies = make_policies(n_policies)
+        t = timeit.timeit(lambda: collapse_policy_statements(*policies), number=number)
+        n_items = n_policies * 100
+
+        print(
+            f"{n_items:>8} {t / number * 1000:>8.1f}ms"
+            f" {t / number / n_items * 1e6:>8.2f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Times PolicyEvaluator.evaluate_many over millions of requests against a policy
+with a mix of exact and wildcard actions, resource patterns, conditions and a
+Deny.
+
+Run from the repository root with `python -m benchmarks.bench_evaluator`.
+"""
+
+import itertools
+import time
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.evaluator import PolicyEvaluator
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+
+def make_policy() -> dict:
+    """Returns a policy with 100 statements over S3 and EC2."""
+    statements = [
+        statement(actions=["s3:Get*", "s3:List*"], resource="*"),
+        statement(
+            effect="Deny",
+            actions="s3:Delete*",
+            resource="arn:aws:s3:::prod-*/*",
+        ),
+        statement(
+            actions="s3:Put*",
+            resource="*",
+            condition={
+                "StringLike": {"aws:PrincipalTag/team": "platform-*"},
+                "IpAddress": {"aws:SourceIp": ["10.0.0.0/8", "192.168.0.0/16"]},
+            },
+        ),
+    ]
+
+    for i in range(97):
+        statements.append(
+            statement(
+                actions=["s3:PutObject", "s3:DeleteObject", f"ec2:*Instance{i % 3}*"],
+                resource=[f"arn:aws:s3:::bucket-{i}/*", f"arn:aws:s3:::prod-{i}/*"],
+            )
+        )
+
+    return create_policy(*statements)
+
+
+def make_requests(n: int) -> list[tuple[str, str, dict]]:
+    """Returns n requests, cycling through all S3 and EC2 actions, 200 resources
+    and 3 request contexts."""
+    catalog = get_catalog()
+    actions = [x.action for x in catalog.actions_for_service("s3")] + [
+        x.action for x in catalog.actions_for_service("ec2")
+    ]
+    resources = [f"arn:aws:s3:::bucket-{i}/key" for i in range(100)] + [
+        f"arn:aws:s3:::prod-{i}/key" for i in range(100)
+    ]
+
+    contexts = [
+        {"aws:PrincipalTag/team": "platform-a", "aws:SourceIp": "10.1.2.3"},
+        {"aws:PrincipalTag/team": "platform-b", "aws:SourceIp": "192.0.2.1"},
+        {"aws:PrincipalTag/team": "data", "aws:SourceIp": "192.168.1.1"},
+    ]
+
+    return list(
+        itertools.islice(
+            zip(
+                itertools.cycle(actions),
+                itertools.cycle(resources),
+                itertools.cycle(contexts),
+            ),
+            n,
+        )
+    )
+
+
+def main():
+    policy = make_policy()
+
+    start = time.perf_counter()
+    evaluator = PolicyEvaluator(policy)
+    print(f"compile: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    for n in [100_000, 1_000_000, 3_000_000]:
+        requests = make_requests(n)
+
+        start = time.perf_counter()
+        for _ in evaluator.evaluate_many(requests):
+            pass
+        t = time.perf_counter() - start
+
+        print(
+            f"{n:>9} requests {t:>7.2f}s {n / t:>12,.0f}/s"
+            f" {t / n * 1e6:>6.2f}us/request"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Compares the native wildcard expander against policyuniverse's expand_policy on
+wildcard-heavy policies.
+
+Run from the repository root with `python -m benchmarks.bench_expander`.
+"""
+
+import timeit
+
+from policyuniverse.expander_minimizer import expand_policy as pu_expand_policy
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.expander import expand_policy
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+POLICIES = {
+    "verb wildcards": create_policy(
+        statement(
+            actions=["s3:Get*", "s3:List*", "ec2:Describe*", "iam:Get*", "iam:List*"],
+            resource="*",
+        )
+    ),
+    "service wildcards": create_policy(
+        statement(actions=["s3:*", "ec2:*", "iam:*", "lambda:*"], resource="*")
+    ),
+    "inner wildcards": create_policy(
+        statement(actions=["*:Describe*", "s3:*Object*", "iam:*Role*"], resource="*")
+    ),
+    "admin": create_policy(statement(actions="*", resource="*")),
+}
+
+
+def main(number: int = 20):
+    # build the catalog up front so we time expansion only
+    get_catalog()
+
+    print(f"{'policy':<20} {'policyuniverse':>15} {'native':>10} {'speedup':>8}")
+
+    for name, policy in POLICIES.items():
+        pu_time = timeit.timeit(lambda: pu_expand_policy(policy), number=number)
+        native_time = timeit.timeit(lambda: expand_policy(policy), number=number)
+
+        print(
+            f"{name:<20} {pu_time / number * 1000:>13.2f}ms"
+            f" {native_time / number * 1000:>8.2f}ms"
+            f" {pu_time / native_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Measures how long it takes to import aws_iam_utils and some of its modules, using
+`python -X importtime` in a fresh interpreter for each, and which heavy
+dependencies each import pulls in. Importing the package, combiner or simplifier
+should not load policy_sentry, policyuniverse or multiprocessing.
+
+Run from the repository root with `python -m benchmarks.bench_import`.
+"""
+
+import subprocess
+import sys
+
+MODULES = [
+    "aws_iam_utils",
+    "aws_iam_utils.combiner",
+    "aws_iam_utils.simplifier",
+    "aws_iam_utils.checks",
+    "aws_iam_utils.generator",
+]
+
+HEAVY_MODULES = ["policy_sentry", "policyuniverse", "multiprocessing"]
+
+
+def import_time(module: str) -> tuple[float, list[str]]:
+    """Returns the cumulative import time of module in seconds, and the heavy
+    modules that were imported along with it."""
+    code = (
+        f"import sys, {module}; "
+        f"print(' '.join(x for x in {HEAVY_MODULES!r} if x in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total = 0
+    for line in result.stderr.splitlines():
+        # lines look like "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        if name.strip() == module.split(".")[0] or name.strip() == module:
+            total = max(total, int(cumulative))
+
+    return total / 1e6, result.stdout.split()
+
+
+def main():
+    print(f"{'module':<28} {'time':>9}  heavy modules")
+
+    for module in MODULES:
+        t, heavy = import_time(module)
+        print(f"{module:<28} {t * 1000:>7.1f}ms  {', '.join(heavy) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Times the PermissionSet algebra over synthetic organizations of increasing
+size: the effective permissions of every role (identity policy ∩ permissions
+boundary ∩ SCP, as a collapsed policy), and the difference between each role
+and the next.
+
+Run from the repository root with `python -m benchmarks.bench_permission_set`.
+"""
+
+import time
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.permission_set import permission_set_from_policy
+from aws_iam_utils.permission_set import policy_from_permission_set
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+SCP = create_policy(
+    statement(actions="*", resource="*"),
+    statement(effect="Deny", actions=["organizations:*", "account:*"], resource="*"),
+    statement(
+        effect="Deny",
+        actions="s3:DeleteBucket",
+        resource="*",
+        condition={"Bool": {"aws:MultiFactorAuthPresent": "false"}},
+    ),
+)
+
+BOUNDARIES = [
+    create_policy(statement(actions=["s3:*", "kms:*", "sqs:*"], resource="*")),
+    create_policy(
+        statement(actions=["ec2:*", "iam:PassRole"], resource="*"),
+        statement(actions="s3:Get*", resource="arn:aws:s3:::shared-*"),
+    ),
+    create_policy(statement(actions="*", resource="*")),
+]
+
+
+def make_identity_policy(i: int, actions: list[str]) -> dict:
+    """Returns a policy with a service wildcard, a range of specific actions on
+    a bucket, and sometimes a Deny."""
+    start = (i * 37) % (len(actions) - 40)
+    statements = [
+        statement(actions=["s3:*", "sqs:*", "ec2:Describe*"][i % 3], resource="*"),
+        statement(
+            actions=actions[start : start + 40],
+            resource=f"arn:aws:s3:::shared-{i % 10}/*",
+        ),
+    ]
+    if i % 5 == 0:
+        statements.append(statement(effect="Deny", actions="s3:Delete*", resource="*"))
+
+    return create_policy(*statements)
+
+
+def main():
+    print(f"{'roles':>6} {'build':>8} {'effective':>10} {'policies':>9} {'diff':>8}")
+
+    actions = [x.action for x in get_catalog()]
+
+    scp = permission_set_from_policy(SCP)
+    boundaries = [permission_set_from_policy(x) for x in BOUNDARIES]
+
+    for n_roles in [100, 1000, 10000]:
+        policies = [make_identity_policy(i, actions) for i in range(n_roles)]
+
+        start = time.perf_counter()
+        roles = [permission_set_from_policy(x) for x in policies]
+        t_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        effective = [
+            role.intersection(boundaries[i % len(boundaries)]).intersection(scp)
+            for i, role in enumerate(roles)
+        ]
+        t_effective = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for x in effective:
+            policy_from_permission_set(x)
+        t_policies = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for a, b in zip(effective, effective[1:]):
+            a.difference(b)
+        t_diff = time.perf_counter() - start
+
+        print(
+            f"{n_roles:>6} {t_build:>7.2f}s {t_effective:>9.2f}s"
+            f" {t_policies:>8.2f}s {t_diff:>7.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Times building a PolicyIndex over corpora of increasing size, queries against
+it, and replacing policies in it, against answering the same query by
+scanning every policy's permission items.
+
+Run from the repository root with `python -m benchmarks.bench_policy_index`.
+"""
+
+import time
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.policy_index import PolicyIndex
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import extract_policy_permission_items
+from aws_iam_utils.util import statement
+
+QUERIES = [
+    ("iam:PassRole", "arn:aws:iam::123456789012:role/app-7"),
+    ("kms:Decrypt", None),
+    ("s3:Get*", "arn:aws:s3:::bucket-3/key"),
+]
+
+
+def make_policies(n_policies: int) -> list[tuple[str, dict]]:
+    """Returns n_policies (name, policy) pairs, each granting 50 actions on one of
+    100 resources; one in 100 also grants everything."""
+    actions = [x.action for x in get_catalog()]
+
+    policies = []
+    for i in range(n_policies):
+        start = (i * 37) % (len(actions) - 50)
+        statements = [
+            statement(
+                actions=actions[start : start + 50] + ["iam:PassRole", "kms:Decrypt"],
+                resource=[
+                    f"arn:aws:s3:::bucket-{i % 100}/*",
+                    f"arn:aws:iam::123456789012:role/app-{i % 100}",
+                ],
+            )
+        ]
+        if i % 100 == 0:
+            statements.append(statement(actions="*", resource="*"))
+
+        policies.append((f"policy-{i}", create_policy(*statements)))
+
+    return policies
+
+
+def main():
+    print(
+        f"{'policies':>8} {'build':>8} {'query':>10} {'update':>10}"
+        f" {'scan query':>11}"
+    )
+
+    for n_policies in [100, 1000, 10000]:
+        policies = make_policies(n_policies)
+
+        start = time.perf_counter()
+        index = PolicyIndex(policies)
+        t_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for action, resource in QUERIES:
+            index.policies_granting(action, resource)
+        t_query = (time.perf_counter() - start) / len(QUERIES)
+
+        start = time.perf_counter()
+        for key, policy in policies[:100]:
+            index.add(key, policy)
+        t_update = (time.perf_counter() - start) / 100
+
+        t_scan = "-"
+        if n_policies <= 1000:
+            start = time.perf_counter()
+            for _, policy in policies:
+                for item in extract_policy_permission_items(policy):
+                    if item["action"] == "iam:passrole":
+                        break
+            t_scan = f"{(time.perf_counter() - start) * 1000:.1f}ms"
+
+        print(
+            f"{n_policies:>8} {t_build:>7.2f}s {t_query * 1000:>8.2f}ms"
+            f" {t_update * 1000:>8.2f}ms {t_scan:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
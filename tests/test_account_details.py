@@ -0,0 +1,317 @@
+import functools
+import io
+import json
+import urllib.parse
+
+import pytest
+
+from aws_iam_utils.account_details import PolicyResult
+from aws_iam_utils.account_details import PrincipalResult
+from aws_iam_utils.account_details import analyze_account_authorization_details
+from aws_iam_utils.account_details import iter_account_authorization_details
+from aws_iam_utils.checks import policy_has_only_these_arn_types
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+READ_POLICY = create_policy(statement(actions=["s3:GetObject"], resource="*"))
+WRITE_POLICY = create_policy(statement(actions=["s3:PutObject"], resource="*"))
+LIST_POLICY = create_policy(statement(actions=["s3:ListBucket"], resource="*"))
+INVALID_POLICY = create_policy(statement(actions=["s3:MadeUpAction"], resource="*"))
+
+
+def managed_policy(name, document):
+    return {
+        "PolicyName": name,
+        "Arn": f"arn:aws:iam::123456789012:policy/{name}",
+        "DefaultVersionId": "v2",
+        "PolicyVersionList": [
+            {"Document": WRITE_POLICY, "VersionId": "v1", "IsDefaultVersion": False},
+            {"Document": document, "VersionId": "v2", "IsDefaultVersion": True},
+        ],
+    }
+
+
+def attached(name):
+    return {
+        "PolicyName": name,
+        "PolicyArn": f"arn:aws:iam::123456789012:policy/{name}",
+    }
+
+
+ACCOUNT_DETAILS = {
+    "UserDetailList": [
+        {
+            "UserName": "alice",
+            "Arn": "arn:aws:iam::123456789012:user/alice",
+            "GroupList": ["readers"],
+            "AttachedManagedPolicies": [attached("List")],
+            "UserPolicyList": [
+                {"PolicyName": "inline-read", "PolicyDocument": READ_POLICY}
+            ],
+        },
+        {
+            "UserName": "bob",
+            "Arn": "arn:aws:iam::123456789012:user/bob",
+            "GroupList": ["writers"],
+            "AttachedManagedPolicies": [],
+        },
+        {
+            "UserName": "carol",
+            "Arn": "arn:aws:iam::123456789012:user/carol",
+            "GroupList": [],
+            "AttachedManagedPolicies": [attached("Invalid")],
+        },
+    ],
+    "GroupDetailList": [
+        {
+            "GroupName": "readers",
+            "Arn": "arn:aws:iam::123456789012:group/readers",
+            "GroupPolicyList": [],
+            "AttachedManagedPolicies": [attached("Read")],
+        },
+        {
+            "GroupName": "writers",
+            "Arn": "arn:aws:iam::123456789012:group/writers",
+            "GroupPolicyList": [
+                {
+                    "PolicyName": "inline-write",
+                    "PolicyDocument": urllib.parse.quote(json.dumps(WRITE_POLICY)),
+                }
+            ],
+            "AttachedManagedPolicies": [attached("Read")],
+        },
+    ],
+    "RoleDetailList": [
+        {
+            "RoleName": "lister",
+            "Arn": "arn:aws:iam::123456789012:role/lister",
+            "AssumeRolePolicyDocument": {"Statement": []},
+            "RolePolicyList": [],
+            "AttachedManagedPolicies": [attached("List")],
+            "Tags": [{"Key": "a", "Value": 1.5}],
+        }
+    ],
+    "Policies": [
+        managed_policy("Read", READ_POLICY),
+        managed_policy("List", LIST_POLICY),
+        managed_policy("Invalid", INVALID_POLICY),
+    ],
+}
+
+
+class NonSeekableStringIO(io.StringIO):
+    """A StringIO that claims not to be seekable, like a pipe."""
+
+    def seekable(self):
+        return False
+
+
+@pytest.fixture(params=[True, False], ids=["seekable", "pipe"])
+def seekable(request):
+    return request.param
+
+
+@pytest.fixture
+def export(seekable):
+    def make(account_details):
+        text = json.dumps(account_details)
+        return io.StringIO(text) if seekable else NonSeekableStringIO(text)
+
+    return make
+
+
+def results_by_arn(results, result_type):
+    return {x.arn: x.results for x in results if type(x) is result_type}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024 * 1024])
+@pytest.mark.parametrize("as_bytes", [False, True])
+def test_iter_account_authorization_details(chunk_size, as_bytes):
+    data = json.dumps(
+        {"Marker": "x", **ACCOUNT_DETAILS, "IsTruncated": False, "Count": 12345},
+        indent=2,
+    )
+    fp = io.BytesIO(data.encode("utf-8")) if as_bytes else io.StringIO(data)
+
+    entries = list(iter_account_authorization_details(fp, chunk_size=chunk_size))
+
+    assert entries == [
+        (section, entry)
+        for section, entries in ACCOUNT_DETAILS.items()
+        for entry in entries
+    ]
+
+
+def test_iter_account_authorization_details_empty():
+    assert list(iter_account_authorization_details(io.StringIO("{}"))) == []
+    assert (
+        list(iter_account_authorization_details(io.StringIO('{"Policies": []}'))) == []
+    )
+
+
+def test_iter_account_authorization_details_invalid():
+    with pytest.raises(ValueError):
+        list(iter_account_authorization_details(io.StringIO("[]")))
+
+    with pytest.raises(ValueError):
+        list(iter_account_authorization_details(io.StringIO('{"Policies": [{}')))
+
+
+def test_analyze_account_authorization_details(export, seekable):
+    results = list(
+        analyze_account_authorization_details(export(ACCOUNT_DETAILS), chunk_size=16)
+    )
+
+    policies = [x for x in results if type(x) is PolicyResult]
+    if seekable:
+        # managed policies and groups are read first, then users and roles
+        assert [(x.kind, x.name) for x in policies] == [
+            ("group", "inline-write"),
+            ("managed", "Read"),
+            ("managed", "List"),
+            ("managed", "Invalid"),
+            ("user", "inline-read"),
+        ]
+        assert [x.kind for x in results if type(x) is PrincipalResult] == [
+            "group",
+            "group",
+            "user",
+            "user",
+            "user",
+            "role",
+        ]
+    else:
+        assert [(x.kind, x.name) for x in policies] == [
+            ("user", "inline-read"),
+            ("group", "inline-write"),
+            ("managed", "Read"),
+            ("managed", "List"),
+            ("managed", "Invalid"),
+        ]
+
+    assert results_by_arn(policies, PolicyResult) == {
+        "arn:aws:iam::123456789012:user/alice": {"read_only": True, "list_only": False},
+        "arn:aws:iam::123456789012:group/writers": {
+            "read_only": False,
+            "list_only": False,
+        },
+        "arn:aws:iam::123456789012:policy/Read": {
+            "read_only": True,
+            "list_only": False,
+        },
+        "arn:aws:iam::123456789012:policy/List": {"read_only": True, "list_only": True},
+        "arn:aws:iam::123456789012:policy/Invalid": {
+            "read_only": None,
+            "list_only": None,
+        },
+    }
+
+    assert results_by_arn(results, PrincipalResult) == {
+        "arn:aws:iam::123456789012:user/alice": {"read_only": True, "list_only": False},
+        "arn:aws:iam::123456789012:user/bob": {"read_only": False, "list_only": False},
+        "arn:aws:iam::123456789012:user/carol": {"read_only": None, "list_only": None},
+        "arn:aws:iam::123456789012:group/readers": {
+            "read_only": True,
+            "list_only": False,
+        },
+        "arn:aws:iam::123456789012:group/writers": {
+            "read_only": False,
+            "list_only": False,
+        },
+        "arn:aws:iam::123456789012:role/lister": {"read_only": True, "list_only": True},
+    }
+
+
+def test_analyze_account_authorization_details_resolves_principals_early(export):
+    # with the policies first, principals are resolved as soon as they are read
+    account_details = {
+        "Policies": ACCOUNT_DETAILS["Policies"],
+        "RoleDetailList": ACCOUNT_DETAILS["RoleDetailList"],
+        "UserDetailList": [],
+    }
+
+    results = list(analyze_account_authorization_details(export(account_details)))
+
+    assert [type(x) for x in results] == [PolicyResult] * 3 + [PrincipalResult]
+
+
+def test_analyze_account_authorization_details_missing_policy(export):
+    account_details = {"RoleDetailList": ACCOUNT_DETAILS["RoleDetailList"]}
+
+    results = list(analyze_account_authorization_details(export(account_details)))
+
+    assert results == [
+        PrincipalResult(
+            "role",
+            "lister",
+            "arn:aws:iam::123456789012:role/lister",
+            {"read_only": None, "list_only": None},
+        )
+    ]
+
+
+def test_analyze_account_authorization_details_custom_checks(export):
+    checks = {
+        "objects_only": functools.partial(
+            policy_has_only_these_arn_types, service_name="s3", arn_types=["object"]
+        )
+    }
+
+    results = analyze_account_authorization_details(export(ACCOUNT_DETAILS), checks)
+
+    assert results_by_arn(results, PrincipalResult) == {
+        "arn:aws:iam::123456789012:user/alice": {"objects_only": False},
+        "arn:aws:iam::123456789012:user/bob": {"objects_only": True},
+        "arn:aws:iam::123456789012:user/carol": {"objects_only": None},
+        "arn:aws:iam::123456789012:group/readers": {"objects_only": True},
+        "arn:aws:iam::123456789012:group/writers": {"objects_only": True},
+        "arn:aws:iam::123456789012:role/lister": {"objects_only": False},
+    }
+
+
+def test_analyze_account_authorization_details_missing_group_policy(export):
+    # the group's policy is missing, so its results are only known at the end,
+    # after which the user waiting for it can be resolved too
+    account_details = {
+        "UserDetailList": ACCOUNT_DETAILS["UserDetailList"][:2],
+        "GroupDetailList": [
+            {**x, "AttachedManagedPolicies": [attached("Missing")]}
+            for x in ACCOUNT_DETAILS["GroupDetailList"]
+        ],
+        "Policies": ACCOUNT_DETAILS["Policies"],
+    }
+
+    results = analyze_account_authorization_details(export(account_details))
+
+    assert results_by_arn(results, PrincipalResult) == {
+        "arn:aws:iam::123456789012:user/alice": {"read_only": None, "list_only": False},
+        "arn:aws:iam::123456789012:user/bob": {"read_only": False, "list_only": False},
+        "arn:aws:iam::123456789012:group/readers": {
+            "read_only": None,
+            "list_only": None,
+        },
+        "arn:aws:iam::123456789012:group/writers": {
+            "read_only": False,
+            "list_only": False,
+        },
+    }
+
+
+def test_analyze_account_authorization_details_file(tmp_path):
+    # a binary file is seekable, so is read in two passes, with the same results
+    path = tmp_path / "account-details.json"
+    path.write_text(json.dumps(ACCOUNT_DETAILS))
+
+    with open(path, "rb") as fp:
+        results = list(analyze_account_authorization_details(fp, chunk_size=7))
+
+    expected = list(
+        analyze_account_authorization_details(
+            NonSeekableStringIO(json.dumps(ACCOUNT_DETAILS))
+        )
+    )
+
+    def key(x):
+        return type(x).__name__, x.kind, x.name, x.arn
+
+    assert sorted(results, key=key) == sorted(expected, key=key)
@@ -0,0 +1,135 @@
+from unittest import mock
+
+import pytest
+
+from aws_iam_utils.cache import PolicyCache
+from aws_iam_utils.constants import LIST
+from aws_iam_utils.constants import READ
+from aws_iam_utils.expander import expand_policy
+from aws_iam_utils.fingerprint import policy_fingerprint
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+
+def make_policy(i: int = 0) -> dict:
+    return create_policy(
+        statement(actions=["s3:Get*", "s3:ListBucket"], resource=f"arn:aws:s3:::b{i}")
+    )
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+
+def test_cache_results_match_uncached(cache_path):
+    policy = make_policy()
+
+    with PolicyCache(cache_path) as cache:
+        for _ in range(2):
+            assert cache.expand_policy(policy) == expand_policy(policy)
+            assert cache.policy_fingerprint(policy) == policy_fingerprint(policy)
+            assert cache.policy_has_only_these_access_levels(policy, [READ, LIST])
+            assert not cache.policy_has_only_these_access_levels(policy, [LIST])
+
+        assert len(cache) == 4
+
+
+def test_cache_persists_between_instances(cache_path):
+    policy = make_policy()
+
+    with PolicyCache(cache_path) as cache:
+        assert cache.policy_has_only_these_access_levels(policy, [READ, LIST])
+
+    with PolicyCache(cache_path) as cache:
+        with mock.patch(
+            "aws_iam_utils.cache.policy_has_only_these_access_levels"
+        ) as check:
+            assert cache.policy_has_only_these_access_levels(policy, [LIST, READ])
+            check.assert_not_called()
+
+
+def test_cache_invalidated_by_catalog_version(cache_path):
+    with PolicyCache(cache_path) as cache:
+        cache.policy_fingerprint(make_policy())
+        assert len(cache) == 1
+
+    # e.g. after upgrading policy_sentry
+    other_catalog = mock.Mock(version="another-version")
+
+    with mock.patch("aws_iam_utils.cache.get_catalog", return_value=other_catalog):
+        with PolicyCache(cache_path) as cache:
+            assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used(cache_path):
+    with PolicyCache(cache_path, max_size=2000) as cache:
+        for i in range(20):
+            cache.expand_policy(make_policy(i))
+
+        assert cache.size() <= 2000
+        assert 0 < len(cache) < 20
+
+        cache.clear()
+        assert len(cache) == 0
+
+
+def test_cache_does_not_store_errors(cache_path):
+    policy = create_policy(statement(actions="notaservice:DoThing", resource="*"))
+
+    with PolicyCache(cache_path) as cache:
+        with pytest.raises(ValueError):
+            cache.policy_has_only_these_access_levels(policy, [READ])
+
+        assert len(cache) == 0
+
+
+def test_cache_size_is_kept_up_to_date(cache_path):
+    def summed_size(cache):
+        return cache._db.execute("SELECT SUM(size) FROM entries").fetchone()[0] or 0
+
+    with PolicyCache(cache_path, max_size=2000) as cache:
+        for i in range(20):
+            cache.expand_policy(make_policy(i))
+            assert cache.size() == summed_size(cache)
+
+        cache.clear()
+        assert cache.size() == 0
+
+    with PolicyCache(cache_path) as cache:
+        cache.policy_fingerprint(make_policy())
+        size = cache.size()
+        assert size == summed_size(cache) > 0
+
+    with PolicyCache(cache_path) as cache:
+        assert cache.size() == size
+
+
+def test_cache_shares_entries_between_equivalent_policies(cache_path):
+    equivalent = create_policy(
+        statement(actions=["S3:LISTBUCKET", "s3:get*", "s3:Get*"], resource="*")
+    )
+    equivalent["Statement"][0]["Resource"] = ["*"]
+
+    with PolicyCache(cache_path) as cache:
+        policy = create_policy(
+            statement(actions=["s3:Get*", "s3:ListBucket"], resource="*")
+        )
+        fingerprint = cache.policy_fingerprint(policy)
+        assert cache.policy_fingerprint(equivalent) == fingerprint
+        assert len(cache) == 1
+
+
+def test_cache_expand_policy_is_not_shared_between_spellings(cache_path):
+    def make(actions, resources):
+        return create_policy(
+            statement(effect="Deny", actions=actions, resource=resources)
+        )
+
+    first = make(["S3:PutObject", "s3:GetObject"], ["b", "a"])
+    second = make(["s3:getobject", "s3:putobject"], ["a", "b"])
+
+    with PolicyCache(cache_path) as cache:
+        assert cache.expand_policy(first) == expand_policy(first)
+        assert cache.expand_policy(second) == expand_policy(second)
+        assert len(cache) == 2
@@ -0,0 +1,65 @@
+from policy_sentry.querying.actions import get_action_data
+from policy_sentry.querying.actions import get_actions_for_service
+from policy_sentry.querying.actions import get_actions_matching_arn_type
+
+from aws_iam_utils.action_data_overrides import ACTION_DATA_OVERRIDES
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.constants import WILDCARD_ARN_TYPE
+
+
+def test_catalog_access_level_matches_policy_sentry():
+    catalog = get_catalog()
+
+    for action in get_actions_for_service("s3"):
+        service_name, action_name = action.split(":")
+        expected = get_action_data(service_name, action_name)[service_name][0]
+
+        assert catalog.access_level(action) == expected["access_level"]
+        assert catalog.access_level(action.upper()) == expected["access_level"]
+
+
+def test_catalog_includes_overrides():
+    catalog = get_catalog()
+
+    for action, override in ACTION_DATA_OVERRIDES.items():
+        assert action in catalog
+        assert catalog.access_level(action) == override["access_level"]
+
+
+def test_catalog_unknown_action():
+    catalog = get_catalog()
+
+    assert "s3:notarealaction" not in catalog
+    assert catalog.get("s3:notarealaction") is None
+    assert catalog.access_level("notaservice:getobject") is None
+
+
+def test_catalog_actions_matching_arn_type():
+    catalog = get_catalog()
+
+    for arn_type in ["bucket", "object", WILDCARD_ARN_TYPE]:
+        assert sorted(
+            x.action for x in catalog.actions_matching_arn_type("s3", arn_type)
+        ) == sorted(get_actions_matching_arn_type("s3", arn_type))
+
+
+def test_catalog_match_access_levels():
+    catalog = get_catalog()
+
+    assert catalog.match_access_levels("s3:GetObject") == {"Read"}
+    assert catalog.match_access_levels("s3:List*") == {
+        catalog.access_level(x) for x in catalog.match_actions("s3:List*")
+    }
+    assert catalog.match_access_levels("*") == {x.access_level for x in catalog}
+    assert catalog.match_access_levels("notaservice:*") == frozenset()
+
+
+def test_catalog_version_depends_on_overrides():
+    from policy_sentry.shared.iam_data import iam_definition
+
+    from aws_iam_utils.catalog import build_catalog_from_iam_definition
+
+    assert get_catalog().version == get_catalog().version
+    assert build_catalog_from_iam_definition(iam_definition, {}).version != (
+        get_catalog().version
+    )
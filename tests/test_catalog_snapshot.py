@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.catalog_snapshot import load_catalog_snapshot
+from aws_iam_utils.catalog_snapshot import main
+from aws_iam_utils.catalog_snapshot import write_catalog_snapshot
+from aws_iam_utils.constants import WILDCARD_ARN_TYPE
+
+
+@pytest.fixture(scope="module")
+def mapped_catalog(tmp_path_factory):
+    path = tmp_path_factory.mktemp("snapshot") / "catalog.snapshot"
+    write_catalog_snapshot(get_catalog(), str(path))
+
+    return load_catalog_snapshot(str(path))
+
+
+def test_snapshot_has_same_actions(mapped_catalog):
+    catalog = get_catalog()
+
+    assert len(mapped_catalog) == len(catalog)
+    assert list(mapped_catalog) == sorted(catalog, key=lambda x: x.action.lower())
+    assert mapped_catalog.services() == catalog.services()
+
+
+def test_snapshot_lookups(mapped_catalog):
+    catalog = get_catalog()
+
+    for action in ["s3:GetObject", "EC2:DescribeInstances", "events:describe*"]:
+        assert (action in mapped_catalog) == (action in catalog)
+        assert mapped_catalog.get(action) == catalog.get(action)
+        assert mapped_catalog.access_level(action) == catalog.access_level(action)
+
+    assert "s3:notarealaction" not in mapped_catalog
+    assert mapped_catalog.get("s3:notarealaction") is None
+    assert mapped_catalog.access_level("s3:notarealaction") is None
+
+    assert mapped_catalog.has_service("S3")
+    assert not mapped_catalog.has_service("notaservice")
+    assert mapped_catalog.actions_for_service("s3") == catalog.actions_for_service("s3")
+    assert mapped_catalog.actions_for_service("notaservice") == []
+
+    for arn_type in ["bucket", "object", WILDCARD_ARN_TYPE]:
+        assert mapped_catalog.actions_matching_arn_type(
+            "s3", arn_type
+        ) == catalog.actions_matching_arn_type("s3", arn_type)
+
+
+def test_snapshot_matching(mapped_catalog):
+    catalog = get_catalog()
+
+    for pattern in ["*", "s3:*", "s3:Get*Acl", "ec2:Describe*", "s3:GetObjec?"]:
+        assert mapped_catalog.match_actions(pattern) == catalog.match_actions(pattern)
+        assert mapped_catalog.match_access_levels(
+            pattern
+        ) == catalog.match_access_levels(pattern)
+
+    assert mapped_catalog.all_actions_mask() == catalog.all_actions_mask()
+    assert mapped_catalog.match_mask("s3:Get*") == catalog.match_mask("s3:Get*")
+
+
+def test_snapshot_unknown_action_ids(mapped_catalog):
+    action_id = mapped_catalog.action_id("notaservice:DoThing")
+
+    assert action_id >= len(mapped_catalog)
+    assert mapped_catalog.action_id("notaservice:dothing") == action_id
+    assert mapped_catalog.action_name(action_id) == "notaservice:dothing"
+
+    s3_id = mapped_catalog.action_id("s3:GetObject")
+    assert mapped_catalog.action_name(s3_id) == "s3:getobject"
+
+
+def test_snapshot_cli(tmp_path):
+    path = tmp_path / "catalog.snapshot"
+
+    assert main([str(path)]) == 0
+    assert len(load_catalog_snapshot(str(path))) == len(get_catalog())
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "not-a-snapshot"
+    path.write_bytes(b"hello, world" * 10)
+
+    with pytest.raises(ValueError):
+        load_catalog_snapshot(str(path))
+
+
+def test_get_catalog_uses_snapshot_from_env(tmp_path):
+    path = tmp_path / "catalog.snapshot"
+    write_catalog_snapshot(get_catalog(), str(path))
+
+    code = (
+        "import sys; from aws_iam_utils.catalog import get_catalog; "
+        "print(type(get_catalog()).__name__, 'policy_sentry' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, "AWS_IAM_UTILS_CATALOG_SNAPSHOT": str(path)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.split() == ["MappedActionCatalog", "False"]
@@ -0,0 +1,25 @@
+from aws_iam_utils.checks import check_policies
+from aws_iam_utils.checks import is_read_only_policy
+from aws_iam_utils.constants import READ, LIST
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+POLICIES = [
+    create_policy(statement(actions="s3:GetObject", resource="*")),
+    create_policy(statement(actions="s3:PutObject", resource="*")),
+    create_policy(statement(actions=["s3:List*", "ec2:Describe*"], resource="*")),
+    create_policy(statement(actions="iam:*", resource="*")),
+] * 10
+
+
+def test_check_policies_in_process():
+    result = list(check_policies(POLICIES, [READ, LIST], workers=1))
+
+    assert result == [is_read_only_policy(p) for p in POLICIES]
+    assert list(check_policies(POLICIES, [READ, LIST])) == result
+
+
+def test_check_policies_with_workers():
+    result = list(check_policies(iter(POLICIES), [READ, LIST], workers=2, chunksize=3))
+
+    assert result == [is_read_only_policy(p) for p in POLICIES]
@@ -0,0 +1,182 @@
+import gzip
+import json
+from collections import Counter
+
+from aws_iam_utils.cloudtrail import CloudTrailAggregate
+from aws_iam_utils.cloudtrail import aggregate_cloudtrail_files
+from aws_iam_utils.cloudtrail import event_action
+from aws_iam_utils.cloudtrail import generate_least_privilege_policies
+from aws_iam_utils.cloudtrail import iter_cloudtrail_files
+from aws_iam_utils.util import create_lowercase_policy
+from aws_iam_utils.util import statement
+
+ROLE_ARN = "arn:aws:iam::123456789012:role/app"
+USER_ARN = "arn:aws:iam::123456789012:user/alice"
+
+
+def role_session():
+    return {
+        "type": "AssumedRole",
+        "arn": "arn:aws:sts::123456789012:assumed-role/app/session",
+        "sessionContext": {"sessionIssuer": {"type": "Role", "arn": ROLE_ARN}},
+    }
+
+
+def event(identity, event_source, event_name, resources=(), **kwargs):
+    return {
+        "userIdentity": identity,
+        "eventSource": event_source,
+        "eventName": event_name,
+        "resources": [{"type": t, "ARN": arn} for t, arn in resources],
+        **kwargs,
+    }
+
+
+RECORDS = [
+    event(
+        role_session(),
+        "s3.amazonaws.com",
+        "GetObject",
+        [
+            ("AWS::S3::Object", "arn:aws:s3:::bucket/key"),
+            ("AWS::S3::Bucket", "arn:aws:s3:::bucket"),
+        ],
+    ),
+    event(
+        role_session(),
+        "s3.amazonaws.com",
+        "ListObjects",
+        [("AWS::S3::Bucket", "arn:aws:s3:::bucket")],
+    ),
+    event(role_session(), "s3.amazonaws.com", "ListBuckets"),
+    event(role_session(), "kms.amazonaws.com", "Decrypt"),
+    event(role_session(), "kms.amazonaws.com", "Decrypt"),
+    event(role_session(), "madeup.amazonaws.com", "DoThing"),
+    event(
+        {"type": "IAMUser", "arn": USER_ARN},
+        "lambda.amazonaws.com",
+        "UpdateFunctionConfiguration20150331v2",
+    ),
+    event(
+        {"type": "IAMUser", "arn": USER_ARN},
+        "iam.amazonaws.com",
+        "DeleteRole",
+        errorCode="AccessDenied",
+    ),
+    event(
+        {"type": "AWSService", "invokedBy": "ec2.amazonaws.com"},
+        "sts.amazonaws.com",
+        "AssumeRole",
+    ),
+]
+
+
+def write_logs(path, records, n_files):
+    """Writes records across n_files gzipped CloudTrail log files, and a digest
+    file that should be ignored."""
+    (path / "CloudTrail-Digest").mkdir()
+    (path / "CloudTrail-Digest" / "digest.json.gz").write_bytes(b"")
+
+    for i in range(n_files):
+        with gzip.open(path / f"log-{i:03d}.json.gz", "wt") as f:
+            json.dump({"Records": records[i::n_files]}, f)
+
+
+def test_event_action():
+    assert event_action("s3.amazonaws.com", "GetObject") == "s3:GetObject"
+    assert event_action("s3.amazonaws.com", "HeadObject") == "s3:GetObject"
+    assert event_action("monitoring.amazonaws.com", "PutMetricData") == (
+        "cloudwatch:PutMetricData"
+    )
+    assert event_action("lambda.amazonaws.com", "Invoke") == "lambda:InvokeFunction"
+    assert event_action("lambda.amazonaws.com", "GetFunction20150331v2") == (
+        "lambda:GetFunction"
+    )
+    assert event_action("madeup.amazonaws.com", "DoThing") is None
+
+
+def test_aggregate():
+    aggregate = CloudTrailAggregate()
+    for record in RECORDS:
+        aggregate.add_record(record)
+
+    assert aggregate.n_records == len(RECORDS)
+    assert aggregate.n_skipped == 2
+    assert aggregate.counts == {
+        (ROLE_ARN, "s3.amazonaws.com", "GetObject", "arn:aws:s3:::bucket/key"): 1,
+        (ROLE_ARN, "s3.amazonaws.com", "ListObjects", "arn:aws:s3:::bucket"): 1,
+        (ROLE_ARN, "s3.amazonaws.com", "ListBuckets", "*"): 1,
+        (ROLE_ARN, "kms.amazonaws.com", "Decrypt", "*"): 2,
+        (ROLE_ARN, "madeup.amazonaws.com", "DoThing", "*"): 1,
+        (
+            USER_ARN,
+            "lambda.amazonaws.com",
+            "UpdateFunctionConfiguration20150331v2",
+            "*",
+        ): 1,
+    }
+    assert aggregate.unmapped_events() == Counter(
+        {("madeup.amazonaws.com", "DoThing"): 1}
+    )
+
+    assert CloudTrailAggregate.from_dict(aggregate.as_dict()) == aggregate
+    as_json = json.dumps(aggregate.as_dict())
+    assert CloudTrailAggregate.from_dict(json.loads(as_json)) == aggregate
+
+    with_denied = CloudTrailAggregate()
+    with_denied.add_record(RECORDS[-2], include_denied=True)
+    assert list(with_denied.counts) == [
+        (USER_ARN, "iam.amazonaws.com", "DeleteRole", "*")
+    ]
+
+
+def test_aggregate_update():
+    whole = CloudTrailAggregate()
+    first = CloudTrailAggregate()
+    second = CloudTrailAggregate()
+
+    for i, record in enumerate(RECORDS):
+        whole.add_record(record)
+        (first if i % 2 else second).add_record(record)
+
+    first.update(second)
+    assert first == whole
+
+
+def test_aggregate_cloudtrail_files(tmp_path):
+    write_logs(tmp_path, RECORDS, n_files=40)
+    (tmp_path / "plain.json").write_text(json.dumps({"Records": RECORDS[:1]}))
+
+    files = list(iter_cloudtrail_files(str(tmp_path)))
+    assert len(files) == 41
+    assert not any("Digest" in x for x in files)
+
+    expected = CloudTrailAggregate()
+    for record in RECORDS + RECORDS[:1]:
+        expected.add_record(record)
+
+    assert aggregate_cloudtrail_files([str(tmp_path)]) == expected
+    assert aggregate_cloudtrail_files([str(tmp_path)], workers=2) == expected
+
+
+def test_generate_least_privilege_policies():
+    aggregate = CloudTrailAggregate()
+    for record in RECORDS:
+        aggregate.add_record(record)
+
+    assert generate_least_privilege_policies(aggregate) == {
+        ROLE_ARN: create_lowercase_policy(
+            statement(actions=["kms:Decrypt", "s3:ListAllMyBuckets"], resource="*"),
+            statement(actions=["s3:ListBucket"], resource="arn:aws:s3:::bucket"),
+            statement(actions=["s3:GetObject"], resource="arn:aws:s3:::bucket/key"),
+        ),
+        USER_ARN: create_lowercase_policy(
+            statement(actions=["lambda:UpdateFunctionConfiguration"], resource="*")
+        ),
+    }
+
+    assert generate_least_privilege_policies(aggregate, min_count=2) == {
+        ROLE_ARN: create_lowercase_policy(
+            statement(actions=["kms:Decrypt"], resource="*")
+        )
+    }
@@ -0,0 +1,95 @@
+import pytest
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.clustering import estimate_similarity
+from aws_iam_utils.clustering import group_equivalent_policies
+from aws_iam_utils.clustering import group_similar_policies
+from aws_iam_utils.clustering import policy_minhash
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+
+def s3_actions():
+    return [x.action for x in get_catalog().actions_for_service("s3")]
+
+
+def test_group_equivalent_policies():
+    policies = [
+        ("a", create_policy(statement(actions=["s3:GetObject"], resource="*"))),
+        ("b", create_policy(statement(actions=["s3:PutObject"], resource="*"))),
+        ("c", create_policy(statement(actions="S3:getobject", resource=["*"]))),
+        (
+            "d",
+            create_policy(
+                statement(actions="s3:PutObject", resource="*"),
+                statement(actions="s3:PutObject", resource="*"),
+            ),
+        ),
+        ("e", create_policy(statement(actions=["s3:GetObject*"], resource="*"))),
+        ("f", create_policy(statement(actions=["s3:GetObject"], resource="*"))),
+    ]
+
+    assert group_equivalent_policies(iter(policies)) == [["a", "c", "f"], ["b", "d"]]
+    assert group_equivalent_policies(policies, min_size=1) == [
+        ["a", "c", "f"],
+        ["b", "d"],
+        ["e"],
+    ]
+    assert group_equivalent_policies([]) == []
+
+
+def test_policy_minhash():
+    actions = s3_actions()
+
+    p1 = create_policy(statement(actions=actions[:100], resource="*"))
+    p2 = create_policy(statement(actions=list(reversed(actions[:100])), resource="*"))
+    p3 = create_policy(statement(actions=actions[:90], resource="*"))
+    p4 = create_policy(statement(actions=actions[50:], resource="*"))
+
+    signature = policy_minhash(p1)
+    assert len(signature) == 128
+    assert all(0 <= x < 2**64 for x in signature)
+    assert len(policy_minhash(p1, num_perm=16)) == 16
+
+    assert estimate_similarity(signature, policy_minhash(p2)) == 1
+    assert estimate_similarity(signature, policy_minhash(p3)) == pytest.approx(
+        0.9, abs=0.1
+    )
+    assert estimate_similarity(signature, policy_minhash(p4)) < 0.5
+
+    # the same actions on a different resource are different permissions
+    p5 = create_policy(statement(actions=actions[:100], resource="arn:aws:s3:::b"))
+    assert estimate_similarity(signature, policy_minhash(p5)) < 0.1
+
+    empty = create_policy()
+    assert estimate_similarity(policy_minhash(empty), policy_minhash(empty)) == 1
+
+
+def test_estimate_similarity_different_lengths():
+    with pytest.raises(ValueError):
+        estimate_similarity((1, 2), (1, 2, 3))
+
+
+def test_group_similar_policies():
+    actions = s3_actions()
+
+    policies = [
+        ("a", create_policy(statement(actions=actions[:100], resource="*"))),
+        ("b", create_policy(statement(actions=actions[50:120], resource="*"))),
+        ("c", create_policy(statement(actions=actions[:95], resource="*"))),
+        ("d", create_policy(statement(actions=actions[50:118], resource="*"))),
+        ("e", create_policy(statement(actions="ec2:RunInstances", resource="*"))),
+        ("f", create_policy(statement(actions=actions[:100], resource="*"))),
+    ]
+
+    assert group_similar_policies(iter(policies)) == [["a", "f", "c"], ["b", "d"]]
+    assert group_similar_policies(policies, min_size=1) == [
+        ["a", "f", "c"],
+        ["b", "d"],
+        ["e"],
+    ]
+
+    # with a low enough threshold, everything that overlaps is grouped
+    assert group_similar_policies(policies, threshold=0.2) == [
+        ["a", "f", "b", "c", "d"]
+    ]
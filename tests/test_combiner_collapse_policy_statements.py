@@ -332,3 +332,126 @@ def test_collapse_policy_actions_across_principals_and_effects():
             "Principal": {"AWS": "foo"},
         },
     )
+
+
+def test_collapse_policy_actions_with_nested_conditions():
+    p = create_policy(
+        statement(
+            actions="s3:PutObject",
+            resource="*",
+            condition={
+                "StringEquals": {"foo": ["bar", "baz"]},
+                "Bool": {"aws:SecureTransport": "true"},
+            },
+        ),
+        statement(
+            actions="s3:GetObject",
+            resource="*",
+            condition={
+                "Bool": {"aws:SecureTransport": "true"},
+                "StringEquals": {"foo": ["bar", "baz"]},
+            },
+        ),
+    )
+
+    result = aws_iam_utils.combiner.collapse_policy_statements(p)
+
+    assert result == create_lowercase_policy(
+        {
+            "Effect": "Allow",
+            "Action": [
+                "s3:putobject",
+                "s3:getobject",
+            ],
+            "Resource": "*",
+            "Condition": {
+                "StringEquals": {"foo": ["bar", "baz"]},
+                "Bool": {"aws:SecureTransport": "true"},
+            },
+        }
+    )
+
+    # the result should be a plain policy that can be modified further
+    result["Statement"][0]["Condition"]["Bool"]["aws:SecureTransport"] = "false"
+    assert p["Statement"][0]["Condition"]["Bool"]["aws:SecureTransport"] == "true"
+
+
+def test_collapse_policy_merge_resources():
+    p = create_policy(
+        statement(actions=["s3:GetObject", "s3:PutObject"], resource=s3_arn("b1")),
+        statement(actions=["s3:ListBucket"], resource=s3_arn("b2")),
+        statement(actions=["s3:PutObject", "s3:GetObject"], resource=s3_arn("b3")),
+        statement(actions=["s3:GetObject"], resource=s3_arn("b2")),
+        statement(
+            actions=["s3:ListBucket", "s3:GetObject"],
+            resource=s3_arn("b4"),
+            condition={"StringEquals": {"foo": "bar"}},
+        ),
+        statement(actions=["s3:GetObject", "s3:ListBucket"], resource=s3_arn("b5")),
+    )
+
+    assert aws_iam_utils.combiner.collapse_policy_statements(
+        p, merge_resources=True
+    ) == create_lowercase_policy(
+        {
+            "Effect": "Allow",
+            "Action": ["s3:getobject", "s3:putobject"],
+            "Resource": [s3_arn("b1"), s3_arn("b3")],
+        },
+        {
+            "Effect": "Allow",
+            "Action": ["s3:listbucket", "s3:getobject"],
+            "Resource": [s3_arn("b2"), s3_arn("b5")],
+        },
+        {
+            "Effect": "Allow",
+            "Action": ["s3:listbucket", "s3:getobject"],
+            "Resource": s3_arn("b4"),
+            "Condition": {"StringEquals": {"foo": "bar"}},
+        },
+    )
+
+
+def test_collapse_policy_merge_resources_without_resources():
+    p = create_policy(
+        statement(actions="s3:GetObject", principal={"AWS": "foo"}),
+        statement(actions="s3:GetObject", principal={"AWS": "foo"}, resource="*"),
+    )
+
+    assert aws_iam_utils.combiner.collapse_policy_statements(
+        p, merge_resources=True
+    ) == create_lowercase_policy(
+        {
+            "Effect": "Allow",
+            "Action": ["s3:getobject"],
+            "Principal": {"AWS": "foo"},
+        },
+        {
+            "Effect": "Allow",
+            "Action": ["s3:getobject"],
+            "Resource": "*",
+            "Principal": {"AWS": "foo"},
+        },
+    )
+
+
+def test_collapse_not_resource_and_not_action():
+    p = create_policy(
+        {"Effect": "Deny", "Action": "s3:DeleteObject", "NotResource": s3_arn("tmp/*")},
+        {"Effect": "Deny", "Action": "s3:PutObject", "NotResource": [s3_arn("tmp/*")]},
+        {"Effect": "Allow", "NotAction": "iam:*", "Resource": "*"},
+        {"Effect": "Allow", "NotAction": "iam:*", "Resource": "*"},
+        statement(actions="s3:GetObject", resource=s3_arn("tmp/*")),
+    )
+
+    assert aws_iam_utils.combiner.collapse_policy_statements(
+        p, merge_resources=True
+    ) == create_policy(
+        {
+            "Effect": "Deny",
+            "NotResource": [s3_arn("tmp/*")],
+            "Action": ["s3:deleteobject", "s3:putobject"],
+        },
+        {"Effect": "Allow", "Resource": s3_arn("tmp/*"), "Action": ["s3:getobject"]},
+        {"Effect": "Allow", "NotAction": "iam:*", "Resource": "*"},
+    )
@@ -0,0 +1,172 @@
+import pytest
+
+from aws_iam_utils.conditions import compile_condition
+from aws_iam_utils.util import freeze
+
+
+def test_empty_condition():
+    assert compile_condition({})({})
+    assert compile_condition(None)({})
+
+
+def test_string_operators():
+    equals = compile_condition({"StringEquals": {"aws:username": ["alice", "bob"]}})
+    assert equals({"aws:username": "bob"})
+    assert equals({"AWS:UserName": "bob"})
+    assert not equals({"aws:username": "Bob"})
+    assert not equals({})
+
+    not_equals = compile_condition({"StringNotEquals": {"aws:username": "alice"}})
+    assert not_equals({"aws:username": "bob"})
+    assert not not_equals({"aws:username": "alice"})
+    assert not_equals({})
+
+    ignore_case = compile_condition(
+        {"StringEqualsIgnoreCase": {"aws:username": "Alice"}}
+    )
+    assert ignore_case({"aws:username": "ALICE"})
+
+    like = compile_condition({"StringLike": {"s3:prefix": ["home/*", "tmp/?"]}})
+    assert like({"s3:prefix": "home/alice/x"})
+    assert like({"s3:prefix": "tmp/a"})
+    assert not like({"s3:prefix": "tmp/ab"})
+
+    not_like = compile_condition({"StringNotLike": {"s3:prefix": "home/*"}})
+    assert not_like({"s3:prefix": "etc/passwd"})
+    assert not not_like({"s3:prefix": "home/x"})
+
+
+def test_numeric_and_date_operators():
+    less_than = compile_condition({"NumericLessThan": {"s3:max-keys": "10"}})
+    assert less_than({"s3:max-keys": 5})
+    assert less_than({"s3:max-keys": "9.5"})
+    assert not less_than({"s3:max-keys": "10"})
+    assert not less_than({"s3:max-keys": "lots"})
+
+    assert compile_condition({"NumericGreaterThanEquals": {"s3:max-keys": "10"}})(
+        {"s3:max-keys": 10}
+    )
+
+    before = compile_condition(
+        {"DateLessThan": {"aws:CurrentTime": "2020-06-30T00:00:00Z"}}
+    )
+    assert before({"aws:CurrentTime": "2020-01-01T00:00:00Z"})
+    assert before({"aws:CurrentTime": "2020-06-29T23:00:00-00:30"})
+    assert not before({"aws:CurrentTime": "2021-01-01T00:00:00Z"})
+    assert before({"aws:CurrentTime": 1577836800})
+
+
+def test_bool_ip_and_arn_operators():
+    secure = compile_condition({"Bool": {"aws:SecureTransport": "true"}})
+    assert secure({"aws:SecureTransport": True})
+    assert secure({"aws:SecureTransport": "true"})
+    assert not secure({"aws:SecureTransport": False})
+
+    ip = compile_condition({"IpAddress": {"aws:SourceIp": ["10.0.0.0/8", "::1"]}})
+    assert ip({"aws:SourceIp": "10.20.30.40"})
+    assert ip({"aws:SourceIp": "::1"})
+    assert not ip({"aws:SourceIp": "192.0.2.1"})
+    assert not ip({"aws:SourceIp": "not an ip"})
+    assert compile_condition({"NotIpAddress": {"aws:SourceIp": "10.0.0.0/8"}})(
+        {"aws:SourceIp": "192.0.2.1"}
+    )
+
+    arn = compile_condition(
+        {"ArnLike": {"aws:SourceArn": "arn:aws:sns:*:123456789012:topic-*"}}
+    )
+    assert arn({"aws:SourceArn": "arn:aws:sns:eu-west-1:123456789012:topic-a"})
+    assert not arn({"aws:SourceArn": "arn:aws:sns:eu-west-1:210987654321:topic-a"})
+    assert not arn({"aws:SourceArn": "not-an-arn"})
+
+
+def test_null_and_if_exists():
+    is_null = compile_condition({"Null": {"aws:TokenIssueTime": "true"}})
+    assert is_null({})
+    assert not is_null({"aws:TokenIssueTime": "2020-01-01T00:00:00Z"})
+
+    not_null = compile_condition({"Null": {"aws:TokenIssueTime": "false"}})
+    assert not_null({"aws:TokenIssueTime": "2020-01-01T00:00:00Z"})
+
+    if_exists = compile_condition(
+        {"StringEqualsIfExists": {"ec2:InstanceType": "t3.micro"}}
+    )
+    assert if_exists({})
+    assert if_exists({"ec2:InstanceType": "t3.micro"})
+    assert not if_exists({"ec2:InstanceType": "m5.large"})
+
+
+def test_set_operators():
+    any_value = compile_condition(
+        {"ForAnyValue:StringEquals": {"aws:TagKeys": ["team", "env"]}}
+    )
+    assert any_value({"aws:TagKeys": ["owner", "env"]})
+    assert not any_value({"aws:TagKeys": ["owner"]})
+    assert not any_value({})
+
+    all_values = compile_condition(
+        {"ForAllValues:StringEquals": {"aws:TagKeys": ["team", "env"]}}
+    )
+    assert all_values({"aws:TagKeys": ["team", "env"]})
+    assert not all_values({"aws:TagKeys": ["team", "owner"]})
+    assert all_values({})
+    assert all_values({"aws:TagKeys": []})
+
+    none_of = compile_condition(
+        {"ForAllValues:StringNotEquals": {"aws:TagKeys": ["secret"]}}
+    )
+    assert none_of({"aws:TagKeys": ["team", "env"]})
+    assert not none_of({"aws:TagKeys": ["team", "secret"]})
+
+
+def test_all_keys_and_operators_must_match():
+    condition = compile_condition(
+        {
+            "StringEquals": {"aws:username": "alice", "aws:PrincipalTag/team": "a"},
+            "Bool": {"aws:MultiFactorAuthPresent": "true"},
+        }
+    )
+    context = {
+        "aws:username": "alice",
+        "aws:PrincipalTag/team": "a",
+        "aws:MultiFactorAuthPresent": True,
+    }
+
+    assert condition(context)
+    assert not condition({**context, "aws:PrincipalTag/team": "b"})
+    assert not condition({**context, "aws:MultiFactorAuthPresent": False})
+
+
+def test_unsupported_operator():
+    with pytest.raises(ValueError):
+        compile_condition({"StringSortOf": {"aws:username": "bob"}})
+
+
+@pytest.mark.parametrize(
+    "condition",
+    [
+        {"NumericLessThan": {"s3:max-keys": "ten"}},
+        {"DateGreaterThan": {"aws:CurrentTime": "yesterday"}},
+        {"Bool": {"aws:SecureTransport": "yes"}},
+        {"Null": {"aws:TokenIssueTime": "maybe"}},
+        {"ArnLike": {"aws:SourceArn": "not-an-arn"}},
+        {"IpAddress": {"aws:SourceIp": "10.0.0.300/8"}},
+        {"StringEquals": {"s3:prefix": "home/${aws:username}"}},
+    ],
+)
+def test_invalid_condition_values(condition):
+    with pytest.raises(ValueError):
+        compile_condition(condition)
+
+
+def test_arn_like_wildcard():
+    condition = compile_condition({"ArnLike": {"aws:SourceArn": "*"}})
+    assert condition({"aws:SourceArn": "arn:aws:sns:us-east-1:123456789012:t"})
+
+
+def test_frozen_condition():
+    condition = compile_condition(
+        freeze({"IpAddress": {"aws:SourceIp": ["10.0.0.0/8", "192.168.0.0/16"]}})
+    )
+
+    assert condition({"aws:SourceIp": "192.168.1.1"})
+    assert condition({"aws:SourceIp": freeze(["192.0.2.1", "10.0.0.1"])})
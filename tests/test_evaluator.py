@@ -0,0 +1,174 @@
+import pytest
+
+from aws_iam_utils.evaluator import ALLOWED
+from aws_iam_utils.evaluator import EXPLICIT_DENY
+from aws_iam_utils.evaluator import IMPLICIT_DENY
+from aws_iam_utils.evaluator import PolicyEvaluator
+from aws_iam_utils.evaluator import compile_resource_matcher
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+
+def test_compile_resource_matcher():
+    matches = compile_resource_matcher(
+        ["arn:aws:s3:::bucket/*", "arn:aws:s3:::other", "arn:aws:s3:::b?"]
+    )
+
+    assert matches("arn:aws:s3:::bucket/a/b")
+    assert matches("arn:aws:s3:::other")
+    assert matches("arn:aws:s3:::b1")
+    assert not matches("arn:aws:s3:::bucket")
+    assert not matches("arn:aws:s3:::other/a")
+    assert not matches("arn:aws:s3:::BUCKET/a")
+
+    assert compile_resource_matcher(["arn:aws:s3:::a"])("arn:aws:s3:::a")
+    assert compile_resource_matcher(["*"])("anything")
+    assert compile_resource_matcher([None])("anything")
+    assert not compile_resource_matcher([])("anything")
+
+
+def test_evaluate_allow_and_implicit_deny():
+    evaluator = PolicyEvaluator(
+        create_policy(
+            statement(actions=["s3:GetObject", "s3:List*"], resource="*"),
+            statement(actions="s3:PutObject", resource="arn:aws:s3:::bucket/*"),
+        )
+    )
+
+    assert evaluator.evaluate("s3:GetObject", "arn:aws:s3:::x/y") == ALLOWED
+    assert evaluator.evaluate("S3:getobject", "arn:aws:s3:::x/y") == ALLOWED
+    assert evaluator.evaluate("s3:ListBucket", "arn:aws:s3:::x") == ALLOWED
+    assert evaluator.evaluate("s3:PutObject", "arn:aws:s3:::bucket/y") == ALLOWED
+    assert evaluator.evaluate("s3:PutObject", "arn:aws:s3:::x/y") == IMPLICIT_DENY
+    assert evaluator.evaluate("s3:DeleteObject", "arn:aws:s3:::x/y") == (IMPLICIT_DENY)
+    assert evaluator.is_allowed("s3:GetObject")
+    assert not evaluator.is_allowed("ec2:RunInstances")
+
+
+def test_evaluate_explicit_deny_wins():
+    evaluator = PolicyEvaluator(
+        create_policy(statement(actions="s3:*", resource="*")),
+        create_policy(
+            statement(
+                effect="Deny", actions="s3:Delete*", resource="arn:aws:s3:::prod/*"
+            )
+        ),
+    )
+
+    assert evaluator.evaluate("s3:DeleteObject", "arn:aws:s3:::prod/a") == (
+        EXPLICIT_DENY
+    )
+    assert evaluator.evaluate("s3:DeleteObject", "arn:aws:s3:::dev/a") == ALLOWED
+    assert evaluator.evaluate("s3:GetObject", "arn:aws:s3:::prod/a") == ALLOWED
+
+
+def test_evaluate_conditions():
+    evaluator = PolicyEvaluator(
+        create_policy(
+            statement(
+                actions="s3:GetObject",
+                resource="*",
+                condition={"Bool": {"aws:SecureTransport": "true"}},
+            ),
+            statement(
+                effect="Deny",
+                actions="s3:*",
+                resource="*",
+                condition={"NotIpAddress": {"aws:SourceIp": "10.0.0.0/8"}},
+            ),
+        )
+    )
+
+    secure = {"aws:SecureTransport": True, "aws:SourceIp": "10.1.2.3"}
+
+    assert evaluator.evaluate("s3:GetObject", "arn:aws:s3:::x/y") == EXPLICIT_DENY
+    assert evaluator.evaluate("s3:GetObject", "arn:aws:s3:::x/y", secure) == ALLOWED
+    assert (
+        evaluator.evaluate(
+            "s3:GetObject", "arn:aws:s3:::x/y", {**secure, "aws:SecureTransport": False}
+        )
+        == IMPLICIT_DENY
+    )
+    assert (
+        evaluator.evaluate(
+            "s3:GetObject", "arn:aws:s3:::x/y", {**secure, "aws:SourceIp": "192.0.2.1"}
+        )
+        == EXPLICIT_DENY
+    )
+
+
+def test_evaluator_rejects_unsupported_condition_operators():
+    with pytest.raises(ValueError):
+        PolicyEvaluator(
+            create_policy(
+                statement(
+                    actions="s3:GetObject",
+                    resource="*",
+                    condition={"StringSortOf": {"aws:username": "bob"}},
+                )
+            )
+        )
+
+    # a Deny that cannot be evaluated must not be silently skipped
+    with pytest.raises(ValueError):
+        PolicyEvaluator(
+            create_policy(
+                statement(actions="s3:*", resource="*"),
+                statement(
+                    effect="Deny",
+                    actions="s3:DeleteObject",
+                    resource="*",
+                    condition={"StringNotEquals": {"aws:username": "${aws:userid}"}},
+                ),
+            )
+        )
+
+
+def test_evaluate_many():
+    evaluator = PolicyEvaluator(
+        create_policy(statement(actions="s3:Get*", resource="*")),
+    )
+
+    assert list(
+        evaluator.evaluate_many(
+            [
+                ("s3:GetObject", "arn:aws:s3:::x/y"),
+                ("s3:PutObject", "arn:aws:s3:::x/y"),
+                ("s3:GetObject", "arn:aws:s3:::x/y", {}),
+            ]
+        )
+    ) == [ALLOWED, IMPLICIT_DENY, ALLOWED]
+
+
+def test_evaluator_rejects_unsupported_keys():
+    with pytest.raises(ValueError):
+        PolicyEvaluator(
+            create_policy(
+                {
+                    "Effect": "Deny",
+                    "NotPrincipal": {"AWS": "arn:aws:iam::123456789012:root"},
+                    "Action": "s3:*",
+                }
+            )
+        )
+
+
+def test_evaluate_not_action_and_not_resource():
+    evaluator = PolicyEvaluator(
+        create_policy(
+            {"Effect": "Allow", "NotAction": "iam:*", "Resource": "*"},
+            {
+                "Effect": "Deny",
+                "Action": "s3:Delete*",
+                "NotResource": "arn:aws:s3:::scratch/*",
+            },
+        )
+    )
+
+    assert evaluator.evaluate("s3:GetObject", "arn:aws:s3:::prod/a") == ALLOWED
+    assert evaluator.evaluate("notaservice:DoThing", "x") == ALLOWED
+    assert evaluator.evaluate("iam:CreateUser", "*") == IMPLICIT_DENY
+    assert evaluator.evaluate("s3:DeleteObject", "arn:aws:s3:::prod/a") == (
+        EXPLICIT_DENY
+    )
+    assert evaluator.evaluate("s3:DeleteObject", "arn:aws:s3:::scratch/a") == ALLOWED
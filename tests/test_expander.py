@@ -0,0 +1,97 @@
+import copy
+
+from policyuniverse.expander_minimizer import expand_policy as pu_expand_policy
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.expander import expand_action
+from aws_iam_utils.expander import expand_policy
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import extract_policy_permission_items
+from aws_iam_utils.util import statement
+
+
+def test_expand_action_wildcard():
+    result = expand_action("s3:GetObjectVersion*")
+
+    assert "s3:getobjectversion" in result
+    assert "s3:getobjectversionacl" in result
+    assert "s3:getobject" not in result
+    assert all(x.startswith("s3:getobjectversion") for x in result)
+
+
+def test_expand_action_inner_wildcards():
+    result = expand_action("s3:Get*Acl")
+
+    assert "s3:getobjectacl" in result
+    assert "s3:getbucketacl" in result
+    assert all(x.startswith("s3:get") and x.endswith("acl") for x in result)
+
+    assert expand_action("s3:GetObjec?") == ["s3:getobject"]
+
+
+def test_expand_action_full_wildcard():
+    assert len(expand_action("*")) == len(get_catalog())
+
+
+def test_expand_action_without_wildcard():
+    assert expand_action("s3:GetObject") == ["s3:getobject"]
+    assert expand_action("foo:Bar") == ["foo:bar"]
+
+
+def test_expand_action_unknown_wildcard():
+    assert expand_action("notaservice:Get*") == ["notaservice:get*"]
+
+
+def test_expand_policy_matches_policyuniverse():
+    p = create_policy(
+        statement(actions=["s3:Get*", "ec2:Describe*"], resource="*"),
+        statement(actions="iam:*Role", resource="*"),
+        statement(effect="Deny", actions=["s3:Put*"], resource="*"),
+    )
+
+    result = expand_policy(p)
+    expected = pu_expand_policy(p)
+
+    # policyuniverse has its own (slightly different) list of known actions, so
+    # compare only the actions both of them know about
+    catalog = get_catalog()
+    for st, expected_st in zip(result["Statement"], expected["Statement"]):
+        if st["Effect"] == "Deny":
+            assert st == expected_st
+            continue
+
+        assert st["Action"] == [x for x in expected_st["Action"] if x in catalog]
+
+
+def test_expand_policy_does_not_modify_input():
+    p = create_policy(statement(actions="s3:Get*", resource="*"))
+    p_copy = copy.deepcopy(p)
+
+    expand_policy(p)
+
+    assert p == p_copy
+
+
+def test_expand_policy_not_action():
+    p = create_policy(
+        {
+            "Effect": "Allow",
+            "NotAction": "s3:*",
+            "Resource": "*",
+        }
+    )
+
+    result = expand_policy(p)["Statement"][0]
+
+    assert "NotAction" not in result
+    assert "s3:getobject" not in result["Action"]
+    assert "ec2:describeinstances" in result["Action"]
+
+
+def test_expand_policy_compatible_with_extract_policy_permission_items():
+    p = create_policy(statement(actions="s3:GetObjectVersion*", resource="*"))
+
+    items = extract_policy_permission_items(expand_policy(p))
+
+    assert {x["action"] for x in items} == set(expand_action("s3:GetObjectVersion*"))
+    assert all(x["resource"] == "*" for x in items)
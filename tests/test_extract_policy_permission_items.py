@@ -0,0 +1,158 @@
+import copy
+import itertools
+
+import pytest
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.checks import policy_has_only_these_access_levels
+from aws_iam_utils.constants import READ
+from aws_iam_utils.expander import iter_expanded_statements
+from aws_iam_utils.util import NotAction
+from aws_iam_utils.util import NotResource
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import extract_policy_permission_items
+from aws_iam_utils.util import iter_policy_permission_items
+from aws_iam_utils.util import statement
+
+
+def test_extract_policy_permission_items_does_not_modify_policy():
+    policy = create_policy(
+        statement(actions="s3:GetObject", resource="arn:aws:s3:::bucket/*"),
+        statement(
+            actions=["s3:PutObject", "s3:ListBucket"],
+            resource=["arn:aws:s3:::a", "arn:aws:s3:::b"],
+            effect="Deny",
+        ),
+    )
+    original = copy.deepcopy(policy)
+
+    items = extract_policy_permission_items(policy)
+
+    assert policy == original
+    assert len(items) == 5
+    assert items[0] == {
+        "effect": "Allow",
+        "action": "s3:getobject",
+        "resource": "arn:aws:s3:::bucket/*",
+        "condition": None,
+        "principal": None,
+    }
+
+
+def test_iter_policy_permission_items_matches_extract():
+    policy = create_policy(
+        statement(
+            actions=["s3:GetObject", "s3:PutObject"],
+            resource=["arn:aws:s3:::a", "arn:aws:s3:::b"],
+            condition={"Bool": {"aws:SecureTransport": "true"}},
+        ),
+    )
+
+    assert [x._asdict() for x in iter_policy_permission_items(policy)] == (
+        extract_policy_permission_items(policy)
+    )
+
+
+def test_iter_policy_permission_items_is_lazy():
+    # a statement with a huge resource x action product is never materialized
+    policy = create_policy(
+        statement(
+            actions=[f"s3:Action{i}" for i in range(10000)],
+            resource=[f"arn:aws:s3:::bucket{i}" for i in range(10000)],
+        ),
+    )
+
+    items = list(itertools.islice(iter_policy_permission_items(policy), 3))
+
+    assert [x.action for x in items] == ["s3:action0", "s3:action1", "s3:action2"]
+
+
+def test_iter_policy_permission_items_unsupported():
+    policy = create_policy(
+        {
+            "Effect": "Deny",
+            "NotPrincipal": {"AWS": "arn:aws:iam::123456789012:root"},
+            "Action": "s3:*",
+            "Resource": "*",
+        }
+    )
+
+    with pytest.raises(ValueError):
+        list(iter_policy_permission_items(policy))
+
+    assert len(list(iter_policy_permission_items(policy, allow_unsupported=True))) == 1
+
+
+def test_iter_policy_permission_items_not_action():
+    catalog = get_catalog()
+    policy = create_policy(
+        {"Effect": "Allow", "NotAction": ["s3:*", "iam:*"], "Resource": "*"}
+    )
+
+    items = extract_policy_permission_items(policy)
+    assert items == [
+        {
+            "effect": "Allow",
+            "action": NotAction(["s3:*", "iam:*"]),
+            "resource": "*",
+            "condition": None,
+            "principal": None,
+        }
+    ]
+    assert items[0]["action"].matches("ec2:DescribeInstances")
+    assert not items[0]["action"].matches("S3:GetObject")
+
+    actions = {
+        x.action for x in iter_policy_permission_items(policy, expand_not_action=True)
+    }
+
+    assert "ec2:describeinstances" in actions
+    assert "s3:getobject" not in actions
+    assert len(actions) == (
+        len(catalog)
+        - len(catalog.match_actions("s3:*"))
+        - len(catalog.match_actions("iam:*"))
+    )
+
+
+def test_iter_policy_permission_items_not_resource():
+    policy = create_policy(
+        {
+            "Effect": "Deny",
+            "Action": ["s3:DeleteObject", "s3:PutObject"],
+            "NotResource": ["arn:aws:s3:::scratch/*", "arn:aws:s3:::tmp/*"],
+        }
+    )
+
+    items = list(iter_policy_permission_items(policy))
+
+    assert len(items) == 2
+    assert items[0].resource == NotResource(
+        ["arn:aws:s3:::tmp/*", "arn:aws:s3:::scratch/*"]
+    )
+    assert items[0].resource != ["arn:aws:s3:::scratch/*", "arn:aws:s3:::tmp/*"]
+    assert items[0].resource.matches("arn:aws:s3:::prod/a")
+    assert not items[0].resource.matches("arn:aws:s3:::tmp/a")
+
+
+def test_iter_expanded_statements_is_lazy():
+    policy = create_policy(
+        statement(actions="s3:Get*", resource="*"),
+        statement(actions="ec2:*", resource="*"),
+    )
+
+    statements = iter_expanded_statements(policy)
+    first = next(statements)
+
+    assert "s3:getobject" in first["Action"]
+    assert policy["Statement"][0]["Action"] == "s3:Get*"
+
+
+def test_access_level_check_stops_at_first_violation():
+    # the second statement is not valid, but is never reached
+    policy = create_policy(
+        statement(actions="s3:PutObject", resource="*"),
+        statement(actions="notaservice:Frobnicate", resource="*"),
+    )
+
+    assert not policy_has_only_these_access_levels(policy, [READ])
@@ -0,0 +1,97 @@
+from aws_iam_utils.fingerprint import clear_fingerprint_cache
+from aws_iam_utils.fingerprint import normalized_permission_set
+from aws_iam_utils.fingerprint import permission_set_fingerprint
+from aws_iam_utils.fingerprint import policy_fingerprint
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+
+def test_fingerprint_ignores_statement_order_and_case():
+    p1 = create_policy(
+        statement(actions=["s3:GetObject", "s3:PutObject"], resource="*"),
+        statement(actions=["iam:PassRole"], resource="foo"),
+    )
+    p2 = create_policy(
+        statement(actions="iam:passrole", resource=["foo"]),
+        statement(effect="allow", actions=["s3:putobject", "s3:getobject"]),
+    )
+    p2["Statement"][1]["Resource"] = "*"
+
+    assert policy_fingerprint(p1) == policy_fingerprint(p2)
+
+
+def test_fingerprint_expands_wildcards():
+    p1 = create_policy(statement(actions=["s3:GetObjectVersion*"], resource="*"))
+    p2 = create_policy(
+        statement(
+            actions=[
+                "s3:GetObjectVersion",
+                "s3:GetObjectVersionAcl",
+                "s3:GetObjectVersionAttributes",
+                "s3:GetObjectVersionForReplication",
+                "s3:GetObjectVersionTagging",
+                "s3:GetObjectVersionTorrent",
+            ],
+            resource="*",
+        )
+    )
+
+    assert policy_fingerprint(p1) == policy_fingerprint(p2)
+
+
+def test_fingerprint_normalizes_conditions_and_principals():
+    p1 = create_policy(
+        statement(
+            actions="s3:GetObject",
+            condition={"StringEquals": {"aws:SourceVpc": ["vpc-2", "vpc-1"]}},
+            principal={"AWS": "arn:aws:iam::123456789012:root"},
+        )
+    )
+    p2 = create_policy(
+        statement(
+            actions="s3:GetObject",
+            condition={"StringEquals": {"aws:sourcevpc": ["vpc-1", "vpc-2"]}},
+            principal={"AWS": ["arn:aws:iam::123456789012:root"]},
+        )
+    )
+
+    assert policy_fingerprint(p1) == policy_fingerprint(p2)
+
+
+def test_fingerprint_differs_when_permissions_differ():
+    p1 = create_policy(statement(actions="s3:GetObject", resource="*"))
+    p2 = create_policy(statement(actions="s3:GetObject", resource="foo"))
+    p3 = create_policy(statement(actions="s3:GetObject", resource="*", effect="Deny"))
+    p4 = create_policy(
+        statement(
+            actions="s3:GetObject",
+            resource="*",
+            condition={"Bool": {"aws:SecureTransport": "true"}},
+        )
+    )
+
+    assert len({policy_fingerprint(p) for p in [p1, p2, p3, p4]}) == 4
+
+
+def test_fingerprint_cache():
+    clear_fingerprint_cache()
+
+    p = create_policy(statement(actions="s3:Get*", resource="*"))
+
+    assert policy_fingerprint(p) == policy_fingerprint(p)
+
+    clear_fingerprint_cache()
+    assert policy_fingerprint(p) == policy_fingerprint(
+        create_policy(statement(actions="s3:get*", resource="*"))
+    )
+
+
+def test_permission_set_fingerprint():
+    p = create_policy(
+        statement(actions=["s3:Get*", "sqs:SendMessage"], resource="*"),
+        statement(effect="Deny", actions="s3:GetObject", resource="arn:aws:s3:::a/*"),
+    )
+
+    assert permission_set_fingerprint(normalized_permission_set(p)) == (
+        policy_fingerprint(p)
+    )
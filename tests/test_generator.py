@@ -1,10 +1,10 @@
-from policyuniverse.expander_minimizer import expand_policy
-
 from .context import aws_iam_utils
+from aws_iam_utils.catalog import get_catalog
 from aws_iam_utils.checks import policy_has_only_these_access_levels
+from aws_iam_utils.expander import expand_policy
 from aws_iam_utils.util import create_policy
 from aws_iam_utils.util import statement
-from aws_iam_utils.constants import READ, LIST, WILDCARD_ARN_TYPE
+from aws_iam_utils.constants import READ, LIST, WRITE, WILDCARD_ARN_TYPE
 
 
 def test_generate_read_only_policy():
@@ -150,3 +150,75 @@ def test_generate_policy_with_wildcard_actions_doesnt_overgrant():
     )
 
     assert policy_has_only_these_access_levels(p, [LIST, READ])
+
+
+def test_generated_wildcards_match_exactly_the_requested_actions():
+    catalog = get_catalog()
+
+    for service_name in ["s3", "ec2", "iam", "lambda", "kinesis"]:
+        for access_levels in [[LIST], [LIST, READ], [LIST, READ, WRITE]]:
+            p = aws_iam_utils.generator.generate_policy_for_service(
+                service_name, access_levels
+            )
+
+            expected = {
+                x.action.lower()
+                for x in catalog.actions_for_service(service_name)
+                if x.access_level in access_levels
+            }
+            actions = expand_policy(p)["Statement"][0]["Action"]
+
+            assert set(actions) == expected
+            assert len(p["Statement"][0]["Action"]) <= len(expected)
+
+
+def test_generated_actions_do_not_overlap():
+    for access_levels in [[LIST], [LIST, READ], [LIST, READ, WRITE]]:
+        policies = aws_iam_utils.generator.generate_policies_for_all_services(
+            access_levels
+        )
+
+        for policy in policies.values():
+            actions = [x.lower() for x in policy["Statement"][0]["Action"]]
+
+            for wildcard in actions:
+                if not wildcard.endswith("*"):
+                    continue
+
+                covered = [
+                    x for x in actions if x != wildcard and x.startswith(wildcard[:-1])
+                ]
+                assert covered == [], (wildcard, covered)
+
+
+def test_generate_read_write_policy_uses_narrower_wildcards():
+    p = aws_iam_utils.generator.generate_read_write_policy_for_service("s3")
+    actions = p["Statement"][0]["Action"]
+
+    # s3:Put* would include s3:PutBucketPolicy (Permissions management)
+    assert "s3:Put*" not in actions
+    assert "s3:PutBucketPolicy" not in actions
+    assert "s3:PutObject" in actions
+
+
+def test_generate_policies_for_all_services():
+    policies = aws_iam_utils.generator.generate_policies_for_all_services([LIST, READ])
+
+    assert list(policies) == sorted(policies)
+    assert len(policies) > 100
+
+    for service_name in ["s3", "kinesis", "lambda"]:
+        assert policies[
+            service_name
+        ] == aws_iam_utils.generator.generate_read_only_policy_for_service(service_name)
+
+
+def test_generate_policies_for_some_services_with_workers():
+    policies = aws_iam_utils.generator.generate_policies_for_all_services(
+        [LIST], service_names=["s3", "ec2"], workers=2
+    )
+
+    assert policies == {
+        "ec2": aws_iam_utils.generator.generate_list_only_policy_for_service("ec2"),
+        "s3": aws_iam_utils.generator.generate_list_only_policy_for_service("s3"),
+    }
@@ -0,0 +1,31 @@
+import subprocess
+import sys
+
+import pytest
+
+import aws_iam_utils
+
+
+def test_import_does_not_load_heavy_dependencies():
+    # run in a fresh interpreter, as other tests will already have imported these
+    code = (
+        "import sys, aws_iam_utils, aws_iam_utils.combiner, aws_iam_utils.simplifier; "
+        "print(' '.join(sorted(sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    modules = result.stdout.split()
+
+    for heavy in ["policy_sentry", "policyuniverse", "multiprocessing"]:
+        assert heavy not in modules
+
+    assert "aws_iam_utils.checks" not in modules
+
+
+def test_submodules_are_loaded_on_attribute_access():
+    assert aws_iam_utils.checks.is_read_only_policy
+    assert "checks" in dir(aws_iam_utils)
+
+    with pytest.raises(AttributeError):
+        aws_iam_utils.not_a_module
@@ -1,7 +1,9 @@
 from policyuniverse.expander_minimizer import minimize_policy
 
+from aws_iam_utils.catalog import get_catalog
 from aws_iam_utils.checks import is_read_only_policy
 from aws_iam_utils.checks import policy_has_only_these_access_levels
+from aws_iam_utils.constants import LIST
 from aws_iam_utils.constants import READ
 from aws_iam_utils.util import create_policy
 from aws_iam_utils.util import statement
@@ -144,3 +146,49 @@ def test_generate_policy_for_service_uses_action_data_overrides():
     # so generate a policy that contains it
     p = create_policy(statement(actions=["events:describe*"]))
     assert policy_has_only_these_access_levels(p, [READ])
+
+
+def test_policy_is_not_read_only_with_wildcards():
+    assert not is_read_only_policy(create_policy(statement(actions="*", resource="*")))
+    assert not is_read_only_policy(
+        create_policy(statement(actions="s3:*", resource="*"))
+    )
+    assert is_read_only_policy(
+        create_policy(statement(actions=["s3:Get*", "ec2:Describe*"], resource="*"))
+    )
+
+
+def test_policy_is_not_read_only_with_lowercase_effect():
+    assert not is_read_only_policy(
+        create_policy({"Effect": "allow", "Action": "*", "Resource": "*"})
+    )
+    assert is_read_only_policy(
+        create_policy(
+            statement(actions="s3:GetObject", resource="*"),
+            {"Effect": "deny", "Action": "*", "Resource": "*"},
+        )
+    )
+
+
+def test_policy_is_read_only_with_not_action():
+    p = create_policy(
+        {
+            "Effect": "Allow",
+            "NotAction": "s3:*",
+            "Resource": "*",
+        }
+    )
+
+    assert not is_read_only_policy(p)
+
+
+def test_policy_is_read_only_with_not_action_and_not_resource():
+    # NotAction on everything but List and Read actions is checked without
+    # expanding it
+    not_read = [x.action for x in get_catalog() if x.access_level not in [READ, LIST]]
+    p = create_policy(
+        {"Effect": "Allow", "NotAction": not_read, "NotResource": "arn:aws:s3:::x"},
+        {"Effect": "Deny", "NotAction": "s3:Get*", "Resource": "*"},
+    )
+
+    assert is_read_only_policy(p)
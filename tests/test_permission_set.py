@@ -0,0 +1,287 @@
+import pytest
+
+from aws_iam_utils.catalog import get_catalog
+from aws_iam_utils.catalog import ids_from_mask
+from aws_iam_utils.catalog import mask_from_ids
+from aws_iam_utils.combiner import collapse_policy_statements
+from aws_iam_utils.expander import expand_policy
+from aws_iam_utils.permission_set import permission_set_from_policy
+from aws_iam_utils.permission_set import policy_from_permission_set
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import extract_policy_permission_items
+from aws_iam_utils.util import freeze
+from aws_iam_utils.util import statement
+
+
+def test_frozen_values_are_immutable():
+    d = freeze({"a": 1})
+    h = hash(d)
+
+    with pytest.raises(TypeError):
+        d |= {"b": 2}
+    with pytest.raises(TypeError):
+        d["b"] = 2
+    assert d == {"a": 1} and hash(d) == h
+    assert d | {"b": 2} == {"a": 1, "b": 2}
+
+    lst = freeze([1])
+    with pytest.raises(TypeError):
+        lst += [2]
+    assert lst == [1]
+
+
+def test_mask_round_trip():
+    ids = [0, 3, 7, 8, 100, 12000]
+
+    assert ids_from_mask(mask_from_ids(ids)) == ids
+    assert mask_from_ids([]) == 0
+    assert ids_from_mask(0) == []
+
+
+def test_action_ids_are_stable():
+    catalog = get_catalog()
+
+    action_id = catalog.action_id("s3:GetObject")
+
+    assert catalog.action_id("s3:getobject") == action_id
+    assert catalog.action_name(action_id) == "s3:getobject"
+
+
+def test_unknown_action_ids():
+    catalog = get_catalog()
+
+    action_id = catalog.action_id("foo:Bar")
+
+    assert action_id >= len(catalog)
+    assert catalog.action_id("foo:bar") == action_id
+    assert catalog.action_name(action_id) == "foo:bar"
+
+
+def test_permission_set_items_match_extract_policy_permission_items():
+    p = create_policy(
+        statement(actions=["s3:Get*", "s3:ListBucket"], resource=["foo", "bar"]),
+        statement(
+            actions="iam:PassRole",
+            resource="*",
+            condition={"StringEquals": {"iam:PassedToService": "ec2.amazonaws.com"}},
+        ),
+    )
+
+    items = list(permission_set_from_policy(p))
+    expected = extract_policy_permission_items(expand_policy(p))
+
+    assert len(items) == len(expected)
+    assert sorted(items, key=str) == sorted(expected, key=str)
+
+
+def test_permission_set_equality_ignores_statement_layout():
+    p1 = create_policy(
+        statement(actions=["s3:GetObject", "s3:PutObject"], resource="*"),
+    )
+    p2 = create_policy(
+        statement(actions=["s3:putobject"], resource="*"),
+        statement(actions=["s3:GetObject", "s3:PutObject"], resource=["*"]),
+    )
+
+    assert permission_set_from_policy(p1) == permission_set_from_policy(p2)
+
+
+def test_permission_set_subset_and_difference():
+    small = permission_set_from_policy(
+        create_policy(statement(actions=["s3:GetObject"], resource="*"))
+    )
+    large = permission_set_from_policy(
+        create_policy(statement(actions=["s3:Get*"], resource="*"))
+    )
+
+    assert small.issubset(large)
+    assert not large.issubset(small)
+
+    diff = large.difference(small)
+    assert len(diff) == len(large) - 1
+    assert {x["action"] for x in diff} == {
+        x["action"] for x in large if x["action"] != "s3:getobject"
+    }
+
+    assert len(small.difference(large)) == 0
+
+
+def test_permission_set_not_action():
+    ps = permission_set_from_policy(
+        create_policy({"Effect": "Allow", "NotAction": "s3:*", "Resource": "*"})
+    )
+
+    assert len(ps) == len(get_catalog()) - len(get_catalog().match_actions("s3:*"))
+
+
+def test_permission_set_not_resource():
+    policy = create_policy(
+        {"Effect": "Deny", "Action": "s3:*", "NotResource": "arn:aws:s3:::tmp/*"},
+        {"Effect": "Deny", "Action": "s3:Get*", "NotResource": ["arn:aws:s3:::tmp/*"]},
+    )
+    ps = permission_set_from_policy(policy)
+
+    assert len(ps.groups) == 1
+    assert len(ps) == len(get_catalog().match_actions("s3:*"))
+
+
+def permission_set(*statements):
+    return permission_set_from_policy(create_policy(*statements))
+
+
+BUCKET_OBJECTS = "arn:aws:s3:::bucket/*"
+SECURE_TRANSPORT = {"Bool": {"aws:SecureTransport": "true"}}
+MFA = {"Bool": {"aws:MultiFactorAuthPresent": "true"}}
+
+
+def test_permission_set_apply_denies():
+    ps = permission_set(
+        statement(actions=["s3:GetObject", "s3:PutObject", "kms:*"], resource="*"),
+        statement(actions="sqs:SendMessage", resource="arn:aws:sqs:::queue"),
+        statement(effect="Deny", actions="kms:*", resource="*"),
+        statement(effect="Deny", actions="s3:PutObject", resource=BUCKET_OBJECTS),
+        statement(effect="Deny", actions="sqs:*", resource="arn:aws:sqs:::other"),
+        statement(
+            effect="Deny",
+            actions="s3:GetObject",
+            resource="*",
+            condition=SECURE_TRANSPORT,
+        ),
+    )
+
+    assert ps.apply_denies() == permission_set(
+        statement(actions=["s3:GetObject", "s3:PutObject"], resource="*"),
+        statement(actions="sqs:SendMessage", resource="arn:aws:sqs:::queue"),
+        statement(effect="Deny", actions="s3:PutObject", resource=BUCKET_OBJECTS),
+        statement(
+            effect="Deny",
+            actions="s3:GetObject",
+            resource="*",
+            condition=SECURE_TRANSPORT,
+        ),
+    )
+
+
+def test_permission_set_intersection():
+    identity = permission_set(
+        statement(actions="*", resource="*"),
+        statement(effect="Deny", actions="iam:*", resource="*"),
+    )
+    boundary = permission_set(
+        statement(actions=["s3:*", "iam:PassRole"], resource="*"),
+        statement(actions="kms:Decrypt", resource="*", condition=SECURE_TRANSPORT),
+    )
+    scp = permission_set(
+        statement(actions=["s3:Get*", "kms:*"], resource=BUCKET_OBJECTS),
+        statement(actions="kms:Decrypt", resource="*", condition=MFA),
+    )
+
+    assert identity.intersection(boundary).intersection(scp) == permission_set(
+        statement(actions="s3:Get*", resource=BUCKET_OBJECTS),
+        statement(
+            actions="kms:Decrypt",
+            resource=BUCKET_OBJECTS,
+            condition=SECURE_TRANSPORT,
+        ),
+        statement(
+            actions="kms:Decrypt",
+            resource="*",
+            condition={
+                "Bool": {
+                    "aws:SecureTransport": "true",
+                    "aws:MultiFactorAuthPresent": "true",
+                }
+            },
+        ),
+    )
+
+    # the same condition key with different values cannot be merged
+    insecure = permission_set(
+        statement(
+            actions="kms:Decrypt",
+            resource="*",
+            condition={"Bool": {"aws:SecureTransport": "false"}},
+        )
+    )
+    assert len(boundary.intersection(insecure)) == 0
+
+    assert len(identity.intersection(permission_set())) == 0
+
+
+def test_permission_set_union():
+    a = permission_set(statement(actions="s3:GetObject", resource=BUCKET_OBJECTS))
+    b = permission_set(
+        statement(actions=["s3:GetObject", "s3:PutObject"], resource="*"),
+        statement(effect="Deny", actions="s3:PutObject", resource="*"),
+    )
+
+    assert a.union(b) == permission_set(
+        statement(actions="s3:GetObject", resource=BUCKET_OBJECTS),
+        statement(actions="s3:GetObject", resource="*"),
+    )
+    assert a.issubset(a.union(b))
+    assert b.issubset(a.union(b))
+
+
+def test_permission_set_difference_and_subset_cover_resources():
+    role_a = permission_set(
+        statement(actions=["s3:GetObject", "s3:PutObject"], resource=BUCKET_OBJECTS),
+        statement(actions="kms:Decrypt", resource="*", condition=SECURE_TRANSPORT),
+        statement(actions="sqs:SendMessage", resource="arn:aws:sqs:::queue"),
+    )
+    role_b = permission_set(
+        statement(actions="s3:Get*", resource="arn:aws:s3:::*"),
+        statement(actions="kms:Decrypt", resource="*"),
+        statement(actions="sqs:SendMessage", resource="*", condition=MFA),
+    )
+
+    assert role_a.difference(role_b) == permission_set(
+        statement(actions="s3:PutObject", resource=BUCKET_OBJECTS),
+        statement(actions="sqs:SendMessage", resource="arn:aws:sqs:::queue"),
+    )
+    assert not role_a.issubset(role_b)
+
+    role_b.add("Allow", get_catalog().match_mask("s3:PutObject"), "*")
+    role_b.add("Allow", get_catalog().match_mask("sqs:*"), "arn:aws:sqs:::*")
+    assert len(role_a.difference(role_b)) == 0
+    assert role_a.issubset(role_b)
+    assert not role_b.issubset(role_a)
+
+    # a Deny in the superset that may apply to the subset's permissions
+    role_b.add("Deny", get_catalog().match_mask("s3:GetObject"), "*", condition=MFA)
+    assert not role_a.issubset(role_b)
+
+
+def test_policy_from_permission_set():
+    catalog = get_catalog()
+
+    ps = permission_set(
+        statement(actions=["*"], resource="arn:aws:s3:::a"),
+        statement(actions=["s3:*", "kms:Decrypt"], resource="*"),
+        statement(actions=["s3:*", "kms:Decrypt"], resource="arn:aws:s3:::b"),
+        statement(actions="madeup:Action", resource="*", condition=SECURE_TRANSPORT),
+        {"Effect": "Deny", "Action": "s3:*", "NotResource": BUCKET_OBJECTS},
+    )
+    ps.add("Allow", catalog.match_mask("sqs:*") & ~catalog.match_mask("sqs:Send*"))
+
+    policy = policy_from_permission_set(ps)
+
+    assert permission_set_from_policy(policy) == ps
+    assert collapse_policy_statements(policy, merge_resources=True) == policy
+    assert policy["Statement"][:4] == [
+        {"Effect": "Allow", "Resource": "arn:aws:s3:::a", "Action": ["*"]},
+        {
+            "Effect": "Allow",
+            "Resource": ["*", "arn:aws:s3:::b"],
+            "Action": ["kms:decrypt", "s3:*"],
+        },
+        {
+            "Effect": "Allow",
+            "Condition": SECURE_TRANSPORT,
+            "Resource": "*",
+            "Action": ["madeup:action"],
+        },
+        {"Effect": "Deny", "NotResource": [BUCKET_OBJECTS], "Action": ["s3:*"]},
+    ]
+    assert "sqs:receivemessage" in policy["Statement"][4]["Action"]
+    assert "sqs:sendmessage" not in policy["Statement"][4]["Action"]
@@ -1,5 +1,11 @@
+import copy
+import json
+
+import pytest
+
 from aws_iam_utils.policy import PolicyPermissionItem
 from aws_iam_utils.policy import policy_from_dict
+from aws_iam_utils.combiner import collapse_policy_statements
 
 from aws_iam_utils.util import extract_policy_permission_items
 from aws_iam_utils.util import create_policy
@@ -158,3 +164,268 @@ def test_add_policy():
             principal={"AWS": "arn:aws:iam:123456789012::role/foo"},
         ),
     ]
+
+
+def test_ppis_are_hashable_and_immutable():
+    condition = {"StringEquals": {"aws:SourceVpc": ["vpc-1"]}}
+
+    a = PolicyPermissionItem("Allow", "s3:getobject", "*", condition)
+    b = PolicyPermissionItem("Allow", "s3:getobject", "*", copy.deepcopy(condition))
+    c = PolicyPermissionItem("Allow", "s3:putobject", "*", condition)
+
+    assert a == b
+    assert a != c
+    assert len({a, b, c}) == 2
+    assert a.condition == condition
+
+    with pytest.raises(AttributeError):
+        a.action = "s3:putobject"
+
+    # as_statement() should return values that are safe to modify
+    st = a.as_statement()
+    st["Condition"]["StringEquals"]["aws:SourceVpc"].append("vpc-2")
+    assert a == b
+
+
+def test_ppi_equality_with_dicts():
+    ppi = PolicyPermissionItem("Allow", "s3:getobject", "*")
+    as_dict = {
+        "effect": "Allow",
+        "action": "s3:getobject",
+        "resource": "*",
+        "condition": None,
+        "principal": None,
+    }
+
+    assert ppi == as_dict
+    assert as_dict == ppi
+
+    # same values from .get(), but different keys
+    del as_dict["principal"]
+    as_dict["other"] = None
+    assert ppi != as_dict
+
+    assert ppi != ("Allow", "s3:getobject", "*", None, None)
+    assert ppi.__eq__("s3:getobject") is NotImplemented
+
+
+def test_policy_from_dict_shares_frozen_values():
+    policy = create_policy(
+        statement(
+            actions=["s3:PutObject", "s3:GetObject"],
+            resource=["foo", "bar"],
+            condition={"Bool": {"aws:SecureTransport": "true"}},
+        )
+    )
+
+    p = policy_from_dict(policy)
+
+    assert len({id(x.condition) for x in p.ppis}) == 1
+    assert len(set(p.ppis)) == 4
+
+
+def test_find_service_resource_and_effect_ppis():
+    policy = create_policy(
+        statement(actions=["s3:PutObject", "ec2:DescribeInstances"], resource="*"),
+        statement(
+            effect="Deny",
+            actions=["s3:GetObject"],
+            resource="arn:aws:s3:::my-bucket1/*",
+        ),
+    )
+
+    p = policy_from_dict(policy)
+
+    assert p.find_service_ppis("S3") == [
+        PolicyPermissionItem("Allow", "s3:putobject", resource="*"),
+        PolicyPermissionItem(
+            "Deny", "s3:getobject", resource="arn:aws:s3:::my-bucket1/*"
+        ),
+    ]
+    assert p.find_resource_ppis("*") == [
+        PolicyPermissionItem("Allow", "s3:putobject", resource="*"),
+        PolicyPermissionItem("Allow", "ec2:describeinstances", resource="*"),
+    ]
+    assert p.find_effect_ppis("deny") == [
+        PolicyPermissionItem(
+            "Deny", "s3:getobject", resource="arn:aws:s3:::my-bucket1/*"
+        ),
+    ]
+
+
+def test_indexes_follow_added_ppis():
+    p = policy_from_dict(create_policy(statement(actions=["s3:PutObject"])))
+
+    assert p.find_action_ppis("s3:GetObject") == []
+
+    p.add_policy_statements(create_policy(statement(actions=["s3:GetObject"])))
+    p.ppis.append(PolicyPermissionItem("Allow", "s3:getobject", resource="foo"))
+
+    assert p.find_action_ppis("s3:GetObject") == [
+        PolicyPermissionItem("Allow", "s3:getobject"),
+        PolicyPermissionItem("Allow", "s3:getobject", resource="foo"),
+    ]
+
+    p.ppis = [PolicyPermissionItem("Allow", "s3:listbucket")]
+    assert p.find_action_ppis("s3:GetObject") == []
+    assert p.find_service_ppis("s3") == p.ppis
+
+
+def test_grants():
+    policy = create_policy(
+        statement(actions=["s3:Get*", "s3:ListBucket"], resource="arn:aws:s3:::b1*"),
+        statement(actions=["ec2:DescribeInstances"], resource="*"),
+        statement(
+            effect="Deny",
+            actions=["s3:GetObject"],
+            resource="arn:aws:s3:::b1-secret/*",
+        ),
+    )
+
+    p = policy_from_dict(policy)
+
+    assert p.grants("s3:GetObject")
+    assert p.grants("s3:GetObject", "arn:aws:s3:::b1/foo")
+    assert p.grants("S3:getobjectacl", "arn:aws:s3:::b1/foo")
+    assert not p.grants("s3:GetObject", "arn:aws:s3:::b2/foo")
+    assert not p.grants("s3:GetObject", "arn:aws:s3:::b1-secret/foo")
+    assert p.grants("s3:GetObjectAcl", "arn:aws:s3:::b1-secret/foo")
+    assert p.grants("ec2:DescribeInstances", "anything")
+    assert not p.grants("s3:PutObject")
+
+
+def test_as_dict_after_incremental_additions_matches_collapse():
+    p = policy_from_dict(create_policy())
+
+    for i in range(20):
+        p.add_policy_statements(
+            create_policy(
+                statement(
+                    actions=["s3:GetObject", f"s3:{['Put', 'List'][i % 2]}Object"],
+                    resource=f"arn:aws:s3:::bucket-{i % 3}",
+                    condition=(
+                        {"Bool": {"aws:SecureTransport": "true"}}
+                        if i % 4 == 0
+                        else None
+                    ),
+                ),
+            )
+        )
+
+        expected = collapse_policy_statements(
+            {"Version": p.version, "Statement": [x.as_statement() for x in p.ppis]}
+        )
+        assert p.as_dict() == expected
+
+
+def test_as_dict_result_can_be_modified():
+    p = policy_from_dict(
+        create_policy(statement(actions=["s3:GetObject"], principal={"AWS": ["foo"]}))
+    )
+
+    result = p.as_dict()
+    result["Statement"][0]["Action"].append("s3:putobject")
+    result["Statement"][0]["Principal"]["AWS"] = "foo"
+
+    assert p.as_dict() == create_lowercase_policy(
+        statement(actions=["s3:GetObject"], principal={"AWS": ["foo"]})
+    )
+
+
+def test_as_json_and_json_size():
+    p = policy_from_dict(create_policy())
+    assert p.json_size() == len(p.as_json())
+
+    for i in range(5):
+        p.add_policy_statements(
+            create_policy(
+                statement(actions=["s3:GetObject"], resource=f"arn:aws:s3:::b{i % 2}"),
+                statement(
+                    actions=["s3:PutObject"], condition={"Bool": {"foo": "true"}}
+                ),
+            )
+        )
+
+        assert json.loads(p.as_json()) == p.as_dict()
+        assert p.json_size() == len(p.as_json())
+        assert p.json_size() == len(json.dumps(p.as_dict(), separators=(",", ":")))
+
+
+def test_not_resource():
+    p = policy_from_dict(
+        create_policy(
+            statement(actions="s3:*", resource="*"),
+            {
+                "Effect": "Deny",
+                "Action": "s3:Delete*",
+                "NotResource": "arn:aws:s3:::t/*",
+            },
+        )
+    )
+
+    assert p.grants("s3:DeleteObject", "arn:aws:s3:::t/a")
+    assert not p.grants("s3:DeleteObject", "arn:aws:s3:::prod/a")
+    assert p.as_dict()["Statement"][1] == {
+        "Effect": "Deny",
+        "NotResource": ["arn:aws:s3:::t/*"],
+        "Action": ["s3:delete*"],
+    }
+    assert p.ppis[1].as_statement()["NotResource"] == ["arn:aws:s3:::t/*"]
+
+    json_before = p.as_json()
+    p.as_dict()["Statement"][1]["NotResource"].append("arn:aws:s3:::u/*")
+    assert p.as_dict()["Statement"][1]["NotResource"] == ["arn:aws:s3:::t/*"]
+    assert p.as_json() == json_before
+
+
+def test_not_action():
+    not_action = {"Effect": "Allow", "NotAction": "iam:*", "Resource": "*"}
+    policy = create_policy(
+        not_action,
+        {
+            "Effect": "Deny",
+            "NotAction": ["s3:Get*", "s3:List*"],
+            "Resource": ["arn:aws:s3:::a", "arn:aws:s3:::b"],
+        },
+    )
+    p = policy_from_dict(policy)
+
+    assert len(p.ppis) == 3
+    assert p.as_dict()["Statement"][0] == not_action
+    assert p.json_size() == len(p.as_json()) < 300
+    assert p.as_dict() == policy
+    assert p.as_dict() == collapse_policy_statements(policy)
+
+    # NotAction statements are kept whole, even as more PPIs are added
+    p.add_policy_statements(
+        create_policy(
+            {
+                "Effect": "Deny",
+                "NotAction": ["s3:Get*", "s3:List*"],
+                "Resource": "arn:aws:s3:::c",
+            }
+        )
+    )
+    assert p.as_dict()["Statement"][1]["Resource"] == [
+        "arn:aws:s3:::a",
+        "arn:aws:s3:::b",
+        "arn:aws:s3:::c",
+    ]
+    assert json.loads(p.as_json()) == p.as_dict()
+    assert p.json_size() == len(p.as_json())
+
+    result = p.as_dict()
+    result["Statement"][1]["Resource"].append("arn:aws:s3:::d")
+    assert len(p.as_dict()["Statement"][1]["Resource"]) == 3
+
+    assert p.grants("ec2:RunInstances")
+    assert p.grants("madeup:DoThing")
+    assert not p.grants("IAM:PassRole")
+    assert p.grants("s3:PutObject", "arn:aws:s3:::e")
+    assert not p.grants("s3:PutObject", "arn:aws:s3:::a")
+    assert not p.grants("s3:PutObject", "arn:aws:s3:::c")
+    assert p.grants("s3:GetObject", "arn:aws:s3:::a")
+    assert p.find_action_ppis("ec2:RunInstances") == []
+
+    single = create_policy(not_action)
+    assert policy_from_dict(single).as_dict() == single
@@ -0,0 +1,197 @@
+import pytest
+
+from aws_iam_utils.policy import policy_from_dict
+from aws_iam_utils.policy_index import PolicyIndex
+from aws_iam_utils.util import NotResource
+from aws_iam_utils.util import PermissionItem
+from aws_iam_utils.util import create_policy
+from aws_iam_utils.util import statement
+
+ROLE_ARN = "arn:aws:iam::123456789012:role/app"
+
+POLICIES = {
+    "pass-any-role": create_policy(
+        statement(actions=["iam:PassRole", "iam:GetRole"], resource="*")
+    ),
+    "pass-app-roles": create_policy(
+        statement(actions="iam:passrole", resource="arn:aws:iam::*:role/app*")
+    ),
+    "pass-other-roles": create_policy(
+        statement(actions="iam:PassRole", resource="arn:aws:iam::*:role/other")
+    ),
+    "kms": create_policy(
+        statement(
+            actions="kms:Decrypt",
+            resource="*",
+            condition={"StringEquals": {"kms:ViaService": "s3.amazonaws.com"}},
+        )
+    ),
+    "admin-except-app": create_policy(
+        statement(actions="*", resource="*"),
+        statement(effect="Deny", actions="iam:PassRole", resource=ROLE_ARN),
+    ),
+    "not-action": {
+        "Version": "2012-10-17",
+        "Statement": [
+            {"Effect": "Allow", "NotAction": "iam:*", "NotResource": ROLE_ARN}
+        ],
+    },
+}
+
+
+@pytest.fixture(params=[PolicyIndex.DENSE_ENTRY_SIZE, 0, 100000])
+def index(request):
+    # with each entry and query either dense or sparse
+    index = PolicyIndex()
+    index.DENSE_ENTRY_SIZE = request.param
+
+    for key, policy in POLICIES.items():
+        index.add(key, policy)
+
+    return index
+
+
+def test_policies_granting(index):
+    assert len(index) == len(POLICIES)
+    assert "kms" in index
+    assert set(index) == set(POLICIES)
+
+    assert index.policies_granting("iam:PassRole") == {
+        "pass-any-role",
+        "pass-app-roles",
+        "pass-other-roles",
+        "admin-except-app",
+    }
+    assert index.policies_granting("iam:PassRole", ROLE_ARN) == {
+        "pass-any-role",
+        "pass-app-roles",
+    }
+    assert index.policies_granting("IAM:PASSROLE", "arn:aws:iam::1:role/other") == {
+        "pass-any-role",
+        "pass-other-roles",
+        "admin-except-app",
+    }
+
+    assert index.policies_granting("kms:Decrypt") == {
+        "kms",
+        "admin-except-app",
+        "not-action",
+    }
+    assert index.policies_granting("kms:Decrypt", ROLE_ARN) == {
+        "kms",
+        "admin-except-app",
+    }
+
+    assert index.policies_granting("iam:Pass*", ROLE_ARN) == {
+        "pass-any-role",
+        "pass-app-roles",
+    }
+    assert index.policies_granting("iam:*", ROLE_ARN) == {
+        "pass-any-role",
+        "pass-app-roles",
+        "admin-except-app",
+    }
+
+    assert index.policies_granting("*", ROLE_ARN) == {
+        "pass-any-role",
+        "pass-app-roles",
+        "kms",
+        "admin-except-app",
+    }
+    assert index.policies_granting("*") == set(POLICIES)
+
+    assert index.policies_granting("madeup:Action") == set()
+
+
+def test_policies_granting_matches_policy_grants(index):
+    policies = {key: policy_from_dict(policy) for key, policy in POLICIES.items()}
+
+    for action in ["iam:PassRole", "iam:GetRole", "kms:Decrypt", "s3:GetObject"]:
+        for resource in [None, ROLE_ARN, "arn:aws:s3:::bucket"]:
+            assert index.policies_granting(action, resource) == {
+                key
+                for key, policy in policies.items()
+                if policy.grants(action, resource)
+            }, (action, resource)
+
+
+def test_search(index):
+    assert sorted(index.search("kms:Decrypt", effect="allow")) == [
+        (
+            "admin-except-app",
+            PermissionItem("Allow", "kms:decrypt", "*", None, None),
+        ),
+        (
+            "kms",
+            PermissionItem(
+                "Allow",
+                "kms:decrypt",
+                "*",
+                {"StringEquals": {"kms:ViaService": "s3.amazonaws.com"}},
+                None,
+            ),
+        ),
+        (
+            "not-action",
+            PermissionItem("Allow", "kms:decrypt", NotResource([ROLE_ARN]), None, None),
+        ),
+    ]
+
+    assert list(index.search("iam:PassRole", ROLE_ARN, effect="Deny")) == [
+        (
+            "admin-except-app",
+            PermissionItem("Deny", "iam:passrole", ROLE_ARN, None, None),
+        )
+    ]
+
+    assert {
+        (key, item.action)
+        for key, item in index.search("iam:*Role", ROLE_ARN)
+        if key != "admin-except-app"
+    } == {
+        ("pass-any-role", "iam:getrole"),
+        ("pass-any-role", "iam:passrole"),
+        ("pass-app-roles", "iam:passrole"),
+    }
+
+
+def test_add_replace_remove(index):
+    index.add("kms", create_policy(statement(actions="kms:Encrypt", resource="*")))
+    assert len(index) == len(POLICIES)
+    assert "kms" not in index.policies_granting("kms:Decrypt")
+    assert "kms" in index.policies_granting("kms:Encrypt")
+
+    index.remove("admin-except-app")
+    assert "admin-except-app" not in index
+    assert index.policies_granting("kms:Decrypt") == {"not-action"}
+
+    index.remove("not-action")
+    index.remove("kms")
+    assert index.policies_granting("kms:*") == set()
+
+    with pytest.raises(KeyError):
+        index.remove("kms")
+
+    for key in list(index):
+        index.remove(key)
+
+    assert len(index) == 0
+    assert index._postings == {}
+    assert index._dense_entry_ids == set()
+
+
+def test_add_unsupported_policy_keeps_existing(index):
+    with pytest.raises(ValueError):
+        index.add(
+            "kms",
+            {
+                "Statement": {
+                    "Effect": "Allow",
+                    "Action": "kms:Encrypt",
+                    "Resource": "*",
+                    "NotPrincipal": {"AWS": "*"},
+                }
+            },
+        )
+
+    assert "kms" in index.policies_granting("kms:Decrypt")